@@ -0,0 +1,168 @@
+"""ブラックジャックの期待値アドバイザー（Hint ボタン用）。
+
+プレイヤーの手札とディーラーのアップカードから Hit / Stand / Double の期待値
+（1 ベットあたりの損益）を厳密に計算する。ルールは rules.py のもの（ソフト17でヒット、
+ダブルは最初のアクションのみ、勝ちは 2 倍払い、ピークなし）。
+
+カードは無限デッキ（各ランク 1/13）として扱う。6 デッキのシューとの差は小さい。
+状態は (A を 1 と数えた合計, A を含むか, アップカード) だけなので、結果はメモ化して
+再利用する。ウォームアップ後の問い合わせは辞書を引くだけ。
+
+事前計算した表をファイルに置いておくと起動時に読み込む（環境変数 BJ_ADVICE_TABLE）:
+    python advisor.py build [bj_advice.json]
+"""
+import json
+import os
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import rules
+
+# 事前計算した表のパス（空なら使わない）
+TABLE_FILE = os.getenv("BJ_ADVICE_TABLE", "")
+_TABLE_VERSION = 1
+
+# 引くカードの (A を 1 と数えた点数, 確率)
+_DRAWS: Tuple[Tuple[int, float], ...] = tuple(
+    (low, sum(1 for c in range(len(rules.CARD_RANKS)) if rules.Hand([c]).low == low) / len(rules.CARD_RANKS))
+    for low in range(1, 11)
+)
+_BUST = 22  # ディーラーの最終点数の分布でバーストを表す添字
+
+# (low, ace, upcard) -> (hit, stand, double)
+_table: Dict[Tuple[int, bool, int], Tuple[float, float, float]] = {}
+
+
+def _hand(low: int, ace: bool) -> rules.Hand:
+    # その状態の手札（点数とソフト判定だけに使う）
+    h = rules.Hand()
+    h.low, h.aces = low, int(ace)
+    return h
+
+
+@lru_cache(maxsize=None)
+def _dealer(low: int, ace: bool) -> Tuple[float, ...]:
+    """ディーラーの最終点数の分布（添字 0..21 が点数、22 がバースト）。"""
+    h = _hand(low, ace)
+    dist = [0.0] * (_BUST + 1)
+    if h.total > 21:
+        dist[_BUST] = 1.0
+    elif not rules.dealer_should_hit(h):
+        dist[h.total] = 1.0
+    else:
+        for v, p in _DRAWS:
+            for total, q in enumerate(_dealer(low + v, ace or v == 1)):
+                dist[total] += p * q
+    return tuple(dist)
+
+
+@lru_cache(maxsize=None)
+def _stand(total: int, up: int) -> float:
+    # up: アップカードの点数（A は 1）
+    return sum(q * (rules.blackjack_payout(1, total, d)[1] - 1)
+               for d, q in enumerate(_dealer(up, up == 1)) if q)
+
+
+@lru_cache(maxsize=None)
+def _hit(low: int, ace: bool, up: int) -> float:
+    ev = 0.0
+    for v, p in _DRAWS:
+        nlow, nace = low + v, ace or v == 1
+        total = _hand(nlow, nace).total
+        if total > 21:
+            ev -= p
+        else:
+            # 引いた後はもう一度ヒットするかスタンドするか良い方を選ぶ（ダブルは不可）
+            ev += p * max(_stand(total, up), _hit(nlow, nace, up))
+    return ev
+
+
+@lru_cache(maxsize=None)
+def _double(low: int, ace: bool, up: int) -> float:
+    # 掛け金 2 倍で 1 枚だけ引いてスタンド
+    return 2 * sum(p * _stand(_hand(low + v, ace or v == 1).total, up) for v, p in _DRAWS)
+
+
+def _evs(low: int, ace: bool, up: int) -> Tuple[float, float, float]:
+    key = (low, ace, up)
+    ev = _table.get(key)
+    if ev is None:
+        ev = _table[key] = (_hit(low, ace, up), _stand(_hand(low, ace).total, up), _double(low, ace, up))
+    return ev
+
+
+def advise(player: rules.Hand, upcard: int, can_double: bool) -> Dict[str, Optional[float]]:
+    """{"hit", "stand", "double"} -> 1 ベットあたりの期待損益。ダブルできなければ double は None。"""
+    hit, stand, double = _evs(player.low, player.aces > 0, rules.Hand([upcard]).low)
+    return {"hit": hit, "stand": stand, "double": double if can_double else None}
+
+
+def best_action(ev: Dict[str, Optional[float]]) -> str:
+    return max((k for k, v in ev.items() if v is not None), key=lambda k: ev[k])
+
+
+# --- 事前計算した表 ---
+
+
+def build_table() -> int:
+    """到達し得る全状態を計算して _table に入れる。件数を返す。"""
+    for up in range(1, 11):
+        for ace in (False, True):
+            for low in range(2, 22):
+                _evs(low, ace, up)
+    return len(_table)
+
+
+def save_table(path: Path) -> int:
+    build_table()
+    entries = {f"{low},{int(ace)},{up}": list(ev) for (low, ace, up), ev in _table.items()}
+    tmp = Path(path).with_name(Path(path).name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump({"version": _TABLE_VERSION, "entries": entries}, f, separators=(",", ":"))
+    os.replace(tmp, path)
+    return len(entries)
+
+
+def load_table(path: Path) -> int:
+    """表を読み込んでキャッシュを温める。形式が違えば無視する。件数を返す。"""
+    with Path(path).open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version") != _TABLE_VERSION:
+        print(f"[advisor] {path} は古い形式なので使いません。")
+        return 0
+    for key, ev in data["entries"].items():
+        low, ace, up = (int(x) for x in key.split(","))
+        _table[(low, bool(ace), up)] = tuple(ev)
+    return len(data["entries"])
+
+
+def warm() -> None:
+    """起動時に呼ぶ。BJ_ADVICE_TABLE があれば読み込み、なければ計算して書き出す。"""
+    if not TABLE_FILE:
+        return
+    path = Path(TABLE_FILE)
+    try:
+        if path.exists():
+            n = load_table(path)
+            print(f"[advisor] {path} から {n} 件読み込みました。")
+        else:
+            n = save_table(path)
+            print(f"[advisor] {n} 件を計算して {path} に書き出しました。")
+    except Exception as e:
+        print(f"[advisor] table warm-up failed: {e}")
+
+
+def main(argv) -> int:
+    if len(argv) < 2 or argv[1] != "build":
+        print("使い方: python advisor.py build [bj_advice.json]")
+        return 2
+    path = Path(argv[2]) if len(argv) > 2 else Path(TABLE_FILE or "bj_advice.json")
+    n = save_table(path)
+    print(f"{n} 件の期待値を {path} に書き出しました。")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,151 @@
+"""ゲームのロール演出用メッセージ編集スケジューラ。
+
+各ゲームは演出フレーム（message.edit の引数）をここに渡す。チャンネルごと・webhook
+（インタラクションのフォローアップ）ごとにトークンバケットで編集回数を見積もり、
+バケットが混んでいるときは途中のフレームを捨てて（＝次のフレームにまとめて）、
+最後の結果フレームだけは枠が空くのを待ってから必ず送る。
+"""
+import asyncio
+import os
+import time
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+# 編集回数の見積もり（環境変数で調整可能）
+#   ANIM_CHANNEL_EDITS / ANIM_CHANNEL_PER: チャンネルあたり PER 秒に EDITS 回
+#   ANIM_WEBHOOK_EDITS / ANIM_WEBHOOK_PER: webhook あたり PER 秒に EDITS 回
+#   ANIM_RESERVE                         : 結果フレーム用に残しておく枠（途中フレームは使わない）
+CHANNEL_EDITS = float(os.getenv("ANIM_CHANNEL_EDITS", "5"))
+CHANNEL_PER = float(os.getenv("ANIM_CHANNEL_PER", "5"))
+WEBHOOK_EDITS = float(os.getenv("ANIM_WEBHOOK_EDITS", "5"))
+WEBHOOK_PER = float(os.getenv("ANIM_WEBHOOK_PER", "2"))
+RESERVE = float(os.getenv("ANIM_RESERVE", "1"))
+
+_IDLE_EVICT = 300.0  # この秒数使われていない満タンのバケットは捨てる
+
+
+class _Bucket:
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity: float, per: float, now: float):
+        self.capacity = capacity
+        self.rate = capacity / per
+        self.tokens = capacity
+        self.updated = now
+
+    def refill(self, now: float) -> float:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return self.tokens
+
+    def wait_time(self, need: float) -> float:
+        return max(0.0, (need - self.tokens) / self.rate)
+
+
+class EditScheduler:
+    """チャンネル / webhook ごとの編集枠を管理して演出フレームを送る。"""
+
+    def __init__(self) -> None:
+        self._buckets: Dict[Tuple[str, Hashable], _Bucket] = {}
+        self._last_evict = time.monotonic()
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self.finals_sent = 0
+        self.errors = 0
+
+    # --- バケット ---
+
+    def _buckets_for(self, message: Any, now: float):
+        # フォローアップ（WebhookMessage）の編集は webhook のルートを通るので、チャンネルの枠は使わない。
+        # 枠はインタラクションのトークンごとだが、トークンは discord.py の非公開属性にしかないので、
+        # 公開の message.id（演出は 1 インタラクションにつき 1 メッセージ）で代わりに数える
+        # （webhook_id はアプリ ID で全員共通なので、webhook かどうかの判定にだけ使う）
+        if getattr(message, "webhook_id", None) is not None:
+            return [self._bucket(("webhook", message.id), WEBHOOK_EDITS, WEBHOOK_PER, now)]
+        channel = getattr(getattr(message, "channel", None), "id", None)
+        if channel is not None:
+            return [self._bucket(("channel", channel), CHANNEL_EDITS, CHANNEL_PER, now)]
+        return []
+
+    def _bucket(self, key, capacity: float, per: float, now: float) -> _Bucket:
+        b = self._buckets.get(key)
+        if b is None:
+            b = self._buckets[key] = _Bucket(capacity, per, now)
+        if now - self._last_evict > _IDLE_EVICT:
+            self._evict(now)
+        return b
+
+    def _evict(self, now: float) -> None:
+        self._last_evict = now
+        for key, b in list(self._buckets.items()):
+            if now - b.updated > _IDLE_EVICT:
+                del self._buckets[key]
+
+    def _try_take(self, message: Any, reserve: float) -> bool:
+        now = time.monotonic()
+        buckets = self._buckets_for(message, now)
+        if any(b.refill(now) < 1 + reserve for b in buckets):
+            return False
+        for b in buckets:
+            b.tokens -= 1
+        return True
+
+    async def _take(self, message: Any) -> None:
+        # 枠が空くまで待ってから 1 つ使う
+        while True:
+            now = time.monotonic()
+            buckets = self._buckets_for(message, now)
+            for b in buckets:
+                b.refill(now)
+            wait = max((b.wait_time(1) for b in buckets), default=0.0)
+            if wait <= 0:
+                for b in buckets:
+                    b.tokens -= 1
+                return
+            await asyncio.sleep(wait)
+
+    # --- 公開 API ---
+
+    async def animate(self, message: Any, frames: Iterable[Dict[str, Any]], interval: float,
+                      final: Optional[Dict[str, Any]] = None) -> None:
+        """frames を interval 秒ごとに表示し、最後に final を必ず表示する。
+
+        枠が足りないときの途中フレームは送らずに飛ばす（演出の長さは変えない）。
+        message が None のときは待つだけ。
+        """
+        for kwargs in frames:
+            if message is not None and self._try_take(message, RESERVE):
+                try:
+                    await message.edit(**kwargs)
+                    self.frames_sent += 1
+                except Exception:
+                    self.errors += 1
+            else:
+                self.frames_skipped += 1
+            await asyncio.sleep(interval)
+        if final is not None and message is not None:
+            await self.deliver(message, **final)
+
+    async def deliver(self, message: Any, **kwargs: Any) -> bool:
+        """結果フレーム: 枠が空くのを待ってから必ず送る。成功したら True。"""
+        await self._take(message)
+        try:
+            await message.edit(**kwargs)
+        except Exception:
+            self.errors += 1
+            return False
+        self.finals_sent += 1
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        """送信 / 省略したフレーム数などのカウンタ。"""
+        return {
+            "frames_sent": self.frames_sent,
+            "frames_skipped": self.frames_skipped,
+            "finals_sent": self.finals_sent,
+            "errors": self.errors,
+            "buckets": len(self._buckets),
+        }
+
+
+# bot 全体で共有するスケジューラ
+scheduler = EditScheduler()
@@ -1,49 +1,876 @@
-# bank.py
+import asyncio
+import atexit
+import functools
+import itertools
 import json
+import os
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+import economy
+import ledger
+import rng
+from rank import RankIndex
 
 DATA_FILE = Path("balances.json")
+# 変更ごとに 1 行追記するジャーナル（JSONL）。起動時は DATA_FILE + ジャーナルを再生する
+JOURNAL_FILE = Path("balances.journal")
 
+# ストレージの選択
+#   BANK_BACKEND    : "json"（既定・従来形式）、"sqlite"、"binary" または "sharded"
+#   BANK_SQLITE_PATH: sqlite バックエンドのデータベースファイル
+#   BANK_BINARY_PATH: binary バックエンドのスナップショット（固定長レコード、mmap で参照）
+BACKEND = os.getenv("BANK_BACKEND", "json").lower()
+SQLITE_PATH = Path(os.getenv("BANK_SQLITE_PATH", "balances.db"))
+BINARY_PATH = Path(os.getenv("BANK_BINARY_PATH", "balances.bin"))
+#   BANK_SHARD_DIR  : sharded バックエンドのディレクトリ
+#   BANK_SHARDS     : 新規作成時のパーティション数（既存の配置は /残高再分割、またはボットを止めて bank_sharded.py reshard で変更）
+SHARD_DIR = Path(os.getenv("BANK_SHARD_DIR", "balances.d"))
+SHARDS = int(os.getenv("BANK_SHARDS", "16"))
 
-def _load_data() -> Dict[str, int]:
-    if not DATA_FILE.exists():
-        return {}
-    with DATA_FILE.open("r", encoding="utf-8") as f:
-        return json.load(f)
+# 耐久性ウィンドウ（json バックエンド用、環境変数で調整可能）
+#   BANK_FLUSH_INTERVAL: 何秒ごとにジャーナルを書き出すか（0 以下で毎回即時書き込み）
+#   BANK_FLUSH_EVERY   : 未保存の変更がこの件数に達したら間隔を待たずに書き出す
+#   BANK_COMPACT_EVERY : ジャーナルがこの件数を超えたらスナップショットへ畳み込む
+FLUSH_INTERVAL = float(os.getenv("BANK_FLUSH_INTERVAL", "5"))
+FLUSH_EVERY = int(os.getenv("BANK_FLUSH_EVERY", "100"))
+COMPACT_EVERY = int(os.getenv("BANK_COMPACT_EVERY", "10000"))
+
+
+class Backend:
+    """残高ストレージの共通インターフェース。
+
+    apply は deltas を全件まとめて原子的に適用する。floors に含まれるユーザーの
+    減算で残高が floor を下回る場合は何も変更せず None を返す。
+    """
+
+    def get(self, user_id: int) -> int:
+        raise NotImplementedError
+
+    def set(self, user_id: int, amount: int) -> None:
+        raise NotImplementedError
+
+    def apply(self, deltas: Mapping[int, int], floors: Mapping[int, int]) -> Optional[Dict[int, int]]:
+        raise NotImplementedError
+
+    # get() がメモリ参照だけで済む（イベントループ上で直接呼んでよい）なら True
+    in_memory = False
+
+    def items(self) -> Iterator[Tuple[int, int]]:
+        raise NotImplementedError
+
+    @contextmanager
+    def group(self) -> Iterator[None]:
+        """ブロック内の書き込みをまとめて 1 回の永続化（グループコミット）にする。"""
+        yield
+        self.flush()
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class JsonBackend(Backend):
+    """balances.json スナップショット + 追記ジャーナル + メモリ上の dict。
+
+    残高は起動時に一度だけ読み込み、以後はメモリ上の dict が正。
+    変更はジャーナル行として溜め、バックグラウンドスレッドが定期的に追記する。
+    ロック順序は常に _io_lock -> _lock。
+    """
+
+    in_memory = True
+
+    def __init__(self, data_file: Path = DATA_FILE, journal_file: Path = JOURNAL_FILE,
+                 flush_interval: float = FLUSH_INTERVAL, flush_every: int = FLUSH_EVERY,
+                 compact_every: int = COMPACT_EVERY):
+        self.data_file = data_file
+        self.journal_file = journal_file
+        self.flush_interval = flush_interval
+        self.flush_every = flush_every
+        self.compact_every = compact_every
+
+        self._lock = threading.RLock()
+        self._io_lock = threading.Lock()
+        self._pending: List[str] = []
+        self._group_depth = 0
+        self._data = self._load_data()
+        self._seq, self._journal_len = self._replay_journal(self._data)
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        if self.flush_interval > 0:
+            self._flusher = threading.Thread(target=self._flush_loop, name="bank-flusher", daemon=True)
+            self._flusher.start()
+
+    # --- 永続化 ---
+
+    def _load_data(self) -> Dict[int, int]:
+        if not self.data_file.exists():
+            return {}
+        with self.data_file.open("r", encoding="utf-8") as f:
+            raw = json.load(f)
+        return {int(k): int(v) for k, v in raw.items()}
+
+    def _save_data(self, data: Dict[int, int]) -> None:
+        # 一時ファイルに書いてから置き換える（書きかけのファイルを残さない）
+        tmp = self.data_file.with_name(self.data_file.name + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump({str(k): v for k, v in data.items()}, f, ensure_ascii=False, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.data_file)
+
+    def _snapshot(self) -> Dict[int, int]:
+        # _lock 内で呼ぶ。_save_data に渡す内容
+        return dict(self._data)
+
+    def _lookup(self, user_id: int) -> int:
+        # _data に無いユーザーの残高（サブクラスがディスク上のスナップショットを引く）
+        return 0
+
+    def _replay_journal(self, data: Dict[int, int]) -> Tuple[int, int]:
+        """ジャーナルをスナップショットに適用し (最後の seq, 行数) を返す。
+
+        各レコードは変更後の残高を持つので、同じ行を二重に適用しても結果は変わらない。
+        末尾の書きかけの行（クラッシュ時）は読み飛ばす。
+        """
+        if not self.journal_file.exists():
+            return 0, 0
+        seq = 0
+        count = 0
+        with self.journal_file.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    break
+                for uid, _delta, bal in rec["ch"]:
+                    data[int(uid)] = int(bal)
+                seq = max(seq, int(rec["seq"]))
+                count += 1
+        return seq, count
+
+    def _record(self, changes: List[Tuple[int, int, int]]) -> bool:
+        """変更 (user, delta, 新残高) をジャーナル行として積む。_lock 内で呼ぶ。
+
+        すぐに書き出すべきなら True を返す（呼び出し側が _lock の外で flush する）。
+        """
+        self._seq += 1
+        self._pending.append(json.dumps({"seq": self._seq, "ch": changes}, separators=(",", ":")) + "\n")
+        if self._group_depth:
+            return False
+        if self.flush_interval <= 0:
+            return True
+        if len(self._pending) >= self.flush_every:
+            self._wake.set()
+        return False
+
+    def _flush_loop(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+                if self._journal_len >= self.compact_every:
+                    self.compact()
+            except Exception as e:
+                print(f"[bank] flush failed: {e}")
+
+    def _append_pending(self) -> None:
+        # _io_lock 内で呼ぶ
+        with self._lock:
+            lines, self._pending = self._pending, []
+        if not lines:
+            return
+        with self.journal_file.open("a", encoding="utf-8") as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_len += len(lines)
+
+    @contextmanager
+    def group(self) -> Iterator[None]:
+        with self._lock:
+            self._group_depth += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._group_depth -= 1
+            # ブロック内の全レコードを 1 回の追記 + fsync で永続化する
+            self.flush()
+
+    def flush(self) -> None:
+        """未保存の変更をジャーナルへ追記する。"""
+        with self._io_lock:
+            self._append_pending()
+
+    def compact(self) -> None:
+        """ジャーナルを新しい balances.json スナップショットへ畳み込み、ジャーナルを空にする。"""
+        with self._io_lock:
+            # 先に残りを追記しておけば、置き換え直後に落ちても再生結果はスナップショットと一致する
+            with self._lock:
+                self._append_pending()
+                snapshot = self._snapshot()
+            self._save_data(snapshot)
+            with self.journal_file.open("w", encoding="utf-8") as f:
+                f.flush()
+                os.fsync(f.fileno())
+            self._journal_len = 0
+
+    def close(self) -> None:
+        """フラッシャーを止めて最終状態を書き出す。"""
+        self._stop.set()
+        self._wake.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=10)
+            self._flusher = None
+        if self._pending or self._journal_len:
+            self.compact()
+
+    # --- 残高操作 ---
+
+    def get(self, user_id: int) -> int:
+        bal = self._data.get(user_id)
+        return self._lookup(user_id) if bal is None else bal
+
+    def set(self, user_id: int, amount: int) -> None:
+        with self._lock:
+            old = self.get(user_id)
+            self._data[user_id] = amount
+            sync = self._record([(user_id, amount - old, amount)])
+        if sync:
+            self.flush()
+
+    def apply(self, deltas: Mapping[int, int], floors: Mapping[int, int]) -> Optional[Dict[int, int]]:
+        data = self._data
+        with self._lock:
+            for uid, delta in deltas.items():
+                if delta < 0 and uid in floors and self.get(uid) + delta < floors[uid]:
+                    return None
+            changes = []
+            result = {}
+            for uid, delta in deltas.items():
+                bal = self.get(uid) + delta
+                data[uid] = bal
+                result[uid] = bal
+                changes.append((uid, delta, bal))
+            # 複数ユーザーの変更も 1 レコードにまとめて原子的に記録
+            sync = self._record(changes)
+        if sync:
+            self.flush()
+        return result
+
+    def items(self) -> Iterator[Tuple[int, int]]:
+        with self._lock:
+            snapshot = list(self._data.items())
+        return iter(snapshot)
+
+
+def _open_backend() -> Backend:
+    if BACKEND == "json":
+        return JsonBackend()
+    if BACKEND == "sqlite":
+        import bank_sqlite
+        return bank_sqlite.SqliteBackend(SQLITE_PATH)
+    if BACKEND == "binary":
+        import bank_binary
+        return bank_binary.BinaryBackend(BINARY_PATH)
+    if BACKEND == "sharded":
+        import bank_sharded
+        return bank_sharded.ShardedBackend(SHARD_DIR)
+    raise RuntimeError(f"未知の BANK_BACKEND です: {BACKEND}")
+
+
+_backend: Optional[Backend] = None
+_backend_lock = threading.Lock()
 
 
-def _save_data(data: Dict[str, int]) -> None:
-    with DATA_FILE.open("w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+def get_backend() -> Backend:
+    """現在のバックエンドを返す（初回呼び出し時に開く）。"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _open_backend()
+    return _backend
+
+
+def flush() -> None:
+    """未保存の変更をディスクへ書き出す。"""
+    if _backend is not None:
+        _backend.flush()
+    led = ledger.get_ledger()
+    if led is not None:
+        led.flush()
+
+
+def close() -> None:
+    """バックエンドを閉じて最終状態を書き出す（シャットダウン時に呼ぶ）。"""
+    global _backend, _rank
+    with _backend_lock:
+        if _backend is not None:
+            _backend.close()
+            _backend = None
+    with _lock:
+        _rank = None
+        _close_economy()
+    ledger.close()
+
+
+atexit.register(close)
+
+
+# --- 公開 API ---
+#
+# 返す残高はすべて「利用可能残高」＝ 確定残高 − 進行中の賭けで予約中の額。
+# 予約（エスクロー）はメモリ上だけで管理し、確定時に 1 回だけストレージへ書く。
+# 書き込みはすべて台帳（ledger.py）にも種別付きで記録する。
+
+_lock = threading.RLock()
+_holds: Dict[int, int] = {}
+# 残高ランキング（初回の問い合わせ時に一度だけ全件から構築し、以後は書き込みごとに更新）
+_rank: Optional[RankIndex] = None
+# 経済全体の集計（economy.py。開いたときに読み込み、以後は書き込みと精算のたびに更新）
+_economy: Optional[economy.Economy] = None
+# 保存する方のゲームの集計（ラウンドログに書き終えた行の分だけ。チェックポイントごとに rng.mark() の分を足す）
+_logged = economy.Economy()
+_last_checkpoint = 0.0
+_ticket_ids = itertools.count(1)
+
+
+class Ticket:
+    """reserve() が返す賭け金の予約票。"""
+
+    __slots__ = ("id", "user_id", "amount", "balance", "closed", "game")
+
+    def __init__(self, user_id: int, amount: int, balance: int, game: Optional[str] = None):
+        self.id = next(_ticket_ids)
+        self.user_id = user_id
+        self.amount = amount
+        self.balance = balance  # 予約直後の利用可能残高（表示用）
+        self.closed = False
+        self.game = game  # 台帳に残すゲーム名
+
+
+def _held(user_id: int) -> int:
+    return _holds.get(user_id, 0)
+
+
+def _release(ticket: Ticket) -> None:
+    # _lock 内で呼ぶ
+    ticket.closed = True
+    left = _holds.get(ticket.user_id, 0) - ticket.amount
+    if left > 0:
+        _holds[ticket.user_id] = left
+    else:
+        _holds.pop(ticket.user_id, None)
+
+
+def _log(user_id: int, kind: str, delta: int, balance: int,
+         counterpart: Optional[int] = None, game: Optional[str] = None) -> None:
+    # _lock 内で呼ぶ。balance は増減後の利用可能残高
+    led = ledger.get_ledger()
+    if led is not None:
+        led.append(user_id, kind, delta, balance, counterpart, game)
+
+
+def _economy_state() -> economy.Economy:
+    # _lock 内で呼ぶ。保存した集計に、その後ラウンドログに書かれた行の分だけを足す。
+    # 正常に閉じていなければ（初回も）残高側は残高の全件から数え直す
+    global _economy, _logged
+    if _economy is None:
+        saved, clean, rounds_at = economy.load()
+        end, _ = rng.mark()  # ここまでの行は下で読むので、書き込み済みの分の数は捨てる
+        if saved is not None and clean and rounds_at is None:
+            econ = saved  # rounds_at のない古いファイル: 正常に閉じていればログの末尾まで数えてある
+        elif saved is not None and clean:
+            econ = saved
+            economy.replay(econ, rng.ROUNDS_FILE, rounds_at, end)
+        elif saved is not None and rounds_at is not None:
+            econ = economy.recompute(get_backend().items(), rng.ROUNDS_FILE, saved, rounds_at, end)
+        else:
+            econ = economy.recompute(get_backend().items(), rng.ROUNDS_FILE, end=end)
+        _logged = economy.Economy(games={name: list(g) for name, g in econ.games.items()})
+        _economy = econ
+        # 開いている間は「正常に閉じた」印を消しておく（落ちたら次の起動で残高側を数え直す）
+        _checkpoint_economy(clean=False)
+    return _economy
+
+
+def _checkpoint_economy(clean: bool) -> None:
+    # _lock 内で呼ぶ。ゲームの集計はラウンドログに書き終えた分だけを、書いた位置と一緒に保存する
+    # （まだログに書かれていない精算を保存すると、起動時にその行を読んで二重に数えてしまう）
+    global _last_checkpoint
+    end, written = rng.mark()
+    _logged.add_games(written)
+    _logged.circulation, _logged.funded = _economy.circulation, _economy.funded
+    economy.save(_logged, clean=clean, rounds_at=end)
+    _last_checkpoint = time.monotonic()
+
+
+def _maybe_checkpoint() -> None:
+    # _lock 内で呼ぶ（グループコミットのたびに）。ECONOMY_CHECKPOINT 秒ごとに集計を保存する
+    if _economy is not None and time.monotonic() - _last_checkpoint >= economy.CHECKPOINT_INTERVAL:
+        _checkpoint_economy(clean=False)
+
+
+def _close_economy() -> None:
+    # _lock 内で、バックエンドを閉じた後に呼ぶ
+    global _economy
+    if _economy is not None:
+        _checkpoint_economy(clean=True)
+        _economy = None
+
+
+def _apply(deltas: Mapping[int, int], floors: Mapping[int, int], kind: Optional[str] = None,
+           counterparts: Optional[Mapping[int, int]] = None) -> Optional[Dict[int, int]]:
+    # すべての書き込みはここを通し、ランキングと経済の集計を差分更新して台帳に記録する（_lock 内で呼ぶ）
+    econ = _economy_state()
+    result = get_backend().apply(deltas, floors)
+    if result is None:
+        return None
+    for uid, bal in result.items():
+        econ.balance(bal - deltas[uid], bal)
+    if _rank is not None:
+        for uid, bal in result.items():
+            _rank.update(uid, bal)
+    if kind is not None:
+        for uid, delta in deltas.items():
+            _log(uid, kind, delta, result[uid] - _held(uid), (counterparts or {}).get(uid))
+    return result
 
 
 def get_balance(user_id: int) -> int:
-    data = _load_data()
-    return int(data.get(str(user_id), 0))
+    uid = int(user_id)
+    return get_backend().get(uid) - _held(uid)
 
 
 def set_balance(user_id: int, amount: int) -> None:
-    data = _load_data()
-    data[str(user_id)] = int(amount)
-    _save_data(data)
+    uid = int(user_id)
+    with _lock:
+        committed = int(amount) + _held(uid)
+        econ = _economy_state()
+        before = get_backend().get(uid)
+        get_backend().set(uid, committed)
+        econ.balance(before, committed)
+        if _rank is not None:
+            _rank.update(uid, committed)
+        _log(uid, "set", committed - before, int(amount))
+
+
+def add_balance(user_id: int, amount: int, kind: str = "grant") -> int:
+    uid = int(user_id)
+    with _lock:
+        return _apply({uid: int(amount)}, {}, kind)[uid] - _held(uid)
+
+
+def try_debit(user_id: int, amount: int, kind: str = "debit") -> Optional[int]:
+    """残高が足りれば amount を差し引き、新しい残高を返す。足りなければ何もせず None。
 
+    残高チェックと差し引きは 1 回の原子的な操作で行う。
+    """
+    uid = int(user_id)
+    with _lock:
+        result = _apply({uid: -int(amount)}, {uid: _held(uid)}, kind)
+        return None if result is None else result[uid] - _held(uid)
 
-def add_balance(user_id: int, amount: int) -> int:
-    bal = get_balance(user_id)
-    new_bal = bal + int(amount)
-    set_balance(user_id, new_bal)
-    return new_bal
+
+def debit_then_credit(from_id: int, amount: int, to_id: int, credit: Optional[int] = None,
+                      kind: str = "transfer") -> Optional[int]:
+    """from_id から amount を差し引き、to_id に credit（既定は amount）を加算する。
+
+    from_id の残高が足りなければどちらも行わず None、成功時は from_id の新しい残高を返す。
+    """
+    from_id, to_id, amount = int(from_id), int(to_id), int(amount)
+    credit = amount if credit is None else int(credit)
+    with _lock:
+        if from_id == to_id:
+            if get_balance(from_id) < amount:
+                return None
+            deltas = {from_id: credit - amount}
+        else:
+            deltas = {from_id: -amount, to_id: credit}
+        result = _apply(deltas, {from_id: _held(from_id)}, kind, {from_id: to_id, to_id: from_id})
+        return None if result is None else result[from_id] - _held(from_id)
 
 
 def transfer(from_id: int, to_id: int, amount: int) -> bool:
     amount = int(amount)
     if amount <= 0:
         return False
-    from_bal = get_balance(from_id)
-    if from_bal < amount:
-        return False
-    # 差し引きと加算
-    add_balance(from_id, -amount)
-    add_balance(to_id, amount)
-    return True
\ No newline at end of file
+    return debit_then_credit(from_id, amount, to_id) is not None
+
+
+def apply_batch(deltas: Mapping[int, int], *, allow_negative: bool = False,
+                kind: str = "grant") -> Optional[Dict[int, int]]:
+    """複数ユーザーへの増減をまとめて 1 回の書き込みで原子的に適用する。
+
+    allow_negative が False のとき、利用可能残高がマイナスになるユーザーが 1 人でもいれば
+    何も変更せず None を返す。成功時は各ユーザーの新しい利用可能残高を返す。
+    """
+    batch: Dict[int, int] = {}
+    for uid, delta in deltas.items():
+        if isinstance(delta, bool) or not isinstance(delta, int):
+            raise TypeError(f"delta は int で指定してください: {uid}={delta!r}")
+        if delta:
+            batch[int(uid)] = batch.get(int(uid), 0) + delta
+    if not batch:
+        return {}
+    with _lock:
+        floors = {} if allow_negative else {uid: _held(uid) for uid, d in batch.items() if d < 0}
+        result = _apply(batch, floors, kind)
+        if result is None:
+            return None
+        return {uid: bal - _held(uid) for uid, bal in result.items()}
+
+
+def reserve(user_id: int, amount: int, game: Optional[str] = None) -> Optional[Ticket]:
+    """賭け金 amount を予約する。利用可能残高が足りなければ None。
+
+    予約中の額は利用可能残高から除かれるが、ストレージには書き込まない。
+    game は精算時に台帳へ残すゲーム名。
+    """
+    uid, amount = int(user_id), int(amount)
+    with _lock:
+        available = get_balance(uid)
+        if amount <= 0 or available < amount:
+            return None
+        _holds[uid] = _held(uid) + amount
+        return Ticket(uid, amount, available - amount, game)
+
+
+def extend(ticket: Ticket, extra: int) -> bool:
+    """予約額を extra だけ増やす（ダブルダウンなど）。足りなければ False。"""
+    extra = int(extra)
+    with _lock:
+        if ticket.closed or extra <= 0 or get_balance(ticket.user_id) < extra:
+            return False
+        _holds[ticket.user_id] = _held(ticket.user_id) + extra
+        ticket.amount += extra
+        ticket.balance -= extra
+        return True
+
+
+def settle(ticket: Ticket, payout: int) -> Optional[int]:
+    """予約を確定し、掛け金を差し引いて payout（掛け金返却分を含む）を加算する。
+
+    書き込みは差額の 1 回だけ（差額 0 なら書き込みなし）。精算後の利用可能残高を返す。
+    既に精算・返却済みなら何もせず None を返す。台帳には賭け（-掛け金）と配当（+payout）を
+    別々の行で残す。
+    """
+    payout = int(payout)
+    with _lock:
+        if ticket.closed:
+            return None
+        uid = ticket.user_id
+        delta = payout - ticket.amount
+        _release(ticket)
+        if delta:
+            _apply({uid: delta}, {})
+        if ticket.game is not None:
+            _economy_state().settle(ticket.game, ticket.amount, payout)
+        ticket.balance = get_balance(uid)
+        _log(uid, "bet", -ticket.amount, ticket.balance - payout, game=ticket.game)
+        if payout:
+            _log(uid, "payout", payout, ticket.balance, game=ticket.game)
+        return ticket.balance
+
+
+def settle_batch(items: Iterable[Tuple[Ticket, int]]) -> List[Optional[int]]:
+    """複数の予約をまとめて精算する（卓の精算用）。
+
+    items は (予約票, payout) の並び。書き込みは全員分の差額をまとめた 1 回だけで、台帳には
+    settle() と同じく 1 人ごとに賭けと配当の行を残す。items と同じ順に精算後の利用可能残高を
+    返す（既に精算・返却済みの予約は None）。
+    """
+    items = [(t, int(p)) for t, p in items]
+    with _lock:
+        live = [not t.closed for t, _ in items]
+        deltas: Dict[int, int] = {}
+        for (t, p), ok in zip(items, live):
+            if ok:
+                _release(t)
+                deltas[t.user_id] = deltas.get(t.user_id, 0) + p - t.amount
+        deltas = {uid: d for uid, d in deltas.items() if d}
+        if deltas:
+            _apply(deltas, {})
+        econ = _economy_state()
+        for (t, p), ok in zip(items, live):
+            if ok:
+                if t.game is not None:
+                    econ.settle(t.game, t.amount, p)
+                t.balance = get_balance(t.user_id)
+                _log(t.user_id, "bet", -t.amount, t.balance - p, game=t.game)
+                if p:
+                    _log(t.user_id, "payout", p, t.balance, game=t.game)
+        return [t.balance if ok else None for (t, _), ok in zip(items, live)]
+
+
+def refund(ticket: Ticket) -> Optional[int]:
+    """予約を取り消して掛け金を戻す。既に精算・返却済みなら None。"""
+    with _lock:
+        if ticket.closed:
+            return None
+        _release(ticket)
+        ticket.balance = get_balance(ticket.user_id)
+        return ticket.balance
+
+
+def history(user_id: int, offset: int = 0, limit: int = 10) -> List[Dict[str, Any]]:
+    """台帳から user_id の増減履歴を新しい順に返す（台帳を使わない設定なら空）。"""
+    led = ledger.get_ledger()
+    return [] if led is None else led.history(int(user_id), offset, limit)
+
+
+def history_count(user_id: int) -> int:
+    led = ledger.get_ledger()
+    return 0 if led is None else led.count(int(user_id))
+
+
+def _rank_index() -> RankIndex:
+    global _rank
+    with _lock:
+        if _rank is None:
+            _rank = RankIndex(get_backend().items())
+        return _rank
+
+
+def top_balances(offset: int = 0, limit: int = 10) -> List[Tuple[int, int]]:
+    """残高の多い順に (user_id, 残高) を offset から limit 件返す。"""
+    with _lock:
+        return _rank_index().top(offset, limit)
+
+
+def rank_of(user_id: int) -> Optional[Tuple[int, int]]:
+    """(1 始まりの順位, 残高) を返す。残高 0 以下ならランキング外で None。"""
+    uid = int(user_id)
+    with _lock:
+        rank = _rank_index().rank_of(uid)
+        if rank is None:
+            return None
+        return rank, get_backend().get(uid)
+
+
+def ranked_count() -> int:
+    """ランキング対象（残高が正）のユーザー数。"""
+    with _lock:
+        return len(_rank_index())
+
+
+def reshard(k: int) -> Optional[int]:
+    """sharded バックエンドのパーティション数を k に変える。元の数を返す（sharded でなければ None）。
+
+    動いているボットからはこれ（areshard）だけを使う。別プロセスで同じディレクトリを開かないこと。
+    """
+    with _lock:
+        backend = get_backend()
+        if not hasattr(backend, "reshard"):
+            return None
+        old = backend.k
+        backend.reshard(k)
+        return old
+
+
+def economy_stats() -> Dict[str, Any]:
+    """流通量・残高のある口座数・ゲームごとの賭け金 / 配当 / 胴元の収支（economy.Economy.summary()）。
+
+    書き込みのたびに更新している集計を返すだけで、残高の全件は読まない。
+    """
+    with _lock:
+        return _economy_state().summary()
+
+
+# --- 非同期 API ---
+#
+# イベントループを止めないための async 版。書き込みは単一の書き込みタスクがキューから
+# 取り出し、BANK_GROUP_COMMIT_MS 以内に溜まった分を executor 上でまとめて 1 回の
+# グループコミットとして実行してから、各呼び出し元の Future を解決する。
+
+GROUP_COMMIT_WINDOW = float(os.getenv("BANK_GROUP_COMMIT_MS", "2")) / 1000
+GROUP_COMMIT_MAX = 256
+
+
+def _commit_group(batch: List[Tuple[Callable[[], Any], "asyncio.Future"]]) -> List[Tuple[bool, Any]]:
+    # executor スレッドで実行される
+    results: List[Tuple[bool, Any]] = []
+    with _lock, get_backend().group():
+        for fn, _fut in batch:
+            try:
+                results.append((True, fn()))
+            except Exception as e:
+                results.append((False, e))
+        _maybe_checkpoint()
+    led = ledger.get_ledger()
+    if led is not None:
+        led.flush()
+    return results
+
+
+class _Writer:
+    """バンクへの書き込みを直列化する単一の書き込みタスク。"""
+
+    def __init__(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.queue: "asyncio.Queue[Optional[Tuple[Callable[[], Any], asyncio.Future]]]" = asyncio.Queue()
+        self.task = self.loop.create_task(self._run(), name="bank-writer")
+
+    async def submit(self, fn: Callable[[], Any]) -> Any:
+        fut = self.loop.create_future()
+        self.queue.put_nowait((fn, fut))
+        return await fut
+
+    async def _run(self) -> None:
+        stop = False
+        while not stop:
+            item = await self.queue.get()
+            if item is None:
+                break
+            batch = [item]
+            # 少しだけ待って、その間に届いた書き込みを同じコミットにまとめる
+            if GROUP_COMMIT_WINDOW > 0:
+                await asyncio.sleep(GROUP_COMMIT_WINDOW)
+            while len(batch) < GROUP_COMMIT_MAX and not self.queue.empty():
+                item = self.queue.get_nowait()
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            try:
+                results = await self.loop.run_in_executor(None, _commit_group, batch)
+            except Exception as e:
+                results = [(False, e)] * len(batch)
+            for (ok, value), (_fn, fut) in zip(results, batch):
+                if fut.done():
+                    continue
+                if ok:
+                    fut.set_result(value)
+                else:
+                    fut.set_exception(value)
+
+    async def close(self) -> None:
+        self.queue.put_nowait(None)
+        await self.task
+
+
+_writer: Optional[_Writer] = None
+
+
+def _submit(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> "Awaitable[Any]":
+    global _writer
+    loop = asyncio.get_running_loop()
+    if _writer is None or _writer.loop is not loop or _writer.task.done():
+        _writer = _Writer()
+    return _writer.submit(functools.partial(fn, *args, **kwargs))
+
+
+async def _off_loop(fn: Callable[..., Any], *args: Any) -> Any:
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(fn, *args))
+
+
+def _open() -> Backend:
+    backend = get_backend()
+    with _lock:
+        _economy_state()
+    return backend
+
+
+async def aopen() -> Backend:
+    """バックエンドと経済の集計をイベントループ外で開く（起動時の読み込みでループを止めない）。"""
+    return await _off_loop(_open)
+
+
+async def aclose() -> None:
+    """溜まっている書き込みを全てコミットしてから書き込みタスクを止める。"""
+    global _writer
+    if _writer is not None and not _writer.task.done():
+        await _writer.close()
+    _writer = None
+
+
+async def aget_balance(user_id: int) -> int:
+    backend = _backend or await aopen()
+    if backend.in_memory:
+        return get_balance(user_id)
+    return await _off_loop(get_balance, user_id)
+
+
+async def aset_balance(user_id: int, amount: int) -> None:
+    return await _submit(set_balance, user_id, amount)
+
+
+async def aadd_balance(user_id: int, amount: int, kind: str = "grant") -> int:
+    return await _submit(add_balance, user_id, amount, kind)
+
+
+async def atry_debit(user_id: int, amount: int, kind: str = "debit") -> Optional[int]:
+    return await _submit(try_debit, user_id, amount, kind)
+
+
+async def adebit_then_credit(from_id: int, amount: int, to_id: int, credit: Optional[int] = None,
+                             kind: str = "transfer") -> Optional[int]:
+    return await _submit(debit_then_credit, from_id, amount, to_id, credit, kind)
+
+
+async def atransfer(from_id: int, to_id: int, amount: int) -> bool:
+    return await _submit(transfer, from_id, to_id, amount)
+
+
+async def aapply_batch(deltas: Mapping[int, int], *, allow_negative: bool = False,
+                       kind: str = "grant") -> Optional[Dict[int, int]]:
+    return await _submit(apply_batch, deltas, allow_negative=allow_negative, kind=kind)
+
+
+async def areserve(user_id: int, amount: int, game: Optional[str] = None) -> Optional[Ticket]:
+    return await _submit(reserve, user_id, amount, game)
+
+
+async def aextend(ticket: Ticket, extra: int) -> bool:
+    return await _submit(extend, ticket, extra)
+
+
+async def asettle(ticket: Ticket, payout: int) -> Optional[int]:
+    return await _submit(settle, ticket, payout)
+
+
+async def asettle_batch(items: Iterable[Tuple[Ticket, int]]) -> List[Optional[int]]:
+    return await _submit(settle_batch, list(items))
+
+
+async def arefund(ticket: Ticket) -> Optional[int]:
+    return await _submit(refund, ticket)
+
+
+async def ahistory(user_id: int, offset: int = 0, limit: int = 10) -> List[Dict[str, Any]]:
+    return await _off_loop(history, user_id, offset, limit)
+
+
+async def ahistory_count(user_id: int) -> int:
+    return await _off_loop(history_count, user_id)
+
+
+async def atop_balances(offset: int = 0, limit: int = 10) -> List[Tuple[int, int]]:
+    return await _off_loop(top_balances, offset, limit)
+
+
+async def arank_of(user_id: int) -> Optional[Tuple[int, int]]:
+    return await _off_loop(rank_of, user_id)
+
+
+async def aranked_count() -> int:
+    return await _off_loop(ranked_count)
+
+
+async def aeconomy_stats() -> Dict[str, Any]:
+    return await _off_loop(economy_stats)
+
+
+async def areshard(k: int) -> Optional[int]:
+    # 書き込みタスクを通すので、前後の書き込みと混ざらない
+    return await _submit(reshard, k)
@@ -0,0 +1,220 @@
+"""固定長バイナリの残高スナップショット（BANK_BACKEND=binary）。
+
+ファイル形式（リトルエンディアン）:
+    ヘッダ 16 バイト: magic b"NUGB", version:u32, count:u64
+    レコード 16 バイト × count: user_id:u64, balance:i64（user_id 昇順）
+
+スナップショットは mmap して二分探索で引くので、起動時に全件を読み込まない。
+常駐メモリは実際に触れたページと、前回の畳み込み以降に変わったユーザー分だけになる。
+変更の記録と畳み込みは json バックエンドと同じジャーナル方式。
+
+変換:
+    python bank_binary.py to-binary [balances.json] [balances.bin]
+    python bank_binary.py to-json   [balances.bin]  [balances.json]
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+import bank
+
+MAGIC = b"NUGB"
+VERSION = 1
+_HEADER = struct.Struct("<4sIQ")
+_RECORD = struct.Struct("<Qq")
+_CHUNK = 65536  # 書き出し時に一度に組み立てるレコード数
+
+
+class Snapshot:
+    """mmap したバイナリスナップショット（読み取り専用）。"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = None
+        self._mm: Optional[mmap.mmap] = None
+        self._views = []
+        self._ids = self._bals = memoryview(b"").cast("Q")
+        self.count = 0
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            return
+        self._file = self.path.open("rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path} は対応していない残高ファイルです")
+        whole = memoryview(self._mm)
+        body = whole[_HEADER.size:_HEADER.size + count * _RECORD.size]
+        # [id0, bal0, id1, bal1, ...] として 8 バイト単位で参照する
+        self._ids = body.cast("Q")
+        self._bals = body.cast("q")
+        self._views = [self._ids, self._bals, body, whole]
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def find(self, user_id: int) -> Optional[int]:
+        ids = self._ids
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            if ids[2 * mid] < user_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and ids[2 * lo] == user_id:
+            return self._bals[2 * lo + 1]
+        return None
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        ids, bals = self._ids, self._bals
+        for i in range(0, 2 * self.count, 2):
+            yield ids[i], bals[i + 1]
+
+    def close(self) -> None:
+        # memoryview を先に解放しないと mmap を閉じられない
+        for v in self._views:
+            v.release()
+        self._views = []
+        self.count = 0
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def write_snapshot(path: Path, records: Iterable[Tuple[int, int]]) -> int:
+    """user_id 昇順の (user_id, 残高) を書き出す（一時ファイル経由で置き換え）。件数を返す。"""
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    count = 0
+    with tmp.open("wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, 0))
+        buf = array("q")
+        for uid, bal in records:
+            buf.append(uid)
+            buf.append(bal)
+            count += 1
+            if len(buf) >= 2 * _CHUNK:
+                f.write(buf.tobytes())
+                del buf[:]
+        f.write(buf.tobytes())
+        # 件数は書き終えてからヘッダに入れる
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, VERSION, count))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return count
+
+
+def _merge(base: Snapshot, overlay: Dict[int, int]) -> Iterator[Tuple[int, int]]:
+    # 昇順のスナップショットと変更分をマージする（変更分が優先）
+    keys = sorted(overlay)
+    j = 0
+    for uid, bal in base:
+        while j < len(keys) and keys[j] < uid:
+            yield keys[j], overlay[keys[j]]
+            j += 1
+        if j < len(keys) and keys[j] == uid:
+            yield uid, overlay[uid]
+            j += 1
+        else:
+            yield uid, bal
+    for k in keys[j:]:
+        yield k, overlay[k]
+
+
+class BinaryBackend(bank.JsonBackend):
+    """mmap したバイナリスナップショット + ジャーナル。
+
+    JsonBackend の _data には前回の畳み込み以降に変わったユーザーだけが入る。
+    """
+
+    in_memory = True
+
+    def __init__(self, path: Path, **kwargs):
+        self._base = Snapshot(path)
+        super().__init__(Path(path), Path(str(path) + ".journal"), **kwargs)
+
+    def _load_data(self) -> Dict[int, int]:
+        return {}
+
+    def _lookup(self, user_id: int) -> int:
+        bal = self._base.find(user_id)
+        return 0 if bal is None else bal
+
+    def _snapshot(self) -> Dict[int, int]:
+        return dict(self._data)
+
+    def _save_data(self, overlay: Dict[int, int]) -> None:
+        # _io_lock 内で呼ばれる。スナップショットは畳み込み以外では変わらない
+        write_snapshot(self.data_file, _merge(self._base, overlay))
+        with self._lock:
+            # 古いスナップショットはロックなしで読んでいる途中の呼び出しがあり得るので
+            # 明示的には閉じず、参照がなくなった時点で解放させる
+            self._base = Snapshot(self.data_file)
+            # 書き出し中に変わっていないユーザーはスナップショットに任せる
+            for uid, bal in overlay.items():
+                if self._data.get(uid) == bal:
+                    del self._data[uid]
+
+    def items(self) -> Iterator[Tuple[int, int]]:
+        # 読んでいる間にスナップショットが差し替えられないよう _io_lock を持つ（書き込みは止めない）
+        with self._io_lock:
+            with self._lock:
+                overlay = dict(self._data)
+                base = self._base
+            return iter(list(_merge(base, overlay)))
+
+    def close(self) -> None:
+        super().close()
+        self._base.close()
+
+
+def json_to_binary(json_path: Path, bin_path: Path) -> int:
+    """balances.json（+ 未畳み込みのジャーナル）をバイナリ形式へ変換する。件数を返す。"""
+    src = bank.JsonBackend(Path(json_path), Path(json_path).with_suffix(".journal"), flush_interval=0)
+    return write_snapshot(bin_path, sorted(src.items()))
+
+
+def binary_to_json(bin_path: Path, json_path: Path) -> int:
+    """バイナリ形式（+ 未畳み込みのジャーナル）を balances.json 形式へ変換する。件数を返す。"""
+    src = BinaryBackend(Path(bin_path), flush_interval=0)
+    try:
+        data = {str(uid): bal for uid, bal in src.items()}
+    finally:
+        src._base.close()
+    tmp = Path(json_path).with_name(Path(json_path).name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, json_path)
+    return len(data)
+
+
+def main(argv) -> int:
+    if len(argv) < 2 or argv[1] not in ("to-binary", "to-json"):
+        print("使い方: python bank_binary.py to-binary [balances.json] [balances.bin]\n"
+              "        python bank_binary.py to-json [balances.bin] [balances.json]")
+        return 2
+    if argv[1] == "to-binary":
+        src = Path(argv[2]) if len(argv) > 2 else bank.DATA_FILE
+        dst = Path(argv[3]) if len(argv) > 3 else bank.BINARY_PATH
+        n = json_to_binary(src, dst)
+    else:
+        src = Path(argv[2]) if len(argv) > 2 else bank.BINARY_PATH
+        dst = Path(argv[3]) if len(argv) > 3 else bank.DATA_FILE
+        n = binary_to_json(src, dst)
+    print(f"{n} 件の残高を {src} から {dst} に変換しました。")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
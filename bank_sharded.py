@@ -0,0 +1,299 @@
+"""ユーザー ID のハッシュで K 個のパーティションに分けた残高ストア（BANK_BACKEND=sharded）。
+
+書き出しは変更のあったパーティションだけを書き直すので、1 回の書き込みコストは
+全ユーザー数ではなく 1 パーティションの大きさで決まる。複数パーティションにまたがる
+書き出し（送金など）はインテントファイルを使ってまとめて反映する。
+
+    balances.d/manifest.json          {"k": K, "version": n}
+    balances.d/part-v{n}-{i:04d}.json  パーティション i（{"user_id": 残高}）
+    balances.d/commit.json            複数パーティション反映中のインテント
+
+ツール（どちらもボットを止めた状態で実行する。動いているボットと同じディレクトリを
+別プロセスで開くと、互いの書き込みを上書きして残高が失われる。稼働中の再分割は
+ボットの /残高再分割 を使う）:
+    python bank_sharded.py migrate [balances.json] [balances.d] [K]
+    python bank_sharded.py reshard K [balances.d]
+"""
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Mapping, Optional, Set, Tuple
+
+import bank
+
+_MASK = (1 << 64) - 1
+
+
+def partition_of(user_id: int, k: int) -> int:
+    # Snowflake の下位ビットは偏るので乗算ハッシュで混ぜてから割る
+    return (((user_id * 0x9E3779B97F4A7C15) & _MASK) >> 32) % k
+
+
+def _write_json(path: Path, obj) -> None:
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, separators=(",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _fsync_dir(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class ShardedBackend(bank.Backend):
+    """パーティション分割した JSON ファイル + メモリ上の dict。
+
+    書き出しは json バックエンドと同じく BANK_FLUSH_INTERVAL ごと（0 以下で毎回）。
+    ロック順序は常に _io_lock -> _lock。
+    """
+
+    in_memory = True
+
+    def __init__(self, root: Path, k: int = bank.SHARDS,
+                 flush_interval: float = bank.FLUSH_INTERVAL, flush_every: int = bank.FLUSH_EVERY):
+        self.root = Path(root)
+        self.flush_interval = flush_interval
+        self.flush_every = flush_every
+        self._lock = threading.RLock()
+        self._io_lock = threading.Lock()
+        self._dirty: Set[int] = set()
+        self._changes = 0
+        self._group_depth = 0
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        manifest = self._read_manifest()
+        if manifest is None:
+            self.k, self.version = k, 0
+            self._parts: List[Dict[int, int]] = [{} for _ in range(k)]
+            self._write_manifest(k, 0)
+        else:
+            self.k, self.version = manifest["k"], manifest["version"]
+            self._recover()
+            self._parts = [self._load_part(i) for i in range(self.k)]
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        if self.flush_interval > 0:
+            self._flusher = threading.Thread(target=self._flush_loop, name="bank-flusher", daemon=True)
+            self._flusher.start()
+
+    # --- ファイル配置 ---
+
+    def _part_path(self, i: int, version: Optional[int] = None) -> Path:
+        v = self.version if version is None else version
+        return self.root / f"part-v{v}-{i:04d}.json"
+
+    def _read_manifest(self) -> Optional[dict]:
+        path = self.root / "manifest.json"
+        if not path.exists():
+            return None
+        with path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_manifest(self, k: int, version: int) -> None:
+        tmp = self.root / "manifest.json.tmp"
+        _write_json(tmp, {"k": k, "version": version})
+        os.replace(tmp, self.root / "manifest.json")
+        _fsync_dir(self.root)
+
+    def _load_part(self, i: int) -> Dict[int, int]:
+        path = self._part_path(i)
+        if not path.exists():
+            return {}
+        with path.open("r", encoding="utf-8") as f:
+            return {int(uid): int(bal) for uid, bal in json.load(f).items()}
+
+    def _recover(self) -> None:
+        """前回の複数パーティション反映が途中で止まっていれば最後まで進める。"""
+        intent = self.root / "commit.json"
+        if intent.exists():
+            with intent.open("r", encoding="utf-8") as f:
+                parts = json.load(f)["parts"]
+            for i in parts:
+                tmp = self._part_path(i).with_suffix(".tmp")
+                if tmp.exists():
+                    os.replace(tmp, self._part_path(i))
+            _fsync_dir(self.root)
+            intent.unlink()
+        # インテントが書かれる前に止まった書き出しは破棄（旧パーティションのまま一貫している）
+        for tmp in self.root.glob("part-*.tmp"):
+            tmp.unlink()
+
+    def _commit_parts(self, snapshot: Dict[int, Dict[int, int]]) -> None:
+        # _io_lock 内で呼ぶ
+        for i, data in snapshot.items():
+            _write_json(self._part_path(i).with_suffix(".tmp"), {str(k): v for k, v in data.items()})
+        if len(snapshot) > 1:
+            # ここから先はインテントがあるので、途中で落ちても起動時に全パーティション反映される
+            intent = self.root / "commit.json"
+            _write_json(intent, {"parts": sorted(snapshot)})
+            _fsync_dir(self.root)
+        for i in snapshot:
+            os.replace(self._part_path(i).with_suffix(".tmp"), self._part_path(i))
+        _fsync_dir(self.root)
+        if len(snapshot) > 1:
+            (self.root / "commit.json").unlink()
+
+    # --- 書き出し ---
+
+    def _mark(self, uids) -> bool:
+        # _lock 内で呼ぶ。すぐに書き出すべきなら True
+        for uid in uids:
+            self._dirty.add(partition_of(uid, self.k))
+        self._changes += 1
+        if self._group_depth:
+            return False
+        if self.flush_interval <= 0:
+            return True
+        if self._changes >= self.flush_every:
+            self._wake.set()
+        return False
+
+    def _flush_loop(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[bank] flush failed: {e}")
+
+    def flush(self) -> None:
+        """変更のあったパーティションだけを書き直す。"""
+        with self._io_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                snapshot = {i: dict(self._parts[i]) for i in self._dirty}
+                self._dirty = set()
+                self._changes = 0
+            self._commit_parts(snapshot)
+
+    @contextmanager
+    def group(self) -> Iterator[None]:
+        with self._lock:
+            self._group_depth += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._group_depth -= 1
+            self.flush()
+
+    def close(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=10)
+            self._flusher = None
+        self.flush()
+
+    def reshard(self, k: int) -> None:
+        """パーティション数を k に変更する。
+
+        このインスタンスを開いているプロセスの中なら稼働中に呼んでよい（ボットでは
+        bank.areshard() から書き込みタスク経由で呼ぶ）。別プロセスから同じディレクトリに
+        対して呼んではいけない（python bank_sharded.py reshard はボットを止めて使う）。
+
+        新しい配置のファイルを書き終えてから manifest を差し替えるので、途中で落ちても
+        旧配置のまま読み込める。
+        """
+        self.flush()
+        with self._io_lock:
+            with self._lock:
+                parts: List[Dict[int, int]] = [{} for _ in range(k)]
+                for part in self._parts:
+                    for uid, bal in part.items():
+                        parts[partition_of(uid, k)][uid] = bal
+                old_k, old_version = self.k, self.version
+                self._parts, self.k, self.version = parts, k, old_version + 1
+                self._dirty = set()
+                snapshot = {i: dict(p) for i, p in enumerate(parts)}
+            for i, data in snapshot.items():
+                _write_json(self._part_path(i), {str(u): b for u, b in data.items()})
+            _fsync_dir(self.root)
+            self._write_manifest(k, self.version)
+            for i in range(old_k):
+                self._part_path(i, old_version).unlink(missing_ok=True)
+
+    # --- 残高操作 ---
+
+    def get(self, user_id: int) -> int:
+        # ロックなしで読むので、再分割中でも一貫するよう k は len(parts) から求める
+        parts = self._parts
+        return parts[partition_of(user_id, len(parts))].get(user_id, 0)
+
+    def set(self, user_id: int, amount: int) -> None:
+        with self._lock:
+            self._parts[partition_of(user_id, self.k)][user_id] = amount
+            sync = self._mark((user_id,))
+        if sync:
+            self.flush()
+
+    def apply(self, deltas: Mapping[int, int], floors: Mapping[int, int]) -> Optional[Dict[int, int]]:
+        with self._lock:
+            k, parts = self.k, self._parts
+            for uid, delta in deltas.items():
+                if delta < 0 and uid in floors and parts[partition_of(uid, k)].get(uid, 0) + delta < floors[uid]:
+                    return None
+            result = {}
+            for uid, delta in deltas.items():
+                part = parts[partition_of(uid, k)]
+                result[uid] = part[uid] = part.get(uid, 0) + delta
+            sync = self._mark(deltas)
+        if sync:
+            self.flush()
+        return result
+
+    def items(self) -> Iterator[Tuple[int, int]]:
+        with self._lock:
+            snapshot = [kv for part in self._parts for kv in part.items()]
+        return iter(snapshot)
+
+
+def migrate(json_path: Path, root: Path, k: int) -> int:
+    """balances.json（+ 未畳み込みのジャーナル）をパーティション配置へ取り込む。件数を返す。"""
+    src = bank.JsonBackend(Path(json_path), Path(json_path).with_suffix(".journal"), flush_interval=0)
+    dst = ShardedBackend(root, k, flush_interval=0)
+    with dst.group():
+        n = 0
+        for uid, bal in src.items():
+            dst.set(uid, bal)
+            n += 1
+    dst.close()
+    return n
+
+
+def main(argv) -> int:
+    if len(argv) >= 3 and argv[1] == "reshard":
+        # オフライン専用: ボットのプロセスとは別に ShardedBackend を開くので、ボットは止めておくこと
+        root = Path(argv[3]) if len(argv) > 3 else bank.SHARD_DIR
+        b = ShardedBackend(root, flush_interval=0)
+        old = b.k
+        b.reshard(int(argv[2]))
+        b.close()
+        print(f"{root} のパーティション数を {old} から {b.k} に変更しました。")
+        return 0
+    if len(argv) >= 2 and argv[1] == "migrate":
+        src = Path(argv[2]) if len(argv) > 2 else bank.DATA_FILE
+        root = Path(argv[3]) if len(argv) > 3 else bank.SHARD_DIR
+        k = int(argv[4]) if len(argv) > 4 else bank.SHARDS
+        n = migrate(src, root, k)
+        print(f"{n} 件の残高を {root}（{k} パーティション）に取り込みました。")
+        return 0
+    print("使い方: python bank_sharded.py migrate [balances.json] [balances.d] [K]\n"
+          "        python bank_sharded.py reshard K [balances.d]\n"
+          "（どちらもボットを止めてから実行してください。稼働中の再分割はボットの /残高再分割 を使います）")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
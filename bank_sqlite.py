@@ -0,0 +1,149 @@
+"""SQLite による残高ストレージ（BANK_BACKEND=sqlite）。
+
+移行: python bank_sqlite.py migrate [balances.json] [balances.db]
+"""
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Mapping, Optional, Tuple
+
+import bank
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS balances (
+    user_id INTEGER PRIMARY KEY,
+    balance INTEGER NOT NULL
+) WITHOUT ROWID
+"""
+
+# 文は固定文字列にしておき、sqlite3 のステートメントキャッシュで再利用させる
+_SELECT = "SELECT balance FROM balances WHERE user_id = ?"
+_SET = ("INSERT INTO balances (user_id, balance) VALUES (?, ?) "
+        "ON CONFLICT(user_id) DO UPDATE SET balance = excluded.balance")
+_CREDIT = ("INSERT INTO balances (user_id, balance) VALUES (?, ?) "
+           "ON CONFLICT(user_id) DO UPDATE SET balance = balance + excluded.balance")
+# 条件付き減算: 残高が足りなければ 0 行更新になる
+_DEBIT = "UPDATE balances SET balance = balance + ? WHERE user_id = ? AND balance + ? >= ?"
+
+
+class SqliteBackend(bank.Backend):
+    """WAL モードの SQLite に残高を保存する。接続は 1 本を使い回す。"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._in_group = False
+        self._conn = sqlite3.connect(str(self.path), isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+
+    def get(self, user_id: int) -> int:
+        with self._lock:
+            row = self._conn.execute(_SELECT, (user_id,)).fetchone()
+        return row[0] if row else 0
+
+    def set(self, user_id: int, amount: int) -> None:
+        with self._lock:
+            self._conn.execute(_SET, (user_id, amount))
+
+    def _begin(self) -> None:
+        # グループコミット中は外側のトランザクションの中でセーブポイントを使う
+        self._conn.execute("SAVEPOINT op" if self._in_group else "BEGIN IMMEDIATE")
+
+    def _commit(self) -> None:
+        self._conn.execute("RELEASE op" if self._in_group else "COMMIT")
+
+    def _rollback(self) -> None:
+        if self._in_group:
+            self._conn.execute("ROLLBACK TO op")
+            self._conn.execute("RELEASE op")
+        else:
+            self._conn.execute("ROLLBACK")
+
+    def apply(self, deltas: Mapping[int, int], floors: Mapping[int, int]) -> Optional[Dict[int, int]]:
+        conn = self._conn
+        with self._lock:
+            self._begin()
+            try:
+                for uid, delta in deltas.items():
+                    if delta < 0 and uid in floors:
+                        cur = conn.execute(_DEBIT, (delta, uid, delta, floors[uid]))
+                        if cur.rowcount == 0:
+                            self._rollback()
+                            return None
+                    else:
+                        conn.execute(_CREDIT, (uid, delta))
+                result = {uid: conn.execute(_SELECT, (uid,)).fetchone()[0] for uid in deltas}
+                self._commit()
+            except BaseException:
+                self._rollback()
+                raise
+        return result
+
+    @contextmanager
+    def group(self) -> Iterator[None]:
+        with self._lock:
+            if self._in_group:
+                yield
+                return
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._in_group = True
+            try:
+                yield
+            except BaseException:
+                self._in_group = False
+                self._conn.execute("ROLLBACK")
+                raise
+            self._in_group = False
+            self._conn.execute("COMMIT")
+
+    def items(self) -> Iterator[Tuple[int, int]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT user_id, balance FROM balances").fetchall()
+        return iter(rows)
+
+    def import_balances(self, balances: Mapping[int, int]) -> int:
+        """残高を一括で書き込む（既存の同じユーザーは上書き）。件数を返す。"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(_SET, balances.items())
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(balances)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def migrate(json_path: Path = bank.DATA_FILE, db_path: Path = bank.SQLITE_PATH,
+            journal_path: Path = bank.JOURNAL_FILE) -> int:
+    """balances.json（+ 未畳み込みのジャーナル）を SQLite へ取り込む。件数を返す。"""
+    src = bank.JsonBackend(json_path, journal_path, flush_interval=0)
+    balances = dict(src.items())
+    dst = SqliteBackend(db_path)
+    try:
+        return dst.import_balances(balances)
+    finally:
+        dst.close()
+
+
+def main(argv) -> int:
+    if len(argv) < 2 or argv[1] != "migrate":
+        print("使い方: python bank_sqlite.py migrate [balances.json] [balances.db]")
+        return 2
+    json_path = Path(argv[2]) if len(argv) > 2 else bank.DATA_FILE
+    db_path = Path(argv[3]) if len(argv) > 3 else bank.SQLITE_PATH
+    n = migrate(json_path, db_path, json_path.with_suffix(".journal"))
+    print(f"{n} 件の残高を {db_path} に取り込みました。")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
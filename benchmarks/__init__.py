@@ -0,0 +1 @@
+"""オフラインのベンチマーク群（Discord 接続不要）。リポジトリ直下から python -m benchmarks.<name> で実行する。"""
@@ -0,0 +1,92 @@
+"""ベンチマーク一式を実行して JSON に保存する（Discord 接続不要）。
+
+    python -m benchmarks [--out bench-<commit>.json] [--sizes 1000,100000,1000000] [--quick]
+    python -m benchmarks --compare bench-abc1234.json [--threshold 0.10]
+
+--compare を付けると前回の JSON と比べ、ops/s が threshold 以上落ちた項目を表示して
+終了コード 1 を返す（CI なしで手元のコミット同士を比べる用）。
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+from benchmarks import bench_hotpaths
+
+FORMAT_VERSION = 1
+
+
+def _commit() -> str:
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True,
+                               text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "local"
+    return sha + ("-dirty" if dirty else "")
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], threshold: float) -> int:
+    """回帰した項目の数を返す。"""
+    regressions = 0
+    print(f"compare: {old.get('commit')} -> {new.get('commit')}")
+    for name, r in new["results"].items():
+        before = old.get("results", {}).get(name)
+        if not before or "ops_per_s" not in r or "ops_per_s" not in before:
+            continue
+        ratio = r["ops_per_s"] / before["ops_per_s"]
+        mark = ""
+        if ratio < 1 - threshold:
+            mark = "  <-- regression"
+            regressions += 1
+        print(f"  {name:32s} {before['ops_per_s']:14,.0f} -> {r['ops_per_s']:14,.0f} ops/s  ({ratio:6.2f}x){mark}")
+    return regressions
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--out", help="結果の保存先（既定: bench-<commit>.json）")
+    p.add_argument("--sizes", default="1000,100000,1000000", help="バンクのユーザー数（カンマ区切り）")
+    p.add_argument("--ops", type=int, default=20_000, help="バンク操作の回数（サイズごと）")
+    p.add_argument("--game-ops", type=int, default=100_000)
+    p.add_argument("--quick", action="store_true", help="小さめの設定で素早く回す")
+    p.add_argument("--compare", help="比較する前回の JSON")
+    p.add_argument("--threshold", type=float, default=0.10, help="回帰とみなす ops/s の低下率")
+    args = p.parse_args()
+    if args.quick:
+        args.sizes, args.ops, args.game_ops = "1000,100000", 5_000, 20_000
+
+    commit = _commit()
+    started = time.time()
+    results = bench_hotpaths.run([int(s) for s in args.sizes.split(",")], args.ops, args.game_ops)
+    report = {
+        "version": FORMAT_VERSION,
+        "commit": commit,
+        "started": started,
+        "elapsed_s": time.time() - started,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {"sizes": args.sizes, "ops": args.ops, "game_ops": args.game_ops},
+        "results": results,
+    }
+    bench_hotpaths.print_results(results)
+
+    out = Path(args.out or f"bench-{commit}.json")
+    out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"{out} に保存しました。")
+
+    if args.compare:
+        old = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        if old.get("params") != report["params"]:
+            print("注意: 前回と設定（--sizes / --ops / --game-ops）が違います。")
+        return 1 if compare(old, report, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
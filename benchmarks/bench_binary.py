@@ -0,0 +1,104 @@
+"""残高ストアの起動時間と常駐メモリ: balances.json vs mmap バイナリスナップショット。
+
+    python -m benchmarks.bench_binary [--sizes 100000,1000000,10000000] [--lookups 1000]
+
+計測はサイズ・形式ごとに別プロセスで行い、読み込み時間・ランダム参照の平均時間・
+常駐メモリの増分（VmRSS、開く前との差）を出す。
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import bank_binary
+
+_CHILD = r"""
+import json, random, resource, sys, time
+from pathlib import Path
+import bank, bank_binary
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+kind, path, users, lookups = sys.argv[1], Path(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4])
+before = rss_mb()
+t0 = time.perf_counter()
+if kind == "json":
+    b = bank.JsonBackend(path, path.with_suffix(".journal"), flush_interval=0)
+else:
+    b = bank_binary.BinaryBackend(path, flush_interval=0)
+load = time.perf_counter() - t0
+rng = random.Random(1)
+ids = [rng.randrange(users) * 7 for _ in range(lookups)]
+t0 = time.perf_counter()
+for uid in ids:
+    b.get(uid)
+lookup = (time.perf_counter() - t0) / max(1, lookups)
+print(json.dumps({"load_s": load, "lookup_us": lookup * 1e6, "rss_mb": rss_mb() - before}))
+"""
+
+
+def _measure(kind: str, path: Path, users: int, lookups: int) -> dict:
+    root = Path(__file__).resolve().parent.parent
+    out = subprocess.run(
+        [sys.executable, "-c", _CHILD, kind, str(path), str(users), str(lookups)],
+        cwd=root, check=True, capture_output=True, text=True,
+    )
+    return json.loads(out.stdout)
+
+
+def _generate(tmp: Path, users: int) -> tuple:
+    rng = random.Random(users)
+    # user_id は疎にしておく（実際の Discord ID と同じく連番ではない）
+    records = [(uid * 7, rng.randint(0, 100_000)) for uid in range(users)]
+    json_path = tmp / f"balances-{users}.json"
+    with json_path.open("w", encoding="utf-8") as f:
+        json.dump({str(k): v for k, v in records}, f, separators=(",", ":"))
+    bin_path = tmp / f"balances-{users}.bin"
+    bank_binary.write_snapshot(bin_path, records)
+    return json_path, bin_path
+
+
+def run(sizes, lookups: int) -> list:
+    results = []
+    with tempfile.TemporaryDirectory() as d:
+        tmp = Path(d)
+        for users in sizes:
+            json_path, bin_path = _generate(tmp, users)
+            for kind, path in (("json", json_path), ("binary", bin_path)):
+                r = _measure(kind, path, users, lookups)
+                r.update(users=users, format=kind, file_mb=os.path.getsize(path) / 2**20)
+                results.append(r)
+            json_path.unlink()
+            bin_path.unlink()
+    return results
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--sizes", default="100000,1000000,10000000")
+    p.add_argument("--lookups", type=int, default=1000)
+    args = p.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")]
+    t0 = time.perf_counter()
+    print(f"{'users':>10} {'format':>7} {'file MB':>8} {'load s':>8} {'lookup us':>10} {'RSS MB':>8}")
+    for r in run(sizes, args.lookups):
+        print(f"{r['users']:>10,} {r['format']:>7} {r['file_mb']:>8.1f} {r['load_s']:>8.3f} "
+              f"{r['lookup_us']:>10.2f} {r['rss_mb']:>8.1f}")
+    print(f"(計 {time.perf_counter() - t0:.0f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""ブラックジャック: 毎ゲーム 52 枚の文字列デッキ + 全走査の点数計算 vs 共有シュー + 差分更新の手札。
+
+    python -m benchmarks.bench_blackjack [--games 200000] [--decks 6]
+
+1 ゲーム = 配り、表示（点数計算）、プレイヤーが 17 未満でヒット、ディーラーがソフト17でヒット、
+精算、結果表示。Discord への送信は含まない。
+"""
+import argparse
+import random
+import time
+
+import rules
+
+# --- 変更前の実装（文字列カード、毎ゲーム build_deck、hand_value は毎回手札を全走査） ---
+
+_RANKS = ["A"] + [str(i) for i in range(2, 11)] + ["J", "Q", "K"]
+
+
+def _build_deck(rng):
+    deck = []
+    for _ in range(4):
+        deck.extend(_RANKS)
+    rng.shuffle(deck)
+    return deck
+
+
+def _card_value(rank):
+    if rank == "A":
+        return 11
+    if rank in ("J", "Q", "K"):
+        return 10
+    return int(rank)
+
+
+def _hand_value(cards):
+    total = 0
+    aces = 0
+    for c in cards:
+        if c == "A":
+            aces += 1
+            total += 11
+        else:
+            total += _card_value(c)
+    while total > 21 and aces > 0:
+        total -= 10
+        aces -= 1
+    return total, any(c == "A" for c in cards) and total + 10 <= 21
+
+
+def _legacy_game(rng) -> int:
+    deck = _build_deck(rng)
+    player = [deck.pop(), deck.pop()]
+    dealer = [deck.pop(), deck.pop()]
+    " ".join(player), _hand_value(player)
+    while _hand_value(player)[0] < 17:
+        player.append(deck.pop())
+        " ".join(player), _hand_value(player)
+    p_val = _hand_value(player)[0]
+    if p_val <= 21:
+        while True:
+            val, soft = _hand_value(dealer)
+            if val < 17 or (val == 17 and soft):
+                dealer.append(deck.pop())
+                continue
+            break
+    d_val = _hand_value(dealer)[0]
+    " ".join(player), " ".join(dealer), _hand_value(player), _hand_value(dealer)
+    return rules.blackjack_payout(1, p_val, d_val)[1]
+
+
+# --- 変更後（rules.Shoe + rules.Hand） ---
+
+
+def _shoe_game(shoe: rules.Shoe) -> int:
+    shoe.begin()
+    player = rules.Hand([shoe.draw(), shoe.draw()])
+    dealer = rules.Hand([shoe.draw(), shoe.draw()])
+    str(player), player.total
+    while player.total < 17:
+        player.add(shoe.draw())
+        str(player), player.total
+    if player.total <= 21:
+        while rules.dealer_should_hit(dealer):
+            dealer.add(shoe.draw())
+    str(player), str(dealer), player.total, dealer.total
+    return rules.blackjack_payout(1, player.total, dealer.total)[1]
+
+
+def run(games: int, decks: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    t0 = time.perf_counter()
+    legacy_paid = sum(_legacy_game(rng) for _ in range(games))
+    legacy = time.perf_counter() - t0
+
+    shoe = rules.Shoe(decks, rng=random.Random(seed))
+    t0 = time.perf_counter()
+    shoe_paid = sum(_shoe_game(shoe) for _ in range(games))
+    shoe_s = time.perf_counter() - t0
+    return {
+        "games": games,
+        "decks": decks,
+        "legacy_games_per_s": games / legacy,
+        "shoe_games_per_s": games / shoe_s,
+        "speedup": legacy / shoe_s,
+        "legacy_rtp": legacy_paid / games,
+        "shoe_rtp": shoe_paid / games,
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--games", type=int, default=200_000)
+    p.add_argument("--decks", type=int, default=rules.DECKS)
+    args = p.parse_args()
+    r = run(args.games, args.decks)
+    print(f"games={r['games']:,}  decks={r['decks']}")
+    print(f"  build_deck + hand_value : {r['legacy_games_per_s']:12,.0f} games/s  (RTP {r['legacy_rtp']:.4f})")
+    print(f"  Shoe + Hand             : {r['shoe_games_per_s']:12,.0f} games/s  (RTP {r['shoe_rtp']:.4f})")
+    print(f"  speedup                 : {r['speedup']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
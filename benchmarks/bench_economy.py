@@ -0,0 +1,121 @@
+"""経済統計: economy.py の差分更新の集計 vs 問い合わせごとの全件走査（残高 + ラウンドログ）。
+
+    python -m benchmarks.bench_economy [--users 1000000] [--rounds 200000] [--ops 20000]
+
+一時ディレクトリに users 人分の balances.json と rounds 行のラウンドログを置き、既定の json
+バックエンドで次を測る。
+- /経済統計 1 回分: bank.economy_stats() と、balances.json・rounds.jsonl を読んで数える方法
+- 精算（reserve + settle）1 回の時間（集計の更新込み）
+- 起動時の読み込み: 初回（全件数え直し）、正常に閉じた後（economy.json を読むだけ）、
+  クラッシュ後（残高側だけ数え直し、ラウンドログはチェックポイント以降だけ読む）
+また、差分更新で保存した値が数え直した値と一致することを確かめる。
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import bank
+import economy
+import rng
+
+GAMES = ("chinchiro", "slots", "blackjack")
+
+
+def _scan(balances: Path, rounds: Path) -> dict:
+    # 集計がなかったときのやり方: 毎回すべてのファイルを読んで数える
+    with balances.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    games: dict = {}
+    with rounds.open("r", encoding="utf-8") as f:
+        for line in f:
+            e = json.loads(line)
+            g = games.setdefault(e["game"], [0, 0, 0])
+            g[0] += 1
+            g[1] += e.get("stake", e["bet"])
+            g[2] += e["payout"]
+    return {"circulation": sum(data.values()), "funded": sum(1 for b in data.values() if b > 0), "games": games}
+
+
+def _open_seconds(clean: bool) -> float:
+    bank.close()
+    saved, _, rounds_at = economy.load()
+    if saved is not None and not clean:
+        economy.save(saved, clean=False, rounds_at=rounds_at or 0)  # 落ちたときと同じ状態にする
+    t0 = time.perf_counter()
+    bank.get_backend()
+    bank.economy_stats()
+    return time.perf_counter() - t0
+
+
+def run(users: int, rounds: int, ops: int, seed: int = 0) -> dict:
+    r = random.Random(seed)
+    cwd = os.getcwd()
+    bank.close()
+    with tempfile.TemporaryDirectory() as d:
+        os.chdir(d)
+        try:
+            Path("balances.json").write_text(
+                json.dumps({str(uid): r.randint(0, 10_000) for uid in range(users)}, separators=(",", ":")),
+                encoding="utf-8")
+            with rng.ROUNDS_FILE.open("w", encoding="utf-8") as f:
+                for _ in range(rounds):
+                    bet = r.choice((10, 100, 1000))
+                    f.write(json.dumps({"round": "0", "game": r.choice(GAMES), "user": r.randrange(users),
+                                        "bet": bet, "payout": r.choice((0, 0, bet * 2))}) + "\n")
+            out = {"users": users, "rounds": rounds, "first_open_s": _open_seconds(clean=False)}
+
+            t0 = time.perf_counter()
+            for _ in range(ops):
+                bank.economy_stats()
+            out["stats_us"] = (time.perf_counter() - t0) / ops * 1e6
+
+            bank.flush()
+            slow = max(1, min(ops, 3))
+            t0 = time.perf_counter()
+            for _ in range(slow):
+                _scan(Path("balances.json"), rng.ROUNDS_FILE)
+            out["scan_us"] = (time.perf_counter() - t0) / slow * 1e6
+
+            t0 = time.perf_counter()
+            for i in range(ops):
+                uid = r.randrange(users)
+                ticket = bank.reserve(uid, 1, GAMES[i % 3])
+                if ticket is not None:
+                    bank.settle(ticket, r.choice((0, 2)))
+            out["settle_us"] = (time.perf_counter() - t0) / ops * 1e6
+
+            out["clean_open_s"] = _open_seconds(clean=True)
+            # 差分更新で保存した値と数え直した値を比べる（上の精算はラウンドログに書いていないので残高側だけ）
+            live = bank.economy_stats()
+            fresh = economy.recompute(bank.get_backend().items(), rng.ROUNDS_FILE).summary()
+            out["consistent"] = (live["circulation"], live["funded"]) == (fresh["circulation"], fresh["funded"])
+            out["crash_open_s"] = _open_seconds(clean=False)
+        finally:
+            bank.close()
+            os.chdir(cwd)
+    out["speedup"] = out["scan_us"] / out["stats_us"] if out["stats_us"] else float("inf")
+    return out
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--users", type=int, default=1_000_000)
+    p.add_argument("--rounds", type=int, default=200_000)
+    p.add_argument("--ops", type=int, default=20_000)
+    args = p.parse_args()
+    r = run(args.users, args.rounds, args.ops)
+    print(f"users={r['users']:,}  rounds={r['rounds']:,}")
+    print(f"  economy_stats  : {r['stats_us']:12.1f} us / 回")
+    print(f"  full scan      : {r['scan_us']:12.1f} us / 回  ({r['speedup']:,.0f}x)")
+    print(f"  reserve+settle : {r['settle_us']:12.1f} us / 回（集計の更新込み）")
+    print(f"  open           : 初回 {r['first_open_s']:.2f}s  正常終了後 {r['clean_open_s']:.2f}s  "
+          f"クラッシュ後 {r['crash_open_s']:.2f}s")
+    print(f"  consistent     : {r['consistent']}")
+
+
+if __name__ == "__main__":
+    main()
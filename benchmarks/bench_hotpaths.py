@@ -0,0 +1,156 @@
+"""ホットパス: バンクの読み書きとゲームごとの処理（出目の判定、手札、シュー、Embed の組み立て）。
+
+    python -m benchmarks.bench_hotpaths [--sizes 1000,100000,1000000] [--ops 20000]
+
+バンクは一時ディレクトリに sizes 人分の balances.json を置き、既定の json バックエンド
+（台帳つき）で get_balance / add_balance / transfer を 1 回ずつ測る。
+結果の各項目は ops/s と 1 回あたりの p50 / p99（マイクロ秒）。
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import bank
+import embeds
+import ledger
+import rules
+
+# 1 回が短すぎる処理は BATCH 回まとめて測って割る
+BATCH = 50
+# 各項目を REPEAT 回測って一番速かった回を採る（ほかのプロセスの影響を減らす）
+REPEAT = 3
+
+
+def _measure(fn: Callable[[int], object], n: int, batch: int = 1) -> Dict[str, float]:
+    perf = time.perf_counter
+    best: Dict[str, float] = {}
+    for _ in range(REPEAT):
+        samples: List[float] = []
+        total = 0.0
+        for start in range(0, n, batch):
+            t0 = perf()
+            for i in range(start, min(n, start + batch)):
+                fn(i)
+            dt = perf() - t0
+            total += dt
+            samples.append(dt / batch)
+        if best and n / total <= best["ops_per_s"]:
+            continue
+        samples.sort()
+        best = {
+            "ops_per_s": n / total,
+            "p50_us": statistics.median(samples) * 1e6,
+            "p99_us": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1e6,
+        }
+    return best
+
+
+# --- バンク ---
+
+
+def bank_suite(users: int, ops: int, seed: int = 0) -> Dict[str, Dict[str, float]]:
+    rng = random.Random(seed)
+    cwd = os.getcwd()
+    bank.close()
+    with tempfile.TemporaryDirectory() as d:
+        os.chdir(d)
+        try:
+            Path("balances.json").write_text(
+                json.dumps({str(uid): 1_000_000 for uid in range(users)}, separators=(",", ":")), encoding="utf-8")
+            t0 = time.perf_counter()
+            bank.get_backend()
+            load = time.perf_counter() - t0
+
+            ids = [rng.randrange(users) for _ in range(ops)]
+            pairs = [(rng.randrange(users), rng.randrange(users)) for _ in range(ops)]
+            out = {
+                "get_balance": _measure(lambda i: bank.get_balance(ids[i]), ops),
+                "add_balance": _measure(lambda i: bank.add_balance(ids[i], 1), ops),
+                "transfer": _measure(lambda i: bank.transfer(pairs[i][0], pairs[i][1], 1), ops),
+            }
+            t0 = time.perf_counter()
+            bank.close()
+            out["open"] = {"seconds": load}
+            out["close"] = {"seconds": time.perf_counter() - t0}
+        finally:
+            bank.close()
+            os.chdir(cwd)
+    return out
+
+
+# --- ゲーム ---
+
+
+def games_suite(ops: int, seed: int = 0) -> Dict[str, Dict[str, float]]:
+    rng = random.Random(seed)
+    rolls = [[rng.randint(1, 6) for _ in range(3)] for _ in range(ops)]
+    hands = [[rng.randrange(len(rules.CARD_RANKS)) for _ in range(rng.randint(2, 5))] for _ in range(ops)]
+    reels = [rules.spin_slot(rng) for _ in range(ops)]
+    shoe = rules.Shoe(rng=random.Random(seed))
+
+    def deal(_: int) -> None:
+        shoe.begin()
+        shoe.draw()
+
+    bj_player = [rules.Hand(h) for h in hands]
+    bj_dealer = [rules.Hand(hands[-1 - i][:2]) for i in range(ops)]
+    outcomes = ("win", "lose", "draw")
+    return {
+        "score_roll": _measure(lambda i: rules.score_roll(rolls[i]), ops, BATCH),
+        "hand_value": _measure(lambda i: rules.hand_value(hands[i]), ops, BATCH),
+        "hand_total": _measure(lambda i: bj_player[i].total, ops, BATCH),
+        # 旧 build_deck（52 枚を作ってシャッフル）の代わり: シューの作り直しと 1 枚引き
+        "shoe_shuffle": _measure(lambda i: shoe.shuffle(), max(1, ops // 100)),
+        "shoe_draw": _measure(deal, ops, BATCH),
+        "embed_chinchiro": _measure(
+            lambda i: embeds.chinchiro_result("player", rolls[i], rolls[-1 - i], outcomes[i % 3], 200, 1000, "0" * 16),
+            ops, BATCH),
+        "embed_slots": _measure(lambda i: embeds.slot_result("player", reels[i], 0, 1000, "0" * 16), ops, BATCH),
+        "embed_blackjack": _measure(
+            lambda i: embeds.blackjack_result("player", bj_player[i], bj_dealer[i], 100, 1000,
+                                              outcomes[i % 3], 200, "0" * 16), ops, BATCH),
+    }
+
+
+def run(sizes: List[int], bank_ops: int, game_ops: int, seed: int = 0) -> Dict[str, Dict[str, float]]:
+    """{"bank.<操作>@<人数>" / "games.<処理>": 指標} を返す。"""
+    results: Dict[str, Dict[str, float]] = {}
+    # 台帳は各サイズの一時ディレクトリに作る（既定の ledger.d を汚さない）
+    saved_dir = ledger.LEDGER_DIR
+    ledger.LEDGER_DIR = "ledger.d"
+    try:
+        for users in sizes:
+            for name, r in bank_suite(users, bank_ops, seed).items():
+                results[f"bank.{name}@{users}"] = r
+    finally:
+        ledger.LEDGER_DIR = saved_dir
+    for name, r in games_suite(game_ops, seed).items():
+        results[f"games.{name}"] = r
+    return results
+
+
+def print_results(results: Dict[str, Dict[str, float]]) -> None:
+    for name, r in results.items():
+        if "ops_per_s" in r:
+            print(f"  {name:32s} {r['ops_per_s']:14,.0f} ops/s   p50 {r['p50_us']:9.2f} us   p99 {r['p99_us']:9.2f} us")
+        else:
+            print(f"  {name:32s} {r['seconds']:14.3f} s")
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--sizes", default="1000,100000,1000000")
+    p.add_argument("--ops", type=int, default=20_000, help="バンク操作の回数（サイズごと）")
+    p.add_argument("--game-ops", type=int, default=100_000)
+    args = p.parse_args()
+    print_results(run([int(s) for s in args.sizes.split(",")], args.ops, args.game_ops))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""台帳: ユーザーごとのオフセット索引で引く /履歴 の応答時間（全件走査との比較つき）。
+
+    python -m benchmarks.bench_ledger [--rows 10000000] [--users 100000] [--queries 2000]
+
+--rows 行を書き込んで（セグメントの切り替え・圧縮込み）から、ランダムなユーザーの
+最新 10 件、少し深いページ（50 件目から 10 件）の取得時間を測る。最後に同じ問い合わせを
+全セグメントの展開 + 走査で 1 回だけ行い、結果が一致することを確かめる。
+"""
+import argparse
+import json
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import ledger
+
+_KINDS = ("grant", "transfer", "bet", "payout")
+
+
+def _percentile(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p))]
+
+
+def _scan(root: Path, uid: int, offset: int, limit: int) -> list:
+    # 索引を使わずに全セグメントを読んで探す
+    rows = []
+    for jz in sorted(root.glob("seg-*.jz")):
+        idx = ledger._Sealed(jz, jz.with_suffix(".idx"))
+        data = b"".join(idx._block(b) for b in range(len(idx._raw_starts)))
+        idx.close()
+        rows.extend(line for line in data.splitlines() if json.loads(line)["u"] == uid)
+    for plain in sorted(root.glob("seg-*.jsonl")):
+        rows.extend(line for line in plain.read_bytes().splitlines() if json.loads(line)["u"] == uid)
+    return [json.loads(line) for line in reversed(rows)][offset:offset + limit]
+
+
+def run(rows: int, users: int, queries: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as d:
+        root = Path(d)
+        led = ledger.Ledger(root)
+        t0 = time.perf_counter()
+        for i in range(rows):
+            uid = rng.randrange(users) * 7919 + 10**17
+            led.append(uid, rng.choice(_KINDS), rng.randint(-500, 500), rng.randint(0, 10**6),
+                       game=None, ts=1_700_000_000 + i)
+        led.close()  # 封じ終わるのを待つ
+        write = time.perf_counter() - t0
+        disk_mb = sum(p.stat().st_size for p in root.iterdir()) / 2**20
+
+        t0 = time.perf_counter()
+        led = ledger.Ledger(root)
+        reopen = time.perf_counter() - t0
+
+        ids = [rng.randrange(users) * 7919 + 10**17 for _ in range(queries)]
+        lat = {}
+        for name, offset in (("latest10", 0), ("page6", 50)):
+            samples = []
+            for uid in ids:
+                t0 = time.perf_counter()
+                led.history(uid, offset, 10)
+                samples.append(time.perf_counter() - t0)
+            lat[name] = samples
+
+        uid = ids[0]
+        expect = led.history(uid, 50, 10)
+        t0 = time.perf_counter()
+        scanned = _scan(root, uid, 50, 10)
+        scan = time.perf_counter() - t0
+        assert scanned == expect, "索引と全件走査の結果が一致しません"
+        segments = len(list(root.glob("seg-*.idx")))
+        led.close()
+    return {
+        "rows": rows,
+        "segments": segments,
+        "disk_mb": disk_mb,
+        "write_s": write,
+        "reopen_s": reopen,
+        "latest10_p50_us": statistics.median(lat["latest10"]) * 1e6,
+        "latest10_p99_us": _percentile(lat["latest10"], 0.99) * 1e6,
+        "page6_p50_us": statistics.median(lat["page6"]) * 1e6,
+        "page6_p99_us": _percentile(lat["page6"], 0.99) * 1e6,
+        "full_scan_s": scan,
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--rows", type=int, default=10_000_000)
+    p.add_argument("--users", type=int, default=100_000)
+    p.add_argument("--queries", type=int, default=2000)
+    args = p.parse_args()
+    r = run(args.rows, args.users, args.queries)
+    print(f"rows={r['rows']:,}  segments={r['segments']}  disk={r['disk_mb']:.0f} MB  "
+          f"write={r['write_s']:.0f}s  reopen={r['reopen_s']:.2f}s")
+    print(f"  latest 10     : p50 {r['latest10_p50_us']:8.1f} us   p99 {r['latest10_p99_us']:8.1f} us")
+    print(f"  entries 50-59 : p50 {r['page6_p50_us']:8.1f} us   p99 {r['page6_p99_us']:8.1f} us")
+    print(f"  full scan     : {r['full_scan_s'] * 1e6:12.0f} us (1 query)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,417 @@
+"""負荷試験: ローカルの Discord の代役に本物の NuggetBot をつなぎ、大量のユーザーを同時に遊ばせる。
+
+    python -m benchmarks.bench_load [--users 1000] [--rounds 3] [--channels 50] [--json out.json]
+
+各ユーザーはチンチロ / スロット / ブラックジャックを --rounds 回遊ぶ（「実行する」「Hit」「Stand」
+「Double」「もう一度」を押す）。REST には遅延とレート制限（429）が入る（fake_discord.py）。
+
+報告する内容:
+- インタラクションの応答時間（注入から最初の応答まで / 結果の表示まで）の p50 / p99
+- 1 ゲームあたりの REST 呼び出し数（ルート別）と 429 の回数
+- バンクの整合性: 残高の合計の変化 = ラウンドログの (配当 − 掛け金) の合計、
+  負の残高なし、予約（エスクロー）の残りなし、台帳の増減の合計 = 残高、
+  経済の集計（economy.py）= 残高とラウンドログから数え直した値
+
+Discord には接続しない。一時ディレクトリで動かすので手元の balances.json などには触らない。
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import bank
+import bot as nugget
+import economy
+import rng
+from benchmarks.fake_discord import FakeDiscord, FakeMessage
+
+# setup_hook が読み込む games を、作業ディレクトリを移す前に読み込んでおく（名前は使わないので import 文にしない）
+importlib.import_module("games")
+
+START_BALANCE = 100_000
+GAMES = {"chinchiro": "チンチロ", "slots": "スロット", "blackjack": "ブラックジャック"}
+WAIT = 60.0  # 1 回の応答を待つ上限（秒）
+
+
+class Stalled(Exception):
+    pass
+
+
+def _pct(xs: List[float], p: float) -> float:
+    if not xs:
+        return float("nan")
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p))]
+
+
+def _is_result(m: FakeMessage) -> bool:
+    for e in m.data.get("embeds") or []:
+        if "結果" in (e.get("title") or "") or any(f.get("name") == "結果" for f in e.get("fields") or []):
+            return True
+    return False
+
+
+def _is_error(m: FakeMessage) -> bool:
+    return (m.data.get("content") or "").startswith(("❌", "⏳", "エラー"))
+
+
+def _player_total(m: FakeMessage) -> int:
+    value = m.data["embeds"][0]["fields"][0]["value"]
+    return int(value.rsplit("合計:", 1)[1])
+
+
+class Harness:
+    def __init__(self, fake: FakeDiscord, users: int, channels: int, think: Tuple[float, float], seed: int):
+        self.fake = fake
+        self.think = think  # ボタンを押すまでの「考える時間」の範囲（秒）
+        self.rng = random.Random(seed)
+        self.guild_id = fake.snowflake()
+        self.channels = [fake.snowflake() for _ in range(channels)]
+        self.users = [fake.snowflake() + 1_000_000 + i for i in range(users)]
+        self.sessions: Dict[str, "Session"] = {}
+        self.injected: Dict[int, float] = {}   # インタラクション ID -> 注入した時刻
+        self.kinds: Dict[int, str] = {}        # インタラクション ID -> "command" / "component"
+        self.token_games: Dict[str, str] = {}  # インタラクションのトークン -> ゲーム
+        self.results: Dict[str, List[float]] = defaultdict(list)  # ゲーム -> 押してから結果までの秒数
+        self.rounds: Counter = Counter()
+        self.outcomes: Counter = Counter()
+        fake.on_message = self._route
+
+    def _route(self, m: FakeMessage) -> None:
+        session = self.sessions.get(m.token.split(".", 1)[0])
+        if session is not None:
+            session.notify(m)
+
+    def _channel(self, channel_id: int) -> Dict[str, Any]:
+        return {"id": str(channel_id), "type": 0, "guild_id": str(self.guild_id), "name": f"load-{channel_id % 1000}",
+                "position": 0, "permission_overwrites": [], "nsfw": False, "parent_id": None}
+
+    def _member(self, user_id: int) -> Dict[str, Any]:
+        return {"user": {"id": str(user_id), "username": f"user{user_id % 100000}", "discriminator": "0",
+                         "global_name": None, "avatar": None},
+                "roles": [], "joined_at": "2024-01-01T00:00:00+00:00", "deaf": False, "mute": False,
+                "flags": 0, "permissions": "0", "nick": None, "avatar": None, "pending": False}
+
+    async def inject(self, session: "Session", kind: str, data: Dict[str, Any],
+                     message: Optional[FakeMessage] = None) -> int:
+        iid = self.fake.snowflake()
+        payload = {
+            "id": str(iid), "application_id": str(self.fake.app_id), "type": 2 if kind == "command" else 3,
+            "token": session.token(), "version": 1, "guild_id": str(self.guild_id),
+            "channel_id": str(session.channel_id), "channel": self._channel(session.channel_id),
+            "member": self._member(session.user_id), "locale": "ja", "guild_locale": "ja",
+            "app_permissions": "0", "data": data,
+        }
+        if message is not None:
+            payload["message"] = self.fake._message_json(message)
+        self.injected[iid] = time.monotonic()
+        self.kinds[iid] = kind
+        self.token_games[payload["token"]] = session.game
+        await self.fake.inject(payload)
+        return iid
+
+
+class Session:
+    """1 人分のシミュレーション。"""
+
+    def __init__(self, harness: Harness, sid: str, user_id: int, channel_id: int, rng: random.Random):
+        self.h, self.sid, self.user_id, self.channel_id, self.rng = harness, sid, user_id, channel_id, rng
+        self.messages: Dict[int, FakeMessage] = {}
+        self.used: set = set()       # もう押したメッセージ
+        self.seen_errors: set = set()
+        self.changed = asyncio.Event()
+        self.game = ""
+        self._n = 0
+
+    def token(self) -> str:
+        self._n += 1
+        return f"{self.sid}.{self._n}"
+
+    def notify(self, m: FakeMessage) -> None:
+        self.messages[m.id] = m
+        self.changed.set()
+
+    async def wait(self, pred: Callable[[], Any]) -> Any:
+        deadline = time.monotonic() + WAIT
+        while True:
+            value = pred()
+            if value:
+                return value
+            for m in self.messages.values():
+                if _is_error(m) and (m.id, m.version) not in self.seen_errors:
+                    self.seen_errors.add((m.id, m.version))
+                    return None
+            self.changed.clear()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise Stalled()
+            try:
+                await asyncio.wait_for(self.changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                raise Stalled() from None
+
+    def _button(self, label: str):
+        def pred():
+            for m in self.messages.values():
+                if m.id not in self.used and not m.deleted:
+                    cid = m.buttons().get(label)
+                    if cid is not None:
+                        return m, cid
+            return None
+        return pred
+
+    async def press(self, msg: FakeMessage, custom_id: str) -> float:
+        # 人間と同じく少し間を置いてから押す（表示された直後に押すと、ボットが応答の
+        # メッセージを取得し終える前になる）。押した時刻を返す
+        self.used.add(msg.id)
+        await asyncio.sleep(self.rng.uniform(*self.h.think))
+        await self.h.inject(self, "component", {"custom_id": custom_id, "component_type": 2}, msg)
+        return time.monotonic()
+
+    async def command(self, game: str, amount: int) -> None:
+        self.messages.clear()
+        await self.h.inject(self, "command", {
+            "id": "0", "name": GAMES[game], "type": 1,
+            "options": [{"name": "amount", "type": 4, "value": amount}]})
+
+    # --- ゲーム ---
+
+    async def confirm_and_wait(self, game: str) -> Optional[FakeMessage]:
+        # 「実行する」を押して結果を待つ
+        found = await self.wait(self._button("実行する"))
+        if not found:
+            return None
+        t0 = await self.press(*found)
+        result = await self.wait(lambda: next((m for m in self.messages.values()
+                                               if _is_result(m) and m.id not in self.used), None))
+        if result is not None:
+            self.h.results[game].append(time.monotonic() - t0)
+        return result
+
+    async def blackjack(self) -> Optional[FakeMessage]:
+        found = await self.wait(self._button("Hit"))
+        if not found:
+            return None
+        table = found[0]
+        first = True
+        while not _is_result(table):
+            total = _player_total(table)
+            if first and total in (10, 11):
+                action = "Double"
+            elif total < 17:
+                action = "Hit"
+            else:
+                action = "Stand"
+            first = False
+            version = table.version
+            t0 = await self.press(table, table.buttons()[action])
+            if action == "Hit":
+                updated = await self.wait(lambda: table.version > version)
+                if updated is None:
+                    return None
+                if not _is_result(table) and _player_total(table) > 21:
+                    await self.wait(lambda: _is_result(table))
+            else:
+                if await self.wait(lambda: _is_result(table)) is None:
+                    return None
+            if _is_result(table):
+                self.h.results["blackjack"].append(time.monotonic() - t0)
+        return table
+
+    async def run(self, rounds: int, weights: Dict[str, float]) -> None:
+        last_result: Optional[FakeMessage] = None
+        last_game = None
+        for _ in range(rounds):
+            game = self.rng.choices(list(weights), list(weights.values()))[0]
+            amount = self.rng.randint(10, 1000)
+            self.game = game
+            # 直前がチンチロなら半分の確率で「もう一度」（同額）
+            if game == "chinchiro" and last_game == "chinchiro" and last_result is not None \
+                    and "もう一度" in last_result.buttons() and self.rng.random() < 0.5:
+                self.messages = {last_result.id: last_result}
+                await self.press(last_result, last_result.buttons()["もう一度"])
+                self.h.outcomes["again"] += 1
+            else:
+                await self.command(game, amount)
+            if game == "blackjack":
+                result = await self.blackjack()
+            else:
+                result = await self.confirm_and_wait(game)
+            self.h.rounds[game] += 1
+            self.h.outcomes["result" if result is not None else "rejected"] += 1
+            last_result, last_game = result, game
+
+
+# --- 整合性チェック ---
+
+
+def check_bank(users: List[int], rounds_file: Path) -> Dict[str, Any]:
+    # 予約中の掛け金も含めた保存上の残高（台帳の増減の合計と一致するはず）
+    backend = bank.get_backend()
+    balances = {uid: backend.get(uid) for uid in users}
+    wanted = set(users)
+    net = 0
+    rng.flush()
+    with rounds_file.open("r", encoding="utf-8") as f:
+        for line in f:
+            e = json.loads(line)
+            if e["user"] in wanted:
+                net += e["payout"] - e.get("stake", e["bet"])
+    ledger_mismatch = 0
+    for uid in users:
+        rows = bank.history(uid, 0, 1_000_000)
+        if rows and sum(r["d"] for r in rows) != balances[uid]:
+            ledger_mismatch += 1
+    total_change = sum(balances.values()) - START_BALANCE * len(users)
+    # 差分更新している経済の集計が、全件から数え直した値と一致するか
+    live = bank.economy_stats()
+    fresh = economy.recompute(backend.items(), rounds_file).summary()
+    return {
+        "total_change": total_change,
+        "rounds_net": net,
+        "conserved": total_change == net,
+        "negative_balances": sum(1 for b in balances.values() if b < 0),
+        "open_holds": sum(1 for uid in users if bank._held(uid)),
+        "ledger_mismatches": ledger_mismatch,
+        "economy_matches": live == fresh,
+    }
+
+
+# --- 実行 ---
+
+
+async def run(users: int, rounds: int, channels: int, ramp: float, weights: Dict[str, float],
+              latency: Tuple[float, float], think: Tuple[float, float], seed: int = 0) -> Dict[str, Any]:
+    fake = FakeDiscord(latency=latency, seed=seed)
+    await fake.start()
+    fake.patch_discord()
+    h = Harness(fake, users, channels, think, seed)
+    bank.apply_batch({uid: START_BALANCE for uid in h.users})
+
+    client = nugget.bot
+    runner = asyncio.create_task(client.start("fake-token"))
+    await fake.wait_ready()
+    await asyncio.wait_for(client.wait_until_ready(), 30)
+    setup_calls = len(fake.calls)
+
+    rng_ = random.Random(seed)
+    stalled = 0
+
+    async def one(i: int, uid: int) -> None:
+        nonlocal stalled
+        await asyncio.sleep(rng_.uniform(0, ramp))
+        s = Session(h, f"s{i}", uid, h.channels[i % channels], random.Random(seed * 1_000_003 + i))
+        h.sessions[s.sid] = s
+        try:
+            await s.run(rounds, weights)
+        except Stalled:
+            stalled += 1
+
+    t0 = time.monotonic()
+    await asyncio.gather(*(one(i, uid) for i, uid in enumerate(h.users)))
+    elapsed = time.monotonic() - t0
+    await asyncio.sleep(0.5)  # 結果表示の後のボタン無効化などを待つ
+
+    consistency = check_bank(h.users, rng.ROUNDS_FILE)
+
+    first = {"command": [], "component": []}
+    for iid, t in h.injected.items():
+        if iid in fake.first_response:
+            first[h.kinds[iid]].append(fake.first_response[iid] - t)
+    calls = fake.calls[setup_calls:]
+    routes = Counter(c.route + (f" [{c.status}]" if c.status >= 400 else "") for c in calls)
+    game_calls = Counter(h.token_games.get(c.token or "", "") for c in calls)
+    total_rounds = sum(h.rounds.values())
+
+    await client.close()
+    runner.cancel()
+    try:
+        await runner
+    except (asyncio.CancelledError, Exception):
+        pass
+    await fake.stop()
+
+    return {
+        "users": users,
+        "rounds": dict(h.rounds),
+        "outcomes": dict(h.outcomes),
+        "stalled": stalled,
+        "elapsed_s": elapsed,
+        "rounds_per_s": total_rounds / elapsed if elapsed else 0.0,
+        "first_response_ms": {k: {"p50": _pct(v, 0.5) * 1e3, "p99": _pct(v, 0.99) * 1e3, "n": len(v)}
+                              for k, v in first.items()},
+        "result_ms": {g: {"p50": _pct(v, 0.5) * 1e3, "p99": _pct(v, 0.99) * 1e3, "n": len(v)}
+                      for g, v in h.results.items()},
+        "rest_calls": len(calls),
+        "rest_calls_per_round": len(calls) / total_rounds if total_rounds else 0.0,
+        "rest_routes_per_round": {r: n / total_rounds for r, n in routes.most_common()} if total_rounds else {},
+        "rest_calls_per_game_round": {g: game_calls[g] / n for g, n in h.rounds.items()},
+        "rate_limited": sum(1 for c in calls if c.status == 429),
+        "not_found": sum(1 for c in calls if c.status == 404),
+        "consistency": consistency,
+    }
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--users", type=int, default=1000)
+    p.add_argument("--rounds", type=int, default=3, help="1 人あたりのゲーム数")
+    p.add_argument("--channels", type=int, default=50)
+    p.add_argument("--ramp", type=float, default=5.0, help="全員が参加し終わるまでの秒数")
+    p.add_argument("--mix", default="chinchiro=1,slots=1,blackjack=1", help="ゲームの比率")
+    p.add_argument("--latency-ms", default="30,120", help="REST の応答遅延の範囲（ミリ秒）")
+    p.add_argument("--think-ms", default="300,1500", help="ボタンを押すまでの間の範囲（ミリ秒）")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--json", help="結果を JSON で保存する")
+    args = p.parse_args()
+
+    weights = {k: float(v) for k, v in (kv.split("=") for kv in args.mix.split(","))}
+    latency = tuple(float(x) / 1000 for x in args.latency_ms.split(","))
+    think = tuple(float(x) / 1000 for x in args.think_ms.split(","))
+    out_path = Path(args.json).resolve() if args.json else None
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as d:
+        os.chdir(d)
+        try:
+            r = asyncio.run(run(args.users, args.rounds, args.channels, args.ramp, weights, latency, think, args.seed))
+        finally:
+            bank.close()
+            rng.close()
+            os.chdir(cwd)
+
+    print(f"users={r['users']:,}  rounds={sum(r['rounds'].values()):,} {r['rounds']}  "
+          f"elapsed={r['elapsed_s']:.1f}s  ({r['rounds_per_s']:.1f} rounds/s)  stalled={r['stalled']}")
+    print(f"  outcomes: {r['outcomes']}")
+    for kind, v in r["first_response_ms"].items():
+        print(f"  first response ({kind:9s}): p50 {v['p50']:7.1f} ms   p99 {v['p99']:7.1f} ms   n={v['n']}")
+    for game, v in r["result_ms"].items():
+        print(f"  result       ({game:9s}): p50 {v['p50']:7.1f} ms   p99 {v['p99']:7.1f} ms   n={v['n']}")
+    print(f"  REST calls: {r['rest_calls']:,} ({r['rest_calls_per_round']:.1f}/round)  "
+          f"429: {r['rate_limited']}  404: {r['not_found']}")
+    for game, n in r["rest_calls_per_game_round"].items():
+        print(f"    {game:36s} {n:6.2f}/round")
+    for route, n in r["rest_routes_per_round"].items():
+        print(f"    {route:36s} {n:6.2f}/round")
+    c = r["consistency"]
+    ok = (c["conserved"] and not c["negative_balances"] and not c["open_holds"] and not c["ledger_mismatches"]
+          and c["economy_matches"])
+    print(f"  bank: change {c['total_change']:+,} vs rounds {c['rounds_net']:+,} -> "
+          f"{'conserved' if c['conserved'] else 'NOT CONSERVED'}; negative={c['negative_balances']} "
+          f"open holds={c['open_holds']} ledger mismatches={c['ledger_mismatches']} "
+          f"economy {'matches' if c['economy_matches'] else 'MISMATCH'}")
+    if out_path is not None:
+        out_path.write_text(json.dumps(r, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 0 if ok and not r["stalled"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
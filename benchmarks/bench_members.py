@@ -0,0 +1,174 @@
+"""大きなギルドでのログイン時間とメモリ: 10 万人のギルドを置いた fake_discord.py に本物の NuggetBot を
+つなぎ、MEMBER_CACHE=full（起動時に全員をチャンク取得してキャッシュ）と lazy（members.py）を比べる。
+
+    python -m benchmarks.bench_members [--members 100000] [--modes full,lazy] [--json out.json]
+
+モードごとに別プロセスで起動して次を測る。
+- ログイン: client.start() から on_ready まで（READY 後のギルド待ち guild_ready_timeout 2 秒を含む）と、
+  最初の /ping に応答するまで
+- on_ready 時点の RSS（起動前からの増分）、キャッシュしているメンバー数、GC が追跡しているオブジェクト数
+- /ロール付与（10 人に 1 人が持つロール）を最後まで処理する時間と、その間の RSS の増分の最大
+- /ランキング（上位 10 人はギルドのメンバー）の応答時間。1 回目と 2 回目（LRU が効く）
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _rss() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+async def _child(count: int) -> Dict[str, Any]:
+    import bank
+    import bot as nugget
+    import members
+    from benchmarks.fake_discord import FakeDiscord
+
+    fake = FakeDiscord(latency=(0.01, 0.03))
+    await fake.start()
+    fake.patch_discord()
+    g = fake.add_guild(count)
+    channel = fake.snowflake()
+    role = fake._guild_json(g)["roles"][1]
+
+    def payload(name: str, options: List[Dict[str, Any]], resolved: Dict[str, Any]) -> Dict[str, Any]:
+        iid = fake.snowflake()
+        member = dict(fake._member_json(g, 1), roles=[str(g["admin_role"])], permissions="8")  # 管理者
+        return {"id": str(iid), "application_id": str(fake.app_id), "type": 2, "token": f"t{iid}", "version": 1,
+                "guild_id": str(g["id"]), "channel_id": str(channel),
+                "channel": {"id": str(channel), "type": 0, "guild_id": str(g["id"]), "name": "bench",
+                            "position": 0, "permission_overwrites": [], "nsfw": False, "parent_id": None},
+                "member": member, "locale": "ja", "guild_locale": "ja", "app_permissions": "0",
+                "data": {"id": "0", "name": name, "type": 1, "options": options, "resolved": resolved}}
+
+    async def call(name: str, options=(), resolved=None, done=None) -> Dict[str, Any]:
+        # done(message) が真になる（なければ最初の応答の）時刻までの秒数と、最後に見たメッセージ
+        p = payload(name, list(options), resolved or {})
+        token, t0 = p["token"], time.monotonic()
+        await fake.inject(p)
+        while True:
+            msgs = [m for m in fake.messages.values() if m.token == token]
+            if msgs and (done is None or any(done(m) for m in msgs)):
+                return {"s": time.monotonic() - t0, "message": msgs[-1]}
+            if time.monotonic() - t0 > 300:
+                raise RuntimeError(f"/{name} の応答を待ちきれませんでした")
+            await asyncio.sleep(0.005)
+
+    client = nugget.bot
+    gc.collect()
+    rss0 = _rss()
+    t0 = time.monotonic()
+    runner = asyncio.create_task(client.start("fake-token"))
+    await fake.wait_ready()
+    ping = await call("ping")
+    first_command = time.monotonic() - t0
+    await asyncio.wait_for(client.wait_until_ready(), 600)
+    login = time.monotonic() - t0
+    gc.collect()
+    rss1 = _rss()
+    guild = client.get_guild(g["id"])
+    cached = len(guild.members) if guild is not None else 0
+    objects = len(gc.get_objects())
+
+    # ロール付与の間の RSS を 10 ミリ秒ごとに見る
+    peak = [rss1]
+
+    async def sample() -> None:
+        while True:
+            peak[0] = max(peak[0], _rss())
+            await asyncio.sleep(0.01)
+
+    sampler = asyncio.create_task(sample())
+    grant = await call("ロール付与", [{"name": "amount", "type": 4, "value": 10},
+                                  {"name": "role", "type": 8, "value": role["id"]}],
+                       {"roles": {role["id"]: role}},
+                       done=lambda m: (m.data.get("content") or "").startswith(("✅", "❌")))
+    sampler.cancel()
+    granted = (grant["message"].data.get("content") or "").split("（", 1)[-1].split(" 人", 1)[0]
+
+    # ランキングの上位 10 人をギルドのメンバーにする
+    bank.apply_batch({g["first_user"] + i: 10_000_000 - i for i in range(10)})
+    ranking = []
+    for _ in range(2):
+        r = await call("ランキング")
+        desc = r["message"].data["embeds"][0]["description"]
+        ranking.append({"s": r["s"], "names": desc.count("member"), "mentions": desc.count("<@")})
+
+    out = {
+        "mode": members.MODE,
+        "members": count,
+        "first_command_s": first_command,
+        "ping_s": ping["s"],
+        "login_s": login,
+        "rss_before_mb": rss0 / 2**20,
+        "rss_ready_mb": rss1 / 2**20,
+        "rss_delta_mb": (rss1 - rss0) / 2**20,
+        "cached_members": cached,
+        "gc_objects": objects,
+        "chunks": fake.chunks_sent,
+        "role_grant_s": grant["s"],
+        "role_granted": granted,
+        "role_grant_peak_mb": (peak[0] - rss1) / 2**20,
+        "ranking": ranking,
+        "member_lru": members.cache.stats(),
+    }
+    await client.close()
+    runner.cancel()
+    try:
+        await runner
+    except (asyncio.CancelledError, Exception):
+        pass
+    await fake.stop()
+    return out
+
+
+def _spawn(mode: str, count: int) -> Dict[str, Any]:
+    env = dict(os.environ, MEMBER_CACHE=mode,
+               PYTHONPATH=str(ROOT) + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    env.pop("METRICS_PORT", None)
+    with tempfile.TemporaryDirectory() as d:
+        p = subprocess.run([sys.executable, "-m", "benchmarks.bench_members", "--child", "--members", str(count)],
+                           cwd=d, env=env, capture_output=True, text=True, timeout=1200)
+    if p.returncode != 0:
+        raise RuntimeError(p.stderr.strip() or p.stdout.strip())
+    return json.loads(p.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--members", type=int, default=100_000)
+    p.add_argument("--modes", default="full,lazy", help="比べる MEMBER_CACHE（カンマ区切り）")
+    p.add_argument("--json", help="結果を JSON で保存する")
+    p.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_child(args.members)), ensure_ascii=False))
+        return 0
+
+    results = [_spawn(mode, args.members) for mode in args.modes.split(",")]
+    for r in results:
+        rk = ", ".join(f"{x['s'] * 1000:.0f} ms ({x['names']} names)" for x in r["ranking"])
+        print(f"{r['mode']:5s} members={r['members']:,}  login {r['login_s']:.2f}s  first /ping {r['first_command_s']:.2f}s  "
+              f"RSS +{r['rss_delta_mb']:.1f} MB  cached={r['cached_members']:,}  gc objects={r['gc_objects']:,}")
+        print(f"      /ロール付与 {r['role_grant_s']:.2f}s ({r['role_granted']} 人, RSS peak +{r['role_grant_peak_mb']:.1f} MB)  "
+              f"/ランキング {rk}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""ランキング: RankIndex の差分更新 vs 問い合わせごとの全件ソート。
+
+    python -m benchmarks.bench_rank [--users 1000000] [--ops 2000]
+"""
+import argparse
+import random
+import time
+
+from rank import RankIndex
+
+
+def _sort_on_demand(data, limit=10):
+    return sorted(data.items(), key=lambda kv: (-kv[1], kv[0]))[:limit]
+
+
+def _rank_on_demand(data, user_id):
+    bal = data[user_id]
+    return sum(1 for uid, b in data.items() if b > bal or (b == bal and uid < user_id)) + 1
+
+
+def run(users: int, ops: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    data = {uid: rng.randint(1, 1_000_000) for uid in range(users)}
+
+    t0 = time.perf_counter()
+    index = RankIndex(data.items())
+    build = time.perf_counter() - t0
+
+    # 更新 + 上位 10 件 + 自分の順位（RankIndex）
+    t0 = time.perf_counter()
+    for _ in range(ops):
+        uid = rng.randrange(users)
+        data[uid] = rng.randint(1, 1_000_000)
+        index.update(uid, data[uid])
+        index.top(0, 10)
+        index.rank_of(uid)
+    indexed = (time.perf_counter() - t0) / ops
+
+    # 同じ処理を全件ソートで（遅いので回数を絞る）
+    slow_ops = max(1, min(ops, 5))
+    t0 = time.perf_counter()
+    for _ in range(slow_ops):
+        uid = rng.randrange(users)
+        data[uid] = rng.randint(1, 1_000_000)
+        _sort_on_demand(data)
+        _rank_on_demand(data, uid)
+    on_demand = (time.perf_counter() - t0) / slow_ops
+
+    # 両方式の結果が一致することを確認
+    for uid, bal in data.items():
+        index.update(uid, bal)
+
+    assert index.top(0, 10) == _sort_on_demand(data)
+    return {
+        "users": users,
+        "build_s": build,
+        "indexed_op_us": indexed * 1e6,
+        "sort_on_demand_op_us": on_demand * 1e6,
+        "speedup": on_demand / indexed if indexed else float("inf"),
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--users", type=int, default=1_000_000)
+    p.add_argument("--ops", type=int, default=2000)
+    args = p.parse_args()
+    r = run(args.users, args.ops)
+    print(f"users={r['users']:,}  index build={r['build_s']:.2f}s")
+    print(f"  RankIndex      : {r['indexed_op_us']:10.1f} us / (update + top10 + rank)")
+    print(f"  sort on demand : {r['sort_on_demand_op_us']:10.1f} us / (update + top10 + rank)")
+    print(f"  speedup        : {r['speedup']:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""同時進行のゲームセッションのメモリ: N 人が /チンチロ・/スロット・/ブラックジャック を開いたまま
+ボタンを押さずにいるときの RSS を測る（fake_discord.py に本物の NuggetBot をつなぐ）。
+
+    python -m benchmarks.bench_sessions [--sessions 10000] [--burst 1] [--json out.json]
+
+確認ビュー / ブラックジャックの卓が全員分表示された時点で、開く前からの RSS の増分、
+ピーク RSS、GC が追跡しているオブジェクト数、ViewStore に残っている View の数、
+asyncio のタスク数を表示する。--burst K を付けると各ユーザーが同じコマンドを K 回連打する
+（同時セッション数の上限で View とタスクが増えすぎないことの確認用）。
+"""
+import argparse
+import asyncio
+import gc
+import importlib
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+import bank
+import bot as nugget
+import rng
+from benchmarks.bench_load import GAMES, START_BALANCE, Harness, Session
+from benchmarks.fake_discord import FakeDiscord
+
+# setup_hook が読み込む games を、作業ディレクトリを移す前に読み込んでおく（名前は使わないので import 文にしない）
+importlib.import_module("games")
+
+
+def _rss() -> int:
+    # 現在の RSS（バイト）
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _peak_rss() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _tasks() -> int:
+    # ボット側のタスク数（代役サーバーの接続ごとのハンドラーは数えない）
+    return sum(1 for t in asyncio.all_tasks()
+               if "aiohttp/web_protocol" not in getattr(getattr(t.get_coro(), "cr_code", None), "co_filename", ""))
+
+
+def _views(client) -> int:
+    store = client._connection._view_store
+    return len({id(v) for v in store._synced_message_views.values()}
+               | {id(e[0] if isinstance(e, tuple) else getattr(e, "view", e))
+                  for items in store._views.values() for e in items.values()})
+
+
+async def run(count: int, channels: int, burst: int = 1, seed: int = 0) -> Dict[str, Any]:
+    fake = FakeDiscord(latency=(0.001, 0.005), seed=seed)
+    await fake.start()
+    fake.patch_discord()
+    h = Harness(fake, count, channels, (0.0, 0.0), seed)
+    bank.apply_batch({uid: START_BALANCE for uid in h.users})
+
+    client = nugget.bot
+    runner = asyncio.create_task(client.start("fake-token"))
+    await fake.wait_ready()
+    await asyncio.wait_for(client.wait_until_ready(), 30)
+
+    order = list(GAMES)
+    sessions = []
+    for i, uid in enumerate(h.users):
+        s = Session(h, f"s{i}", uid, h.channels[i % channels], None)
+        s.game = order[i % len(order)]
+        h.sessions[s.sid] = s
+        sessions.append(s)
+
+    async def spam(s: Session) -> None:
+        for _ in range(burst):
+            await h.inject(s, "command", {"id": "0", "name": GAMES[s.game], "type": 1,
+                                          "options": [{"name": "amount", "type": 4, "value": 100}]})
+
+    gc.collect()
+    rss0 = _rss()
+    tasks0 = _tasks()
+    t0 = time.monotonic()
+    # 少しずつ送る（一度に全部送るとゲートウェイの送信待ちが RSS に乗る）
+    for n in range(0, count, 200):
+        await asyncio.gather(*(spam(s) for s in sessions[n:n + 200]))
+        await asyncio.sleep(0)
+    while any(len(s.messages) < burst for s in sessions):
+        if time.monotonic() - t0 > 300:
+            raise RuntimeError("全員分の表示を待ちきれませんでした")
+        await asyncio.sleep(0.1)
+    opened = time.monotonic() - t0
+    await asyncio.sleep(1.0)  # original_response() の取得まで待つ
+    gc.collect()
+    rss1 = _rss()
+
+    registry = getattr(sys.modules.get("sessions"), "registry", None)
+    out = {
+        "sessions": count,
+        "burst": burst,
+        "commands": count * burst,
+        "open_s": opened,
+        "rss_before_mb": rss0 / 2**20,
+        "rss_after_mb": rss1 / 2**20,
+        "rss_delta_mb": (rss1 - rss0) / 2**20,
+        "bytes_per_session": (rss1 - rss0) / count,
+        "peak_rss_mb": _peak_rss() / 2**20,
+        "gc_objects": len(gc.get_objects()),
+        "views": _views(client),
+        "tasks": _tasks() - tasks0,
+        "registry": registry.stats() if registry is not None else None,
+    }
+
+    await client.close()
+    runner.cancel()
+    try:
+        await runner
+    except (asyncio.CancelledError, Exception):
+        pass
+    await fake.stop()
+    return out
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--sessions", type=int, default=10_000)
+    p.add_argument("--channels", type=int, default=50)
+    p.add_argument("--burst", type=int, default=1, help="1 人あたりの連打回数")
+    p.add_argument("--json", help="結果を JSON で保存する")
+    args = p.parse_args()
+    out_path = Path(args.json).resolve() if args.json else None
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as d:
+        os.chdir(d)
+        try:
+            r = asyncio.run(run(args.sessions, args.channels, args.burst))
+        finally:
+            bank.close()
+            rng.close()
+            os.chdir(cwd)
+
+    print(f"users={r['sessions']:,} x {r['burst']} commands  opened in {r['open_s']:.1f}s  views={r['views']:,}  "
+          f"tasks={r['tasks']:+,}  gc objects={r['gc_objects']:,}")
+    print(f"  RSS {r['rss_before_mb']:.1f} -> {r['rss_after_mb']:.1f} MB  "
+          f"(+{r['rss_delta_mb']:.1f} MB, {r['bytes_per_session']:,.0f} B/session)  peak {r['peak_rss_mb']:.1f} MB")
+    if r["registry"] is not None:
+        print(f"  registry: {r['registry']}")
+    if out_path is not None:
+        out_path.write_text(json.dumps(r, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
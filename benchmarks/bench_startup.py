@@ -0,0 +1,145 @@
+"""起動の速さ: プロセス起動から最初のコマンド（/ping）に応答するまでの時間と、再接続のたびの
+スラッシュコマンド同期の回数を測る（fake_discord.py に本物の NuggetBot をつなぐ）。
+
+    python -m benchmarks.bench_startup [--reconnects 3] [--sync-ms 1500] [--guilds 0] [--json out.json]
+
+同じ作業ディレクトリでボットを 2 回起動する（それぞれ別プロセス）。
+- cold: 同期済みハッシュがない状態（初回デプロイ / コマンドを変えた直後）
+- warm: 1 回目と同じコマンドツリーで再起動（ハッシュが一致するので同期しない）
+それぞれ、起動後に --reconnects 回ゲートウェイを切って再接続させ、再接続から /ping の応答までの
+時間と、全体で送られたコマンド同期（PUT .../commands）の回数を数える。
+--sync-ms はコマンド同期の応答にかける遅延（本物の一括上書きは 1 秒前後かかる）。
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _process_age() -> float:
+    with open("/proc/self/stat") as f:
+        started = int(f.read().rsplit(")", 1)[1].split()[19])
+    with open("/proc/uptime") as f:
+        uptime = float(f.read().split()[0])
+    return max(0.0, uptime - started / os.sysconf("SC_CLK_TCK"))
+
+
+STARTED = time.monotonic() - _process_age()
+APP_ID = 1 << 60  # 起動をまたいで同じアプリとして扱う
+
+
+async def _child(reconnects: int, sync_ms: float) -> Dict[str, Any]:
+    import bot as nugget
+    from benchmarks.bench_load import Harness, Session
+    from benchmarks.fake_discord import FakeDiscord
+
+    imported = time.monotonic() - STARTED
+    fake = FakeDiscord(latency=(0.03, 0.12), sync_latency=sync_ms / 1000, app_id=APP_ID)
+    await fake.start()
+    fake.patch_discord()
+    h = Harness(fake, 1, 1, (0.0, 0.0), 0)
+    s = Session(h, "s0", h.users[0], h.channels[0], None)
+    h.sessions[s.sid] = s
+
+    async def ping(since: float) -> float:
+        await fake.wait_ready()
+        iid = await h.inject(s, "command", {"id": "0", "name": "ping", "type": 1})
+        while iid not in fake.first_response:
+            if time.monotonic() - since > 60:
+                raise RuntimeError("/ping の応答を待ちきれませんでした")
+            await asyncio.sleep(0.002)
+        return fake.first_response[iid] - since
+
+    client = nugget.bot
+    readies = []
+
+    async def on_ready() -> None:
+        readies.append(time.monotonic())
+
+    async def wait_on_ready() -> None:
+        # on_ready は READY のあとギルドの到着を guild_ready_timeout（2 秒）待ってから呼ばれる
+        while len(readies) < fake.readies:
+            await asyncio.sleep(0.01)
+
+    client.add_listener(on_ready, "on_ready")
+    runner = asyncio.create_task(client.start("fake-token"))
+    first = await ping(STARTED)
+    await asyncio.wait_for(wait_on_ready(), 30)
+    after = []
+    for _ in range(reconnects):
+        t0 = time.monotonic()
+        await fake.reconnect()
+        after.append(await ping(t0))
+        await asyncio.wait_for(wait_on_ready(), 30)
+    # 裏で走っている同期が終わるのを待ってから数える
+    await asyncio.sleep(sync_ms / 1000 + 0.5)
+    task = getattr(client, "sync_task", None)
+    if task is not None:
+        await asyncio.wait_for(task, 30)
+    syncs = sum(1 for c in fake.calls if c.route == "PUT /applications/commands")
+
+    await client.close()
+    runner.cancel()
+    try:
+        await runner
+    except (asyncio.CancelledError, Exception):
+        pass
+    await fake.stop()
+    return {"import_s": imported, "first_command_s": first, "reconnect_to_command_s": after,
+            "readies": fake.readies, "syncs": syncs}
+
+
+def _spawn(workdir: str, args: argparse.Namespace) -> Dict[str, Any]:
+    env = dict(os.environ, PYTHONPATH=str(ROOT) + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    env.pop("METRICS_PORT", None)
+    if args.guilds:
+        env["GUILD_IDS"] = ",".join(str(1000 + i) for i in range(args.guilds))
+    cmd = [sys.executable, "-m", "benchmarks.bench_startup", "--child",
+           "--reconnects", str(args.reconnects), "--sync-ms", str(args.sync_ms)]
+    p = subprocess.run(cmd, cwd=workdir, env=env, capture_output=True, text=True, timeout=300)
+    if p.returncode != 0:
+        raise RuntimeError(p.stderr.strip() or p.stdout.strip())
+    return json.loads(p.stdout.strip().splitlines()[-1])
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as d:
+        return {"cold": _spawn(d, args), "warm": _spawn(d, args),
+                "reconnects": args.reconnects, "sync_ms": args.sync_ms, "guilds": args.guilds}
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--reconnects", type=int, default=3)
+    p.add_argument("--sync-ms", type=float, default=1500, help="コマンド同期の応答遅延（ミリ秒）")
+    p.add_argument("--guilds", type=int, default=0, help="GUILD_IDS に並べるギルドの数（0 ならグローバル同期）")
+    p.add_argument("--json", help="結果を JSON で保存する")
+    p.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.child:
+        r = asyncio.run(_child(args.reconnects, args.sync_ms))
+        print(json.dumps(r))
+        return 0
+
+    r = run(args)
+    for name in ("cold", "warm"):
+        c = r[name]
+        again = ", ".join(f"{t:.2f}" for t in c["reconnect_to_command_s"]) or "-"
+        print(f"{name}: start -> first /ping {c['first_command_s']:.2f}s (imports {c['import_s']:.2f}s)  "
+              f"reconnect -> /ping [{again}]s  command syncs={c['syncs']} over {c['readies']} READY")
+    if args.json:
+        Path(args.json).write_text(json.dumps(r, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""卓（tables.py）と 1 人用のゲームの比較: 同じ人数が同じチャンネルで 1 ラウンドずつ遊んだときの
+REST 呼び出し数・メッセージ編集数・バンクの書き込み回数（fake_discord.py に本物の NuggetBot をつなぐ）。
+
+    python -m benchmarks.bench_tables [--players 8] [--tables 20] [--game chinchiro] [--json out.json]
+
+--tables 個のチャンネルに --players 人ずつ置き、まず全員が 1 人用のコマンドで 1 回ずつ遊び、
+次にチャンネルごとに 1 卓を開いて全員が参加する（1 人が開き、残りは「参加する」ボタン、
+揃ったら開いた人が「開始」）。ブラックジャックは 17 未満なら Hit、それ以外は Stand。
+
+報告する内容（どちらも 1 プレイヤー・1 ラウンドあたり）:
+- REST 呼び出し数（うちメッセージ編集）と 429 の回数
+- バンクの書き込み（バックエンドへの apply）の回数
+- 残高の整合性（bench_load.py と同じ確認）と、ラウンドログの再現（rng.replay）が全件一致するか
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List
+
+import bank
+import bot as nugget
+import rng
+from benchmarks.bench_load import START_BALANCE, Harness, Session, Stalled, check_bank
+from benchmarks.fake_discord import FakeDiscord, FakeMessage
+
+# setup_hook が読み込む games / tables を、作業ディレクトリを移す前に読み込んでおく（名前は使わないので import 文にしない）
+importlib.import_module("games")
+importlib.import_module("tables")
+
+TABLE_COMMANDS = {"chinchiro": "チンチロ卓", "blackjack": "ブラックジャック卓"}
+
+
+def _title(m: FakeMessage) -> str:
+    embeds = m.data.get("embeds") or []
+    return (embeds[0].get("title") or "") if embeds else ""
+
+
+def _my_total(m: FakeMessage, name: str):
+    # 卓の表示から自分の行（**名前**（掛け金）: 手札（合計）状態）を探す
+    desc = (m.data.get("embeds") or [{}])[0].get("description") or ""
+    for line in desc.splitlines():
+        if line.startswith(f"**{name}**"):
+            found = re.search(r"（(\d+)）([^（]*)$", line)
+            if found:
+                return int(found.group(1)), found.group(2).strip()
+    return None
+
+
+async def _solo(s: Session, game: str, amount: int) -> None:
+    await s.command(game, amount)
+    if game == "blackjack":
+        await s.blackjack()
+    else:
+        await s.confirm_and_wait(game)
+
+
+async def _table(h: Harness, seats: List[Session], game: str, amount: int) -> None:
+    host, others = seats[0], seats[1:]
+    host.messages.clear()
+    await h.inject(host, "command", {"id": "0", "name": TABLE_COMMANDS[game], "type": 1,
+                                     "options": [{"name": "amount", "type": 4, "value": amount}]})
+    found = await host.wait(host._button("参加する"))
+    if not found:
+        raise Stalled()
+    table = found[0]
+    await asyncio.gather(*(s.press(table, table.buttons()["参加する"]) for s in others))
+    await host.wait(lambda: f"（{len(seats)}/" in _title(table))
+    await host.press(table, table.buttons()["開始"])
+
+    if game == "blackjack":
+        async def play(s: Session) -> None:
+            name = f"user{s.user_id % 100000}"
+            while "結果" not in _title(table):
+                buttons = table.buttons()
+                mine = _my_total(table, name)
+                if "Hit" not in buttons or mine is None or mine[1]:
+                    # まだ配られていない / 自分の手番は終わった
+                    version = table.version
+                    await host.wait(lambda: table.version > version or "結果" in _title(table))
+                    continue
+                version = table.version
+                await s.press(table, buttons["Hit" if mine[0] < 17 else "Stand"])
+                await host.wait(lambda: table.version > version or "結果" in _title(table))
+
+        await asyncio.gather(*(play(s) for s in seats))
+    await host.wait(lambda: "結果" in _title(table))
+
+
+def _count_writes() -> Dict[str, int]:
+    # バックエンドへの書き込み（apply）の回数を数える
+    backend = bank.get_backend()
+    counter = {"writes": 0}
+    orig = backend.apply
+
+    def apply(*args, **kwargs):
+        counter["writes"] += 1
+        return orig(*args, **kwargs)
+
+    backend.apply = apply
+    return counter
+
+
+async def run(players: int, count: int, game: str, seed: int = 0) -> Dict[str, Any]:
+    fake = FakeDiscord(latency=(0.03, 0.12), seed=seed)
+    await fake.start()
+    fake.patch_discord()
+    h = Harness(fake, players * count, count, (0.05, 0.2), seed)
+    bank.apply_batch({uid: START_BALANCE for uid in h.users})
+    writes = _count_writes()
+
+    client = nugget.bot
+    runner = asyncio.create_task(client.start("fake-token"))
+    await fake.wait_ready()
+    await asyncio.wait_for(client.wait_until_ready(), 30)
+
+    groups = []
+    for c in range(count):
+        group = []
+        for p in range(players):
+            n = c * players + p
+            s = Session(h, f"s{n}", h.users[n], h.channels[c], random.Random(seed * 1_000_003 + n))
+            s.game = game
+            h.sessions[s.sid] = s
+            group.append(s)
+        groups.append(group)
+
+    out: Dict[str, Any] = {"players": players, "tables": count, "game": game}
+    for mode in ("solo", "table"):
+        calls0, writes0, limited0 = len(fake.calls), writes["writes"], fake.rate_limited
+        t0 = time.monotonic()
+        if mode == "solo":
+            await asyncio.gather(*(_solo(s, game, 100) for group in groups for s in group))
+        else:
+            await asyncio.gather(*(_table(h, group, game, 100) for group in groups))
+        elapsed = time.monotonic() - t0
+        await asyncio.sleep(1.0)  # 結果表示の後のボタン無効化などを待つ
+        calls = fake.calls[calls0:]
+        rounds = players * count
+        out[mode] = {
+            "elapsed_s": elapsed,
+            "rest_calls": len(calls),
+            "calls_per_round": len(calls) / rounds,
+            "edits_per_round": sum(1 for c in calls if c.method == "PATCH") / rounds,
+            "rate_limited": fake.rate_limited - limited0,
+            "bank_writes": writes["writes"] - writes0,
+            "bank_writes_per_round": (writes["writes"] - writes0) / rounds,
+            "routes": dict(Counter(c.route for c in calls).most_common()),
+        }
+
+    out["consistency"] = check_bank(h.users, rng.ROUNDS_FILE)
+    rounds = list(rng._entries(rng.ROUNDS_FILE))
+    out["replayed"] = len(rounds)
+    out["replay_mismatches"] = sum(1 for e in rounds if not rng.replay(e)["ok"])
+    out["table_rounds"] = sum(1 for e in rounds if "table" in e)
+
+    await client.close()
+    runner.cancel()
+    try:
+        await runner
+    except (asyncio.CancelledError, Exception):
+        pass
+    await fake.stop()
+    return out
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--players", type=int, default=8, help="1 卓（1 チャンネル）の人数")
+    p.add_argument("--tables", type=int, default=20, help="卓（チャンネル）の数")
+    p.add_argument("--game", choices=sorted(TABLE_COMMANDS), default="chinchiro")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--json", help="結果を JSON で保存する")
+    args = p.parse_args()
+    out_path = Path(args.json).resolve() if args.json else None
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as d:
+        os.chdir(d)
+        try:
+            r = asyncio.run(run(args.players, args.tables, args.game, args.seed))
+        finally:
+            bank.close()
+            rng.close()
+            os.chdir(cwd)
+
+    print(f"{r['game']}: {r['tables']} channels x {r['players']} players, 1 round each")
+    for mode in ("solo", "table"):
+        m = r[mode]
+        print(f"  {mode:5s} {m['elapsed_s']:6.1f}s  REST {m['calls_per_round']:5.2f}/round "
+              f"(edits {m['edits_per_round']:4.2f})  429s={m['rate_limited']}  "
+              f"bank writes {m['bank_writes_per_round']:.3f}/round")
+    c = r["consistency"]
+    print(f"  conserved={c['conserved']}  open holds={c['open_holds']}  ledger mismatches={c['ledger_mismatches']}  "
+          f"economy matches={c['economy_matches']}  "
+          f"replayed={r['replayed']} (mismatches {r['replay_mismatches']}, table rounds {r['table_rounds']})")
+    if out_path is not None:
+        out_path.write_text(json.dumps(r, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,431 @@
+"""負荷試験用のローカルな Discord の代役（ゲートウェイ + REST API）。
+
+aiohttp で 1 つのポートに WebSocket のゲートウェイ（"/"）と REST（"/api/v10/..."）を立て、
+discord.py の接続先を書き換えて本物の NuggetBot をつなぐ。
+
+- ゲートウェイ: HELLO / IDENTIFY / READY / ハートビートと、inject() で渡したインタラクションの
+  INTERACTION_CREATE だけを扱う。reconnect() で接続を切ると、再開（RESUME）にも READY を返す
+- add_guild() で大きなギルドを置ける。READY のあと GUILD_CREATE を送り、メンバーのチャンク要求
+  （op 8）には 1000 人ずつの GUILD_MEMBERS_CHUNK で、REST のメンバー一覧 / 1 人分の取得にも応える。
+  メンバーは番号から都度作るので、代役自身のメモリは人数によらない
+- REST: インタラクションの応答（callback）、フォローアップ、メッセージの取得 / 編集 / 削除、
+  コマンド同期。応答には遅延（latency）を入れ、ルートごとのレート制限を超えると
+  本物と同じ形の 429 を返す（ヘッダーつきなので discord.py は待ってから再送する）
+- 全ての REST 呼び出しを calls に記録する。メッセージの作成・編集は on_message で通知する
+
+エフェメラルなメッセージをチャンネルのルートで編集しようとすると 404 を返す（本物と同じ）。
+"""
+import asyncio
+import json
+import random
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+import yarl
+from aiohttp import web
+
+API = "/api/v10"
+DISCORD_EPOCH = 1420070400000
+EPHEMERAL = 1 << 6
+
+# コールバックの種類（InteractionResponseType）
+PONG, MESSAGE, DEFERRED_MESSAGE, DEFERRED_UPDATE, UPDATE_MESSAGE = 1, 4, 5, 6, 7
+
+
+class Call:
+    """記録した REST 呼び出し 1 件。"""
+
+    __slots__ = ("t", "method", "route", "token", "status", "elapsed")
+
+    def __init__(self, t: float, method: str, route: str, token: Optional[str], status: int, elapsed: float):
+        self.t, self.method, self.route, self.token = t, method, route, token
+        self.status, self.elapsed = status, elapsed
+
+
+class FakeMessage:
+    __slots__ = ("id", "channel_id", "token", "interaction_id", "data", "version", "deleted")
+
+    def __init__(self, id: int, channel_id: int, token: str, interaction_id: Optional[int], data: Dict[str, Any]):
+        self.id, self.channel_id, self.token, self.interaction_id = id, channel_id, token, interaction_id
+        self.data = data
+        self.version = 0
+        self.deleted = False
+
+    @property
+    def ephemeral(self) -> bool:
+        return bool(self.data.get("flags", 0) & EPHEMERAL)
+
+    def buttons(self) -> Dict[str, str]:
+        """{ラベル: custom_id}（押せるボタンのみ）"""
+        out = {}
+        for row in self.data.get("components") or []:
+            for c in row.get("components", []):
+                if c.get("type") == 2 and not c.get("disabled") and "custom_id" in c:
+                    out[c.get("label")] = c["custom_id"]
+        return out
+
+
+class _Bucket:
+    __slots__ = ("remaining", "reset_at")
+
+    def __init__(self, limit: int):
+        self.remaining = limit
+        self.reset_at = 0.0
+
+
+class FakeDiscord:
+    def __init__(self, latency: Tuple[float, float] = (0.03, 0.12), edit_limit: Tuple[int, float] = (5, 5.0),
+                 webhook_limit: Tuple[int, float] = (5, 2.0), seed: int = 0, sync_latency: float = 0.0,
+                 app_id: Optional[int] = None):
+        # latency: REST の応答遅延の範囲（秒、一様分布）
+        # edit_limit / webhook_limit: メッセージ編集とフォローアップの (回数, 秒) の制限
+        # sync_latency: コマンド同期（PUT .../commands）に上乗せする遅延（秒）
+        # app_id: アプリ（ボット）の ID。省略すると起動ごとに新しく振る
+        self.latency = latency
+        self.sync_latency = sync_latency
+        self.limits = {"edit": edit_limit, "webhook": webhook_limit}
+        self.rng = random.Random(seed)
+        self._last_id = 0
+        self.app_id = app_id or self.snowflake()
+        self.bot_user = {"id": str(self.app_id), "username": "nugget-bot", "discriminator": "0", "global_name": None,
+                         "avatar": None, "bot": True}
+
+        self.calls: List[Call] = []
+        self.messages: Dict[int, FakeMessage] = {}
+        self.originals: Dict[str, int] = {}           # token -> 元の応答のメッセージ ID
+        self.interactions: Dict[int, Dict[str, Any]] = {}  # id -> inject した内容
+        self._by_token: Dict[str, Dict[str, Any]] = {}     # トークン -> inject した内容
+        self.first_response: Dict[int, float] = {}    # インタラクション ID -> 最初の応答を受けた時刻
+        self.rate_limited = 0
+        self.guilds: Dict[int, Dict[str, int]] = {}  # ギルド ID -> {members, role_id, role_every, first_user}
+        self.chunks_sent = 0
+        self.readies = 0  # 送った READY の数（再接続のたびに増える）
+        self.on_message: Optional[Callable[[FakeMessage], None]] = None
+
+        self._buckets: Dict[Tuple[str, str], _Bucket] = {}
+        self._seq = 0
+        self._ws: Optional[web.WebSocketResponse] = None
+        self._ready = asyncio.Event()
+        self._runner: Optional[web.AppRunner] = None
+        self.base = ""
+
+    # --- ID ---
+
+    def snowflake(self) -> int:
+        # 時刻ベースで単調増加（同じミリ秒に何個出しても重複しない）
+        self._last_id = max(self._last_id + 1, (int(time.time() * 1000) - DISCORD_EPOCH) << 22)
+        return self._last_id
+
+    # --- ギルド ---
+
+    def add_guild(self, members: int, role_every: int = 10) -> Dict[str, int]:
+        """members 人のギルドを作る。role_every 人に 1 人がロール role_id を持つ（admin_role は管理者権限）。"""
+        gid = self.snowflake()
+        g = {"id": gid, "members": members, "role_id": self.snowflake(), "role_every": role_every,
+             "admin_role": self.snowflake(), "first_user": self.snowflake() << 1}
+        self.guilds[gid] = g
+        return g
+
+    def _member_json(self, g: Dict[str, int], i: int) -> Dict[str, Any]:
+        uid = g["first_user"] + i
+        return {"user": {"id": str(uid), "username": f"member{i}", "discriminator": "0", "global_name": None,
+                         "avatar": None},
+                "roles": [str(g["role_id"])] if i % g["role_every"] == 0 else [],
+                "joined_at": "2024-01-01T00:00:00+00:00", "deaf": False, "mute": False, "flags": 0,
+                "nick": None, "avatar": None, "pending": False}
+
+    def _guild_json(self, g: Dict[str, int]) -> Dict[str, Any]:
+        role = {"id": "", "name": "", "color": 0, "hoist": False, "position": 0, "permissions": "0",
+                "managed": False, "mentionable": False}
+        return {
+            "id": str(g["id"]), "name": "fake-guild", "icon": None, "owner_id": "1", "large": g["members"] > 250,
+            "member_count": g["members"], "features": [], "emojis": [], "stickers": [], "threads": [],
+            "channels": [], "stage_instances": [], "guild_scheduled_events": [], "voice_states": [],
+            "presences": [], "premium_tier": 0, "verification_level": 0, "explicit_content_filter": 0,
+            "default_message_notifications": 0, "mfa_level": 0, "nsfw_level": 0, "preferred_locale": "ja",
+            "system_channel_flags": 0, "unavailable": False, "joined_at": "2024-01-01T00:00:00+00:00",
+            "roles": [dict(role, id=str(g["id"]), name="@everyone", permissions="104324673"),
+                      dict(role, id=str(g["role_id"]), name="fake-role", position=1),
+                      dict(role, id=str(g["admin_role"]), name="fake-admin", position=2, permissions="8")],
+            "members": [{"user": self.bot_user, "roles": [], "joined_at": "2024-01-01T00:00:00+00:00",
+                         "deaf": False, "mute": False, "flags": 0}],
+        }
+
+    async def _send_chunks(self, d: Dict[str, Any]) -> None:
+        g = self.guilds.get(int(d["guild_id"]))
+        if g is None:
+            return
+        count = max(1, -(-g["members"] // 1000))
+        for n in range(count):
+            await self._send(0, {
+                "guild_id": str(g["id"]), "chunk_index": n, "chunk_count": count, "nonce": d.get("nonce"),
+                "members": [self._member_json(g, i) for i in range(n * 1000, min(g["members"], (n + 1) * 1000))],
+            }, "GUILD_MEMBERS_CHUNK")
+            self.chunks_sent += 1
+
+    # --- 起動 / 停止 ---
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        app = web.Application(client_max_size=8 * 1024 * 1024)
+        app.router.add_get("/", self._gateway)
+        app.router.add_route("*", API + "/{path:.*}", self._rest)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        # 接続が一度に大量に来てもあふれないようにバックログを大きく取る（既定の 128 では足りない）
+        site = web.TCPSite(self._runner, host, port, backlog=4096)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base = f"http://{host}:{port}"
+        return self.base
+
+    def patch_discord(self) -> None:
+        """discord.py の接続先をこのサーバーに向ける（import 済みのプロセス全体に効く）。"""
+        import discord.gateway
+        import discord.http
+        discord.http.Route.BASE = self.base + API
+        discord.gateway.DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL(self.base.replace("http", "ws", 1) + "/")
+
+    async def wait_ready(self, timeout: float = 30) -> None:
+        await asyncio.wait_for(self._ready.wait(), timeout)
+
+    async def reconnect(self) -> None:
+        """ゲートウェイの接続を再接続を求めるコード（4000）で切る。次の READY で wait_ready() が戻る。"""
+        self._ready.clear()
+        if self._ws is not None:
+            await self._ws.close(code=4000, message=b"reconnect")
+
+    async def stop(self) -> None:
+        if self._ws is not None:
+            await self._ws.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    # --- ゲートウェイ ---
+
+    async def _send(self, op: int, d: Any, t: Optional[str] = None) -> None:
+        payload: Dict[str, Any] = {"op": op, "d": d, "s": None, "t": t}
+        if op == 0:
+            self._seq += 1
+            payload["s"] = self._seq
+        await self._ws.send_str(json.dumps(payload, ensure_ascii=False))
+
+    async def _gateway(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse(max_msg_size=0)
+        await ws.prepare(request)
+        self._ws = ws
+        await self._send(10, {"heartbeat_interval": 41250})
+        async for msg in ws:
+            if msg.type != aiohttp.WSMsgType.TEXT:
+                continue
+            data = json.loads(msg.data)
+            op = data.get("op")
+            if op == 1:
+                await self._send(11, None)
+            elif op in (2, 6):
+                await self._send(0, {
+                    "v": 10, "user": self.bot_user, "session_id": "fake-session",
+                    "guilds": [{"id": str(gid), "unavailable": True} for gid in self.guilds],
+                    "resume_gateway_url": self.base.replace("http", "ws", 1) + "/",
+                    "application": {"id": str(self.app_id), "flags": 0},
+                }, "READY")
+                self.readies += 1
+                for g in self.guilds.values():
+                    await self._send(0, self._guild_json(g), "GUILD_CREATE")
+                self._ready.set()
+            elif op == 8:
+                asyncio.ensure_future(self._send_chunks(data["d"]))
+        return ws
+
+    async def inject(self, payload: Dict[str, Any]) -> None:
+        """インタラクションを INTERACTION_CREATE として送る。"""
+        self.interactions[int(payload["id"])] = payload
+        self._by_token[payload["token"]] = payload
+        await self._send(0, payload, "INTERACTION_CREATE")
+
+    # --- REST ---
+
+    def _message_json(self, m: FakeMessage) -> Dict[str, Any]:
+        d = {
+            "id": str(m.id), "channel_id": str(m.channel_id), "author": self.bot_user, "content": "",
+            "timestamp": "2024-01-01T00:00:00+00:00", "edited_timestamp": None, "tts": False,
+            "mention_everyone": False, "mentions": [], "mention_roles": [], "attachments": [], "embeds": [],
+            "pinned": False, "type": 0, "flags": 0, "components": [], "application_id": str(self.app_id),
+            "webhook_id": str(self.app_id),
+        }
+        d.update(m.data)
+        if m.interaction_id is not None:
+            src = self.interactions.get(m.interaction_id, {})
+            user = (src.get("member") or {}).get("user") or src.get("user") or self.bot_user
+            d["interaction"] = {"id": str(m.interaction_id), "type": 2,
+                                "name": (src.get("data") or {}).get("name", ""), "user": user}
+        return d
+
+    def _create(self, token: str, channel_id: int, data: Dict[str, Any], interaction_id: Optional[int]) -> FakeMessage:
+        m = FakeMessage(self.snowflake(), channel_id, token, interaction_id, {})
+        self._edit(m, data)
+        self.messages[m.id] = m
+        return m
+
+    def _edit(self, m: FakeMessage, data: Dict[str, Any]) -> None:
+        for key in ("content", "embeds", "components", "flags"):
+            if key in data and data[key] is not None:
+                m.data[key] = data[key]
+        m.version += 1
+        if self.on_message is not None:
+            self.on_message(m)
+
+    def _limit(self, kind: str, key: str) -> Tuple[Dict[str, str], Optional[float]]:
+        # (レート制限ヘッダー, 429 なら retry_after)
+        limit, per = self.limits[kind]
+        now = time.monotonic()
+        b = self._buckets.get((kind, key))
+        if b is None or now >= b.reset_at:
+            b = self._buckets[(kind, key)] = _Bucket(limit)
+            b.reset_at = now + per
+        reset_after = max(0.0, b.reset_at - now)
+        headers = {"X-RateLimit-Limit": str(limit), "X-RateLimit-Bucket": f"{kind}-bucket",
+                   "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+                   "X-RateLimit-Reset": f"{time.time() + reset_after:.3f}"}
+        if b.remaining <= 0:
+            headers["X-RateLimit-Remaining"] = "0"
+            headers["X-RateLimit-Scope"] = "user"
+            return headers, reset_after
+        b.remaining -= 1
+        headers["X-RateLimit-Remaining"] = str(b.remaining)
+        return headers, None
+
+    async def _payload(self, request: web.Request) -> Dict[str, Any]:
+        if not request.can_read_body:
+            return {}
+        if request.content_type.startswith("multipart/"):
+            form = await request.post()
+            return json.loads(form.get("payload_json") or "{}")
+        return await request.json()
+
+    async def _rest(self, request: web.Request) -> web.StreamResponse:
+        t0 = time.perf_counter()
+        path = "/" + request.match_info["path"]
+        method = request.method
+        await asyncio.sleep(self.rng.uniform(*self.latency))
+        route, token, status, body, headers = await self._handle(method, path, request)
+        self.calls.append(Call(time.monotonic(), method, route, token, status, time.perf_counter() - t0))
+        if status == 429:
+            self.rate_limited += 1
+            headers["Via"] = "1.1 google"
+        if status == 204:
+            return web.Response(status=204, headers=headers)
+        # discord.py は Content-Type が "application/json" ちょうどのときだけ JSON として読む
+        headers["Content-Type"] = "application/json"
+        return web.Response(body=json.dumps(body, ensure_ascii=False).encode(), status=status, headers=headers)
+
+    async def _handle(self, method: str, path: str, request: web.Request):
+        # (ルート名, トークン, ステータス, 本文, ヘッダー)
+        headers: Dict[str, str] = {}
+
+        m = re.fullmatch(r"/interactions/(\d+)/([^/]+)/callback", path)
+        if m and method == "POST":
+            iid, token = int(m.group(1)), m.group(2)
+            payload = await self._payload(request)
+            self.first_response.setdefault(iid, time.monotonic())
+            src = self.interactions.get(iid, {})
+            channel_id = int(src.get("channel_id", 0))
+            kind, data = payload.get("type"), payload.get("data") or {}
+            if kind == MESSAGE:
+                self.originals[token] = self._create(token, channel_id, data, iid).id
+            elif kind == DEFERRED_MESSAGE:
+                self.originals[token] = self._create(token, channel_id, {"flags": data.get("flags", 0)}, iid).id
+            elif kind == UPDATE_MESSAGE:
+                target = self.messages.get(int((src.get("message") or {}).get("id", 0)))
+                if target is not None:
+                    self._edit(target, data)
+                    self.originals[token] = target.id
+            return "POST /interactions/callback", token, 204, None, headers
+
+        m = re.fullmatch(r"/webhooks/(\d+)/([^/]+)(?:/messages/(@original|\d+))?", path)
+        if m:
+            token, which = m.group(2), m.group(3)
+            if which is None:
+                if method != "POST":
+                    return f"{method} /webhooks", token, 404, {"message": "Unknown Webhook", "code": 10015}, headers
+                headers, retry = self._limit("webhook", token)
+                if retry is not None:
+                    return "POST /webhooks", token, 429, {"message": "You are being rate limited.",
+                                                          "retry_after": retry, "global": False}, headers
+                payload = await self._payload(request)
+                channel_id = int(self._by_token.get(token, {}).get("channel_id", 0))
+                msg = self._create(token, channel_id, payload, None)
+                return "POST /webhooks", token, 200, self._message_json(msg), headers
+            mid = self.originals.get(token) if which == "@original" else int(which)
+            msg = self.messages.get(mid) if mid is not None else None
+            route = f"{method} /webhooks/messages"
+            if msg is None or msg.deleted:
+                return route, token, 404, {"message": "Unknown Message", "code": 10008}, headers
+            if method == "GET":
+                return route, token, 200, self._message_json(msg), headers
+            if method == "PATCH":
+                # インタラクションのメッセージ編集はトークンごとのバケット
+                headers, retry = self._limit("webhook", token)
+                if retry is not None:
+                    return route, token, 429, {"message": "You are being rate limited.",
+                                               "retry_after": retry, "global": False}, headers
+                self._edit(msg, await self._payload(request))
+                return route, token, 200, self._message_json(msg), headers
+            if method == "DELETE":
+                msg.deleted = True
+                return route, token, 204, None, headers
+
+        m = re.fullmatch(r"/channels/(\d+)/messages/(\d+)", path)
+        if m:
+            msg = self.messages.get(int(m.group(2)))
+            token = msg.token if msg is not None else None
+            route = f"{method} /channels/messages"
+            if msg is None or msg.deleted or msg.ephemeral:
+                return route, token, 404, {"message": "Unknown Message", "code": 10008}, headers
+            if method == "PATCH":
+                headers, retry = self._limit("edit", m.group(1))
+                if retry is not None:
+                    return route, token, 429, {"message": "You are being rate limited.",
+                                               "retry_after": retry, "global": False}, headers
+                self._edit(msg, await self._payload(request))
+                return route, token, 200, self._message_json(msg), headers
+            if method == "DELETE":
+                msg.deleted = True
+                return route, token, 204, None, headers
+            return route, token, 200, self._message_json(msg), headers
+
+        if path == "/gateway":
+            return "GET /gateway", None, 200, {"url": self.base.replace("http", "ws", 1) + "/"}, headers
+        if path == "/users/@me":
+            return "GET /users/@me", None, 200, self.bot_user, headers
+        if path == "/oauth2/applications/@me":
+            return "GET /oauth2/applications/@me", None, 200, {
+                "id": str(self.app_id), "name": "nugget-bot", "description": "", "icon": None,
+                "bot_public": False, "bot_require_code_grant": False, "owner": self.bot_user,
+                "verify_key": "0" * 64, "flags": 0, "team": None}, headers
+        m = re.fullmatch(r"/guilds/(\d+)/members(?:/(\d+))?", path)
+        if m and method == "GET" and int(m.group(1)) in self.guilds:
+            g = self.guilds[int(m.group(1))]
+            if m.group(2) is not None:
+                i = int(m.group(2)) - g["first_user"]
+                if not 0 <= i < g["members"]:
+                    return "GET /guilds/members/{id}", None, 404, {"message": "Unknown Member", "code": 10007}, headers
+                return "GET /guilds/members/{id}", None, 200, self._member_json(g, i), headers
+            # ユーザー ID の昇順に limit 人（after より後）
+            start = max(0, int(request.query.get("after", "0")) - g["first_user"] + 1)
+            limit = min(1000, int(request.query.get("limit", "1")))
+            return "GET /guilds/members", None, 200, [self._member_json(g, i) for i in
+                                                       range(start, min(g["members"], start + limit))], headers
+        if re.fullmatch(r"/applications/\d+(/guilds/\d+)?/commands", path):
+            payload = await self._payload(request) if method == "PUT" else []
+            if method == "PUT" and self.sync_latency:
+                await asyncio.sleep(self.sync_latency)
+            for cmd in payload:
+                cmd.setdefault("id", str(self.snowflake()))
+                cmd.setdefault("application_id", str(self.app_id))
+                cmd.setdefault("version", "1")
+                cmd.setdefault("default_member_permissions", None)
+                cmd.setdefault("type", 1)
+            return f"{method} /applications/commands", None, 200, payload, headers
+        return f"{method} {path}", None, 404, {"message": "404: Not Found", "code": 0}, headers
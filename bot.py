@@ -1,24 +1,49 @@
 # bot.py （日本語スラッシュコマンド + nuggets版）
+import asyncio
 import os
+import time
 import discord
 from discord.ext import commands
 from discord import app_commands
 
 import bank  # 同じフォルダの bank.py
-import random
-
-# 環境変数 DISCORD_TOKEN からトークン取得
+import animator
+import command_sync
+import embeds
+import members
+import metrics
+import rules
+import rng
+import sessions
+
+# 環境変数 DISCORD_TOKEN からトークン取得（起動時に確認する。負荷試験などでは import だけして使う）
 TOKEN = os.environ.get("DISCORD_TOKEN")
-if not TOKEN:
-    raise RuntimeError("環境変数 DISCORD_TOKEN が設定されていません。")
 
 # Intents 設定
 intents = discord.Intents.default()
 intents.message_content = True  # jishaku用
-intents.members = True          # メンバー情報を扱う
+intents.members = True          # メンバー情報を扱う（一覧の取得に必要。キャッシュするかは members.py の MEMBER_CACHE）
+
+
+def _process_age() -> float:
+    # プロセスが起動してからの秒数（/proc が読めなければ 0 = この行の実行時点から数える）
+    try:
+        with open("/proc/self/stat") as f:
+            started = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - started / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+STARTED = time.monotonic() - _process_age()  # プロセス起動時刻（最初のコマンド応答までの時間を出す用）
 
 class NuggetBot(commands.Bot):
     async def setup_hook(self):
+        # 残高ストアはイベントループ外で読み込んでおく
+        await bank.aopen()
+
         # ゲーム Cog を非同期でセットアップ
         try:
             import games
@@ -26,29 +51,76 @@ class NuggetBot(commands.Bot):
             print("games をセットアップしました。")
         except Exception as e:
             print(f"games のロードに失敗しました: {e}")
+        try:
+            import tables
+            await tables.setup(self)
+            print("tables をセットアップしました。")
+        except Exception as e:
+            print(f"tables のロードに失敗しました: {e}")
+
+        # メトリクス（METRICS_PORT が空なら何もしない）
+        try:
+            await metrics.start(self)
+        except Exception as e:
+            print(f"メトリクスの起動に失敗しました: {e}")
 
-bot = NuggetBot(command_prefix="!", intents=intents)  # !jsk用にprefix残す
+        # jishaku をロード（!jsk でデバッグ可能）。on_ready は再接続のたびに呼ばれるのでここで 1 回だけ
+        try:
+            await self.load_extension("jishaku")
+            print("jishaku をロードしました。(!jsk で使用)")
+        except Exception as e:
+            print(f"jishaku のロードに失敗しました: {e}")
+
+        # スラッシュコマンド同期もここで 1 回だけ。ツリーが前回から変わっていなければ省略する。
+        # ゲートウェイへの接続を待たせないように裏で行う
+        self.sync_task = asyncio.create_task(sync_commands(), name="command-sync")
+
+    async def close(self):
+        # 未保存の残高を書き出してから終了
+        await metrics.stop()
+        try:
+            await bank.aclose()
+            bank.close()
+        except Exception as e:
+            print(f"残高の保存に失敗しました: {e}")
+        await super().close()
+
+bot = NuggetBot(command_prefix="!", intents=intents, **members.client_options())  # !jsk用にprefix残す
 
 # ギルドID（開発時は自分のサーバーIDを入れると同期が速い）
-GUILD_ID = int(os.getenv("GUILD_ID", "0"))  # .envにGUILD_ID=サーバーID を入れると便利
+# GUILD_IDS にカンマ区切りで複数書くとそれぞれのギルドへ並行して同期する（GUILD_ID 1 つでもよい）
+GUILD_IDS = [int(x) for x in os.getenv("GUILD_IDS", os.getenv("GUILD_ID", "")).replace(",", " ").split() if int(x)]
+GUILD_ID = GUILD_IDS[0] if GUILD_IDS else 0  # .envにGUILD_ID=サーバーID を入れると便利
+
+
+async def sync_commands(force: bool = False, guilds=None):
+    """スラッシュコマンドを同期する（既定は GUILD_IDS の各ギルド、なければグローバル）。"""
+    if guilds is None:
+        guilds = [discord.Object(id=g) for g in GUILD_IDS] or [None]
+    for g in guilds:
+        if g is not None:
+            # グローバルのコマンドをギルドにも登録する（ギルドへの同期はすぐ反映される）
+            bot.tree.copy_global_to(guild=g)
+    t0 = time.monotonic()
+    result = await command_sync.sync(bot.tree, guilds, force=force)
+    for scope, n in result.items():
+        if n is None:
+            print(f"スラッシュコマンドに変更がないので同期を省略しました。({scope})")
+        else:
+            print(f"スラッシュコマンドを {n} 個同期しました。({scope}, {time.monotonic() - t0:.2f} 秒)")
+    return result
+
 
 @bot.event
 async def on_ready():
     print(f"ログインしました: {bot.user} (ID: {bot.user.id})")
-    
-    # jishaku をロード（!jsk でデバッグ可能）
-    try:
-        await bot.load_extension("jishaku")
-        print("jishaku をロードしました。(!jsk で使用)")
-    except Exception as e:
-        print(f"jishaku のロードに失敗しました: {e}")
-    
-    # スラッシュコマンド同期
-    try:
-        synced = await bot.tree.sync(guild=discord.Object(id=GUILD_ID) if GUILD_ID else None)
-        print(f"スラッシュコマンドを {len(synced)} 個同期しました。")
-    except Exception as e:
-        print(f"スラッシュコマンド同期エラー: {e}")
+
+
+@bot.listen("on_app_command_completion")
+async def _first_command(interaction: discord.Interaction, command):
+    # 起動から最初にコマンドを処理し終えるまでの時間（1 回だけ表示）
+    bot.remove_listener(_first_command, "on_app_command_completion")
+    print(f"起動から最初のコマンド応答まで {time.monotonic() - STARTED:.2f} 秒 (/{command.qualified_name})")
 
 # --- 日本語スラッシュコマンド群（nuggets） ---
 
@@ -57,9 +129,134 @@ async def on_ready():
 async def 残高確認(interaction: discord.Interaction, member: discord.Member = None):
     """残高確認スラッシュコマンド"""
     target = member or interaction.user
-    bal = bank.get_balance(target.id)
+    bal = await bank.aget_balance(target.id)
     await interaction.response.send_message(f"{target.mention} の残高は **{bal} nuggets** です。")
 
+RANKING_PAGE_SIZE = 10
+
+@bot.tree.command(name="ランキング", description="nuggets の所持数ランキングを表示します")
+@app_commands.describe(page="表示するページ（1 ページ 10 人）")
+async def ランキング(interaction: discord.Interaction, page: int = 1):
+    """ランキングスラッシュコマンド（前後ページボタン付き）"""
+
+    async def page_count() -> int:
+        return max(1, -(-(await bank.aranked_count()) // RANKING_PAGE_SIZE))
+
+    async def build_embed(page: int) -> discord.Embed:
+        pages = await page_count()
+        rows = await bank.atop_balances((page - 1) * RANKING_PAGE_SIZE, RANKING_PAGE_SIZE)
+        # Embed 内のメンションは相手のクライアントが知らないメンバーだと ID のまま表示されるので、
+        # 取れた人は表示名にする（取れなければメンションのまま）
+        names = await members.display_names(interaction.guild, [uid for uid, _ in rows])
+        lines = [
+            f"**{(page - 1) * RANKING_PAGE_SIZE + n}.** "
+            f"{discord.utils.escape_markdown(names[uid]) if uid in names else f'<@{uid}>'} — {bal} nuggets"
+            for n, (uid, bal) in enumerate(rows, 1)
+        ]
+        embed = discord.Embed(title="🏆 nuggets ランキング", description="\n".join(lines) or "(まだ誰もいません)", color=0xf1c40f)
+        mine = await bank.arank_of(interaction.user.id)
+        me = f"あなた: {mine[0]} 位（{mine[1]} nuggets）" if mine else "あなた: ランキング外"
+        embed.set_footer(text=f"{page}/{pages} ページ  | {me}")
+        return embed
+
+    class RankingView(discord.ui.View):
+        def __init__(self, author_id: int, page: int):
+            super().__init__(timeout=120)
+            self.author_id = author_id
+            self.page = page
+
+        async def _turn(self, i: discord.Interaction, step: int):
+            if i.user.id != self.author_id:
+                await i.response.send_message("❌ この操作はコマンド実行者しか行えません。", ephemeral=True)
+                return
+            self.page = min(max(1, self.page + step), await page_count())
+            await i.response.edit_message(embed=await build_embed(self.page), view=self)
+
+        @discord.ui.button(label="◀", style=discord.ButtonStyle.secondary)
+        async def prev(self, i: discord.Interaction, button: discord.ui.Button):
+            await self._turn(i, -1)
+
+        @discord.ui.button(label="▶", style=discord.ButtonStyle.secondary)
+        async def next(self, i: discord.Interaction, button: discord.ui.Button):
+            await self._turn(i, 1)
+
+    page = min(max(1, page), await page_count())
+    await interaction.response.send_message(
+        embed=await build_embed(page),
+        view=RankingView(interaction.user.id, page),
+        allowed_mentions=discord.AllowedMentions.none(),
+    )
+
+HISTORY_PAGE_SIZE = 10
+HISTORY_KINDS = {"grant": "付与", "set": "残高設定", "transfer": "送金", "debit": "引き落とし", "bet": "賭け", "payout": "配当"}
+HISTORY_GAMES = {"chinchiro": "チンチロ", "slots": "スロット", "blackjack": "ブラックジャック"}
+
+@bot.tree.command(name="履歴", description="nuggets の増減履歴を表示します")
+@app_commands.describe(page="表示するページ（1 ページ 10 件、1 が最新）")
+async def 履歴(interaction: discord.Interaction, page: int = 1):
+    """履歴スラッシュコマンド（自分の履歴のみ、前後ページボタン付き）"""
+    uid = interaction.user.id
+
+    async def page_count() -> int:
+        return max(1, -(-(await bank.ahistory_count(uid)) // HISTORY_PAGE_SIZE))
+
+    async def build_embed(page: int) -> discord.Embed:
+        pages = await page_count()
+        rows = await bank.ahistory(uid, (page - 1) * HISTORY_PAGE_SIZE, HISTORY_PAGE_SIZE)
+        lines = []
+        for r in rows:
+            what = HISTORY_KINDS.get(r["k"], r["k"])
+            if "g" in r:
+                what += f"（{HISTORY_GAMES.get(r['g'], r['g'])}）"
+            if "c" in r:
+                what += f" <@{r['c']}>"
+            lines.append(f"<t:{r['t']}:f> **{r['d']:+}** {what} → {r['b']} nuggets")
+        embed = discord.Embed(title="📜 nuggets 履歴", description="\n".join(lines) or "(まだ履歴がありません)", color=0x3498db)
+        embed.set_footer(text=f"{page}/{pages} ページ")
+        return embed
+
+    class HistoryView(discord.ui.View):
+        def __init__(self, page: int):
+            super().__init__(timeout=120)
+            self.page = page
+
+        async def _turn(self, i: discord.Interaction, step: int):
+            self.page = min(max(1, self.page + step), await page_count())
+            await i.response.edit_message(embed=await build_embed(self.page), view=self)
+
+        @discord.ui.button(label="◀", style=discord.ButtonStyle.secondary)
+        async def prev(self, i: discord.Interaction, button: discord.ui.Button):
+            await self._turn(i, -1)
+
+        @discord.ui.button(label="▶", style=discord.ButtonStyle.secondary)
+        async def next(self, i: discord.Interaction, button: discord.ui.Button):
+            await self._turn(i, 1)
+
+    page = min(max(1, page), await page_count())
+    # 履歴は本人にだけ見せる
+    await interaction.response.send_message(
+        embed=await build_embed(page),
+        view=HistoryView(page),
+        ephemeral=True,
+        allowed_mentions=discord.AllowedMentions.none(),
+    )
+
+@bot.tree.command(name="経済統計", description="nuggets の流通量とゲームごとの収支を表示します")
+async def 経済統計(interaction: discord.Interaction):
+    """経済統計スラッシュコマンド（bank が書き込みごとに更新している集計を表示するだけ）"""
+    stats = await bank.aeconomy_stats()
+    embed = discord.Embed(title="📊 nuggets 経済統計", color=0x3498db)
+    embed.add_field(name="流通量", value=f"{stats['circulation']:,} nuggets")
+    embed.add_field(name="残高のある口座", value=f"{stats['funded']:,}")
+    embed.add_field(name="胴元の収支", value=f"{stats['house']:+,} nuggets")
+    for game, g in stats["games"].items():
+        embed.add_field(
+            name=HISTORY_GAMES.get(game, game),
+            value=f"{g['rounds']:,} 回\n賭け {g['wagered']:,} / 配当 {g['paid']:,}\n胴元 {g['house']:+,}",
+            inline=True,
+        )
+    await interaction.response.send_message(embed=embed)
+
 @bot.tree.command(name="送金", description="他のユーザーにnuggetsを送金します")
 @app_commands.describe(member="送金先のユーザー", amount="送金額")
 async def 送金(interaction: discord.Interaction, member: discord.Member, amount: int):
@@ -71,7 +268,7 @@ async def 送金(interaction: discord.Interaction, member: discord.Member, amoun
         await interaction.response.send_message("❌ 自分自身には送金できません。", ephemeral=True)
         return
 
-    ok = bank.transfer(interaction.user.id, member.id, amount)
+    ok = await bank.atransfer(interaction.user.id, member.id, amount)
     if not ok:
         await interaction.response.send_message("❌ 残高が不足しています。", ephemeral=True)
         return
@@ -91,387 +288,380 @@ async def 付与(interaction: discord.Interaction, member: discord.Member, amoun
     if amount == 0:
         await interaction.response.send_message("❌ 0 以外の金額を指定してください。", ephemeral=True)
         return
-    new_bal = bank.add_balance(member.id, amount)
+    new_bal = await bank.aadd_balance(member.id, amount)
     await interaction.response.send_message(
         f"✅ {member.mention} に **{amount} nuggets** を付与しました！\n現在の残高: **{new_bal} nuggets**"
     )
 
-# --- チンチロ（チンチロリン）コマンド ---
-def _score_roll(roll):
-    """ロール(3個のダイス)から順位を返す。
-    返り値: (rank:int, label:str)
-    rank の大きい方が勝ち。特別値:
-      -1: 1-2-3(自動負け)
-       0: メンツ無し（ペアもトリプルもなし）→負け扱い
-      >=1 and <=6: ペアありでシングルの目が点数（1-6）
-      >=100: ゾロ目（トリプル） -> 100 + face
-    """
-    s = sorted(roll)
-    # 1-2-3 自動負け
-    if s == [1, 2, 3]:
-        return -1, "1-2-3（自動負け）"
-    # トリプル
-    if s[0] == s[1] == s[2]:
-        return 100 + s[0], f"ゾロ目 {s[0]}-{s[1]}-{s[2]}"
-    # ペア判定
-    if s[0] == s[1] or s[1] == s[2]:
-        # シングルの目を返す
-        if s[0] == s[1]:
-            single = s[2]
-        else:
-            single = s[0]
-        return single, f"ペア {roll[0]}-{roll[1]}-{roll[2]}（点：{single}）"
-    # メンツ無し
-    return 0, f"メンツ無し {roll[0]}-{roll[1]}-{roll[2]}"
+@bot.tree.command(name="ロール付与", description="ロールのメンバー全員にnuggetsを付与します（管理者専用）")
+@app_commands.describe(amount="1人あたりの付与金額", role="付与先のロール（未指定時はサーバー全員）")
+async def ロール付与(interaction: discord.Interaction, amount: int, role: discord.Role = None):
+    """ロール単位の一括付与（1 回の書き込みでまとめて反映）"""
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message("❌ このコマンドを実行する権限がありません。", ephemeral=True)
+        return
 
+    if amount == 0:
+        await interaction.response.send_message("❌ 0 以外の金額を指定してください。", ephemeral=True)
+        return
+    await interaction.response.defer()
 
-import asyncio
+    # メンバーは API から 1000 人ずつ流し読みし、対象ユーザーの増減だけを溜める
+    deltas = {}
+    async for uid in members.stream(bot, interaction.guild_id, role.id if role is not None else None):
+        deltas[uid] = amount
 
-@bot.tree.command(name="チンチロ", description="チンチロリンをプレイします（掛け金）")
-@app_commands.describe(amount="掛け金（nuggets）")
-async def チンチロ(interaction: discord.Interaction, amount: int):
-    """インタラクティブなチンチロコマンド（確認ボタン・埋め込み表示・再戦ボタン付き）"""
-    if amount <= 0:
-        await interaction.response.send_message("❌ 0 より大きい金額を指定してください。", ephemeral=True)
-        return
-    uid = interaction.user.id
-    bal = bank.get_balance(uid)
-    if bal < amount:
-        await interaction.response.send_message("❌ 残高が不足しています。", ephemeral=True)
+    if not deltas:
+        await interaction.followup.send("❌ 対象のメンバーがいません。", ephemeral=True)
         return
+    # 管理者の付与は /付与 と同じくマイナス残高も許可する
+    await bank.aapply_batch(deltas, allow_negative=True)
+    target = role.mention if role is not None else "サーバー全員"
+    await interaction.followup.send(
+        f"✅ {target}（{len(deltas)} 人）に **{amount} nuggets** ずつ付与しました！",
+        allowed_mentions=discord.AllowedMentions.none(),
+    )
 
-    # 確認ビュー
-    class ConfirmView(discord.ui.View):
-        def __init__(self, author_id: int, amount: int):
-            super().__init__(timeout=60)
-            self.author_id = author_id
-            self.amount = amount
-            self._timed_out = False
+# --- チンチロ（チンチロリン）コマンド ---
+
+
+def _disable_all(view: discord.ui.View) -> None:
+    """Safely disable all components in this view."""
+    for item in list(view.children):
+        try:
+            item.disabled = True
+        except Exception:
+            pass
+
+
+class ChinchiroConfirmView(discord.ui.View):
+    """確認ビュー（1 回分の状態は session に持つ）"""
+
+    def __init__(self, session: sessions.Session):
+        super().__init__(timeout=60)
+        self.session = session
+        self.message = None
+
+    async def on_timeout(self):
+        """ビューがタイムアウトしたときの処理: ボタン無効化とメッセージ更新"""
+        sessions.registry.close(self.session)
+        _disable_all(self)
+        try:
+            if self.message:
+                await self.message.edit(content="⏳ 時間切れです。確認の期限が切れました。/チンチロ で再度実行してください。", view=self)
+        except Exception:
+            pass
 
-        async def on_timeout(self):
-            """ビューがタイムアウトしたときの処理: ボタン無効化とメッセージ更新"""
-            self._timed_out = True
-            self.disable_all_items()
+    @discord.ui.button(label="実行する", style=discord.ButtonStyle.success)
+    async def confirm(self, interaction: discord.Interaction, button: discord.ui.Button):
+        s = self.session
+        # すぐに ACK（defer）してからフォローアップで即時メッセージを送る（Interaction timeout を回避）
+        try:
+            await interaction.response.defer(ephemeral=True)
+            try:
+                await interaction.followup.send("処理を開始しました。しばらくお待ちください...", ephemeral=True)
+            except Exception as e:
+                import traceback
+                traceback.print_exc()
+                print(f"[chinchiro] followup send failed (start): {e}")
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            print(f"[chinchiro] initial defer failed: {e}")
+
+        # 有効期限切れチェック
+        if s.closed:
             try:
-                if hasattr(self, "message") and self.message:
-                    await self.message.edit(content="⏳ 時間切れです。確認の期限が切れました。/チンチロ で再度実行してください。", view=self)
+                await interaction.followup.send("⏳ この確認は期限切れです。/チンチロ を再実行してください。", ephemeral=True)
             except Exception:
                 pass
+            return
 
-        def disable_all_items(self):
-            """Safely disable all components in this view."""
-            for item in list(self.children):
-                try:
-                    item.disabled = True
-                except Exception:
-                    pass
+        # 実行者チェック
+        print(f"[chinchiro] confirm pressed by {interaction.user.id} for amount={s.amount} (acked)")
+        if interaction.user.id != s.user_id:
+            try:
+                await interaction.followup.send("❌ この操作はコマンド実行者しか行えません。", ephemeral=True)
+            except Exception:
+                pass
+            return
+        if s.started:
+            try:
+                await interaction.followup.send("⏳ すでに実行中です。", ephemeral=True)
+            except Exception:
+                pass
+            return
+        # 連打の 2 回目がここまで来ないよう、最初の await の前に実行中にしてボタンを止める
+        s.started = True
+        _disable_all(self)
+        self.stop()
+        sessions.registry.touch(s)
+
+        # 掛け金を予約（精算時に 1 回だけ書き込む）
+        ticket = await bank.areserve(s.user_id, s.amount, "chinchiro")
+        if ticket is None:
+            sessions.registry.close(s)  # ビューは止めたので on_timeout では閉じられない
+            try:
+                await interaction.followup.send("❌ 実行時に残高不足でした。", ephemeral=True)
+            except Exception:
+                pass
+            _disable_all(self)
+            try:
+                await interaction.message.edit(view=self)
+            except Exception:
+                pass
+            return
+        s.ticket = ticket
 
-        @discord.ui.button(label="実行する", style=discord.ButtonStyle.success)
-        async def confirm(self, interaction: discord.Interaction, button: discord.ui.Button):
-            # すぐに ACK（defer）してからフォローアップで即時メッセージを送る（Interaction timeout を回避）
+        # 本処理を try/except で囲む
+        try:
+            # シミュレーション（ロールアニメーション）
+            name = s.name = interaction.user.display_name
+            rolling_embed = embeds.rolling("チンチロ", name, s.amount)
             try:
-                await interaction.response.defer(ephemeral=True)
-                try:
-                    await interaction.followup.send("処理を開始しました。しばらくお待ちください...", ephemeral=True)
-                except Exception as e:
-                    import traceback
-                    traceback.print_exc()
-                    print(f"[chinchiro] followup send failed (start): {e}")
+                rolling_msg = await interaction.followup.send(embed=rolling_embed)
             except Exception as e:
                 import traceback
                 traceback.print_exc()
-                print(f"[chinchiro] initial defer failed: {e}")
-
-            # 有効期限切れチェック
-            if getattr(self, "_timed_out", False):
+                print(f"[chinchiro] followup send failed (rolling): {e}")
+                # フォールバック：可能なら元メッセージを編集
                 try:
-                    await interaction.response.send_message("⏳ この確認は期限切れです。/チンチロ を再実行してください。", ephemeral=True)
+                    await interaction.message.edit(content="振っています…", view=None)
+                    rolling_msg = interaction.message
                 except Exception:
-                    try:
-                        await interaction.followup.send("⏳ この確認は期限切れです。/チンチロ を再実行してください。", ephemeral=True)
-                    except Exception:
-                        pass
-                return
-
-            # 実行者チェック
-            print(f"[chinchiro] confirm pressed by {interaction.user.id} for amount={self.amount} (acked)")
-            if interaction.user.id != self.author_id:
+                    rolling_msg = None
+
+            # 最終ロール
+            round_rng = rng.stream()
+            player_roll, dealer_roll = rules.roll_chinchiro(round_rng)
+
+            def roll_frame(p, d, footer):
+                return {"embed": embeds.chinchiro_frame(name, s.amount, p, d, footer)}
+
+            # 3回短いアニメーション（混雑時は途中のフレームを省略し、最後の出目は必ず表示）
+            frames = [
+                roll_frame(*rules.roll_chinchiro(rng.cosmetic), "振っています…")
+                for _ in range(3)
+            ]
+            await animator.scheduler.animate(rolling_msg, frames, 0.6, final=roll_frame(player_roll, dealer_roll, "結果は下に表示します"))
+
+            # 判定
+            outcome, payout = rules.chinchiro_payout(s.amount, rules.score_roll(player_roll)[0], rules.score_roll(dealer_roll)[0])
+
+            # 精算（掛け金と配当の差額を 1 回で書き込む）
+            balance = await bank.asettle(ticket, payout)
+            sessions.registry.close(s)
+            if balance is None:
+                # 期限切れで掛け金が返却済み: 結果は見せず、ログにも残さない（経済の集計と揃える）
                 try:
-                    await interaction.followup.send("❌ この操作はコマンド実行者しか行えません。", ephemeral=True)
+                    await interaction.followup.send(sessions.EXPIRED_NOTICE, ephemeral=True)
                 except Exception:
                     pass
                 return
+            rid = rng.record(round_rng, "chinchiro", s.user_id, s.amount, payout)
 
-            # 最終残高チェック
-            cur = bank.get_balance(self.author_id)
-            if cur < self.amount:
-                try:
-                    await interaction.followup.send("❌ 実行時に残高不足でした。", ephemeral=True)
-                except Exception:
-                    pass
-                self.disable_all_items()
-                try:
-                    await interaction.message.edit(view=self)
-                except Exception:
-                    pass
-                return
+            # 結果埋め込み
+            embed = embeds.chinchiro_result(name, player_roll, dealer_roll, outcome, payout, balance, rid)
 
-            # 本処理を try/except で囲む
+            # メッセージ編集（結果表示）。この確認ビューはここで役目を終える
+            _disable_all(self)
+            self.stop()
             try:
-                    # 払い込み
-                    bank.add_balance(self.author_id, -self.amount)
-
-                    # シミュレーション（ロールアニメーション）
-                    die_faces = ["⚀","⚁","⚂","⚃","⚄","⚅"]
-                    rolling_embed = discord.Embed(title=f"チンチロ: {interaction.user.display_name}", description=f"掛け金: {self.amount} nuggets\n振っています…", color=0x3498db)
-                    try:
-                        rolling_msg = await interaction.followup.send(embed=rolling_embed)
-                    except Exception as e:
-                        import traceback
-                        traceback.print_exc()
-                        print(f"[chinchiro] followup send failed (rolling): {e}")
-                        # フォールバック：可能なら元メッセージを編集
-                        try:
-                            await interaction.message.edit(content="振っています…", view=None)
-                            rolling_msg = interaction.message
-                        except Exception:
-                            rolling_msg = None
-
-                    # 3回短いアニメーション
-                    for _ in range(3):
-                        tmp_p = [random.randint(1, 6) for _ in range(3)]
-                        tmp_d = [random.randint(1, 6) for _ in range(3)]
-                        try:
-                            if rolling_msg is not None:
-                                await rolling_msg.edit(embed=discord.Embed(
-                                    title=rolling_embed.title,
-                                    description=(f"掛け金: {self.amount} nuggets\n\n"
-                                                 f"🎲 あなた: {die_faces[tmp_p[0]-1]} {die_faces[tmp_p[1]-1]} {die_faces[tmp_p[2]-1]}\n"
-                                                 f"🤖 ディーラー: {die_faces[tmp_d[0]-1]} {die_faces[tmp_d[1]-1]} {die_faces[tmp_d[2]-1]}\n\n"
-                                                 f"振っています…"),
-                                    color=0x3498db
-                                ))
-                            else:
-                                # フォールバック: 元の確認メッセージを編集
-                                try:
-                                    parent = getattr(interaction, "message", None) or await interaction.original_response()
-                                    if parent:
-                                        await parent.edit(content="振っています…", view=None)
-                                except Exception:
-                                    pass
-                        except Exception:
-                            pass
-                        await asyncio.sleep(0.6)
-
-                    # 最終ロール
-                    player_roll = [random.randint(1, 6) for _ in range(3)]
-                    dealer_roll = [random.randint(1, 6) for _ in range(3)]
-                    p_rank, p_label = _score_roll(player_roll)
-                    d_rank, d_label = _score_roll(dealer_roll)
-
-                    # 判定
-                    result_text = ""
-                    payout = 0
-                    outcome = "lose"
-                    if p_rank == d_rank:
-                        result_text = "引き分け：掛け金を返却しました。"
-                        bank.add_balance(self.author_id, self.amount)
-                        outcome = "draw"
-                    else:
-                        if p_rank == -1:
-                            result_text = "あなたは 1-2-3 を出し自動負けです（掛け金没収）。"
-                            outcome = "lose"
-                        elif d_rank == -1:
-                            mult = 3 if p_rank >= 100 else 1
-                            payout = self.amount * (1 + mult)
-                            bank.add_balance(self.author_id, payout)
-                            result_text = f"おめでとう！ディーラーが1-2-3で自動負け。あなたの勝ち（+{payout}）"
-                            outcome = "win"
-                        else:
-                            if p_rank > d_rank:
-                                mult = 3 if p_rank >= 100 else 1
-                                payout = self.amount * (1 + mult)
-                                bank.add_balance(self.author_id, payout)
-                                result_text = f"勝ち！ +{payout} を獲得しました。"
-                                outcome = "win"
-                            else:
-                                result_text = "残念、あなたの負けです（掛け金没収）。"
-                                outcome = "lose"
-
-                    # 結果埋め込み
-                    color = 0x95a5a6
-                    if outcome == "win":
-                        color = 0x2ecc71
-                    elif outcome == "lose":
-                        color = 0xe74c3c
-
-                    embed = discord.Embed(title=f"チンチロ - 結果: {interaction.user.display_name}", color=color)
-                    embed.add_field(name="あなた", value=(f"{die_faces[player_roll[0]-1]} {die_faces[player_roll[1]-1]} {die_faces[player_roll[2]-1]}\n{p_label}"), inline=True)
-                    embed.add_field(name="ディーラー", value=(f"{die_faces[dealer_roll[0]-1]} {die_faces[dealer_roll[1]-1]} {die_faces[dealer_roll[2]-1]}\n{d_label}"), inline=True)
-                    embed.add_field(name="結果", value=result_text, inline=False)
-                    embed.set_footer(text=f"現在の残高: {bank.get_balance(self.author_id)} nuggets")
-
-                    # 結果ビュー
-                    class ResultView(discord.ui.View):
-                        def __init__(self, author_id: int, amount: int):
-                            super().__init__(timeout=120)
-                            self.author_id = author_id
-                            self.amount = amount
-                            self._timed_out = False
-
-                        async def on_timeout(self):
-                            self._timed_out = True
-                            for item in list(self.children):
-                                try:
-                                    item.disabled = True
-                                except Exception:
-                                    pass
-                            try:
-                                if hasattr(self, "message") and self.message:
-                                    await self.message.edit(content="⏳ 表示の有効期限が切れました。もう一度 /チンチロ を実行してください。", view=self)
-                            except Exception:
-                                pass
-
-                        @discord.ui.button(label="もう一度", style=discord.ButtonStyle.primary)
-                        async def again(self, interaction: discord.Interaction, button: discord.ui.Button):
-                            if getattr(self, "_timed_out", False):
-                                try:
-                                    await interaction.response.send_message("⏳ この結果の有効期限は切れています。/チンチロ を再実行してください。", ephemeral=True)
-                                except Exception:
-                                    pass
-                                return
-
-                            if interaction.user.id != self.author_id:
-                                try:
-                                    await interaction.response.send_message("❌ この操作はコマンド実行者しか行えません。", ephemeral=True)
-                                except Exception:
-                                    pass
-                                return
-                            # 同額で再戦するため、確認ビューを再表示する
-                            try:
-                                await interaction.response.defer(ephemeral=True)
-                                try:
-                                    await interaction.followup.send("同額で再戦します。確認してください。", ephemeral=True, view=ConfirmView(self.author_id, self.amount))
-                                except Exception as e:
-                                    print(f"[chinchiro] again followup failed: {e}")
-                            except Exception as e:
-                                print(f"[chinchiro] again defer failed: {e}")
-
-                        @discord.ui.button(label="閉じる", style=discord.ButtonStyle.secondary)
-                        async def close(self, interaction: discord.Interaction, button: discord.ui.Button):
-                            if getattr(self, "_timed_out", False):
-                                try:
-                                    await interaction.response.send_message("⏳ この結果の有効期限は切れています。メッセージは自動で消えるかもしれません。", ephemeral=True)
-                                except Exception:
-                                    pass
-                                return
-
-                            if interaction.user.id != self.author_id:
-                                try:
-                                    await interaction.response.send_message("❌ この操作はコマンド実行者しか行えません。", ephemeral=True)
-                                except Exception:
-                                    pass
-                                return
-                            try:
-                                await interaction.response.defer(ephemeral=True)
-                            except Exception:
-                                pass
-                            try:
-                                await interaction.message.delete()
-                            except Exception:
-                                pass
-
-                    # メッセージ編集（結果表示）
-                    self.disable_all_items()
+                # interaction.message が None の場合は original_response を取得して編集する
+                msg = getattr(interaction, "message", None)
+                if msg is None:
                     try:
-                        # interaction.message が None の場合は original_response を取得して編集する
-                        msg = getattr(interaction, "message", None)
-                        if msg is None:
-                            try:
-                                msg = await interaction.original_response()
-                            except Exception:
-                                try:
-                                    msg = await interaction.fetch_original_response()
-                                except Exception:
-                                    msg = None
-                        if msg is not None:
-                            await msg.edit(view=self)
+                        msg = await interaction.original_response()
                     except Exception:
-                        pass
-
-                    # 結果用 View を作成してメッセージを送信し、送信メッセージを view.message に保存
-                    rv = ResultView(self.author_id, self.amount)
-                    try:
-                        result_msg = await interaction.followup.send(embed=embed, view=rv, ephemeral=False, wait=True)
                         try:
-                            rv.message = result_msg
+                            msg = await interaction.fetch_original_response()
                         except Exception:
-                            pass
-                    except Exception as e:
-                        import traceback
-                        traceback.print_exc()
-                        print(f"[chinchiro] followup send failed (result): {e}")
-                        try:
-                            await interaction.followup.send(embed=embed, ephemeral=False)
-                        except Exception:
-                            pass
+                            msg = None
+                if msg is not None:
+                    await msg.edit(view=self)
+            except Exception:
+                pass
 
+            # 結果用 View を作成してメッセージを送信し、送信メッセージを view.message に保存
+            rv = ChinchiroResultView(s)
+            try:
+                rv.message = await interaction.followup.send(embed=embed, view=rv, ephemeral=False, wait=True)
             except Exception as e:
                 import traceback
                 traceback.print_exc()
+                print(f"[chinchiro] followup send failed (result): {e}")
                 try:
-                    await interaction.followup.send(f"エラーが発生しました: {e}", ephemeral=True)
+                    await interaction.followup.send(embed=embed, ephemeral=False)
                 except Exception:
                     pass
+            metrics.result("チンチロ/実行する", interaction)
 
-        @discord.ui.button(label="キャンセル", style=discord.ButtonStyle.secondary)
-        async def cancel(self, interaction: discord.Interaction, button: discord.ui.Button):
-            # defer first to ACK
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            # 精算前に失敗した場合は掛け金を戻す（精算済みなら何もしない）
+            sessions.registry.close(s)
+            await bank.arefund(ticket)
             try:
-                await interaction.response.defer(ephemeral=True)
-                try:
-                    await interaction.followup.send("キャンセル処理を開始しました。", ephemeral=True)
-                except Exception as e:
-                    print(f"[chinchiro] cancel followup failed: {e}")
+                await interaction.followup.send(f"エラーが発生しました: {e}", ephemeral=True)
+            except Exception:
+                pass
+
+    @discord.ui.button(label="キャンセル", style=discord.ButtonStyle.secondary)
+    async def cancel(self, interaction: discord.Interaction, button: discord.ui.Button):
+        # defer first to ACK
+        try:
+            await interaction.response.defer(ephemeral=True)
+            try:
+                await interaction.followup.send("キャンセル処理を開始しました。", ephemeral=True)
             except Exception as e:
-                import traceback
-                traceback.print_exc()
-                print(f"[chinchiro] cancel initial defer failed: {e}")
+                print(f"[chinchiro] cancel followup failed: {e}")
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            print(f"[chinchiro] cancel initial defer failed: {e}")
 
-            print(f"[chinchiro] cancel pressed by {interaction.user.id} (acked)")
-            if interaction.user.id != self.author_id:
-                try:
-                    await interaction.followup.send("❌ この操作はコマンド実行者しか行えません。", ephemeral=True)
-                except Exception:
-                    pass
-                return
-            self.disable_all_items()
+        print(f"[chinchiro] cancel pressed by {interaction.user.id} (acked)")
+        if interaction.user.id != self.session.user_id:
+            try:
+                await interaction.followup.send("❌ この操作はコマンド実行者しか行えません。", ephemeral=True)
+            except Exception:
+                pass
+            return
+        if self.session.started:
+            try:
+                await interaction.followup.send("❌ すでに実行中のためキャンセルできません。", ephemeral=True)
+            except Exception:
+                pass
+            return
+        sessions.registry.close(self.session)
+        _disable_all(self)
+        self.stop()
+        try:
+            await interaction.message.edit(content="キャンセルされました。", view=self)
+        except Exception:
+            pass
+        try:
+            await interaction.followup.send("キャンセルしました。", ephemeral=True)
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            print(f"[chinchiro] cancel followup failed: {e}")
+
+
+class ChinchiroResultView(discord.ui.View):
+    """結果ビュー（もう一度 / 閉じる）。session は精算済み（登録簿からは外れている）"""
+
+    def __init__(self, session: sessions.Session):
+        super().__init__(timeout=120)
+        self.session = session
+        self.message = None
+
+    async def on_timeout(self):
+        _disable_all(self)
+        try:
+            if self.message:
+                await self.message.edit(content="⏳ 表示の有効期限が切れました。もう一度 /チンチロ を実行してください。", view=self)
+        except Exception:
+            pass
+
+    @discord.ui.button(label="もう一度", style=discord.ButtonStyle.primary)
+    async def again(self, interaction: discord.Interaction, button: discord.ui.Button):
+        s = self.session
+        if interaction.user.id != s.user_id:
+            try:
+                await interaction.response.send_message("❌ この操作はコマンド実行者しか行えません。", ephemeral=True)
+            except Exception:
+                pass
+            return
+        # 同額で再戦するため、新しいセッションで確認ビューを再表示する
+        session = sessions.registry.open(sessions.Session("chinchiro", s.user_id, s.amount))
+        if session is None:
             try:
-                await interaction.message.edit(content="キャンセルされました。", view=self)
+                await interaction.response.send_message(sessions.registry.refusal(s.user_id), ephemeral=True)
             except Exception:
                 pass
+            return
+        try:
+            await interaction.response.defer(ephemeral=True)
             try:
-                await interaction.followup.send("キャンセルしました。", ephemeral=True)
+                view = ChinchiroConfirmView(session)
+                view.message = await interaction.followup.send("同額で再戦します。確認してください。", ephemeral=True, view=view, wait=True)
             except Exception as e:
-                import traceback
-                traceback.print_exc()
-                print(f"[chinchiro] cancel followup failed: {e}")
+                print(f"[chinchiro] again followup failed: {e}")
+        except Exception as e:
+            print(f"[chinchiro] again defer failed: {e}")
+
+    @discord.ui.button(label="閉じる", style=discord.ButtonStyle.secondary)
+    async def close(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if interaction.user.id != self.session.user_id:
+            try:
+                await interaction.response.send_message("❌ この操作はコマンド実行者しか行えません。", ephemeral=True)
+            except Exception:
+                pass
+            return
+        self.stop()
+        try:
+            await interaction.response.defer(ephemeral=True)
+        except Exception:
+            pass
+        try:
+            await interaction.message.delete()
+        except Exception:
+            pass
+
+
+@bot.tree.command(name="チンチロ", description="チンチロリンをプレイします（掛け金）")
+@app_commands.describe(amount="掛け金（nuggets）")
+async def チンチロ(interaction: discord.Interaction, amount: int):
+    """インタラクティブなチンチロコマンド（確認ボタン・埋め込み表示・再戦ボタン付き）"""
+    if amount <= 0:
+        await interaction.response.send_message("❌ 0 より大きい金額を指定してください。", ephemeral=True)
+        return
+    uid = interaction.user.id
+    bal = await bank.aget_balance(uid)
+    if bal < amount:
+        await interaction.response.send_message("❌ 残高が不足しています。", ephemeral=True)
+        return
+
+    # 同時に開けるゲームの数を超えていれば断る
+    session = sessions.registry.open(sessions.Session("chinchiro", uid, amount))
+    if session is None:
+        await interaction.response.send_message(sessions.registry.refusal(uid), ephemeral=True)
+        return
 
     # 確認メッセージ
-    confirm_view = ConfirmView(author_id=uid, amount=amount)
+    confirm_view = ChinchiroConfirmView(session)
     await interaction.response.send_message(f"掛け金 **{amount} nuggets** でチンチロを実行します。よろしいですか？", ephemeral=True, view=confirm_view)
     # original_response をキャッシュして view.message に保存（編集やタイムアウト時に利用）
     try:
-        orig = await interaction.original_response()
-        confirm_view.message = orig
+        confirm_view.message = await interaction.original_response()
     except Exception:
         try:
             # 代替: fetch original response
-            orig = await interaction.fetch_original_response()
-            confirm_view.message = orig
+            confirm_view.message = await interaction.fetch_original_response()
         except Exception:
             pass
 
+# 管理者向け: 残高ストアのパーティション数を稼働中に変更する（BANK_BACKEND=sharded のとき）
+@bot.tree.command(name="残高再分割", description="(管理者) 残高ストアのパーティション数を変更します")
+@app_commands.describe(partitions="新しいパーティション数")
+async def 残高再分割(interaction: discord.Interaction, partitions: app_commands.Range[int, 1, 4096]):
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message("❌ このコマンドを実行する権限がありません。", ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True)
+    try:
+        old = await bank.areshard(partitions)
+    except Exception as e:
+        await interaction.followup.send(f"再分割エラー: {e}", ephemeral=True)
+        return
+    if old is None:
+        await interaction.followup.send("❌ BANK_BACKEND=sharded のときだけ使えます。", ephemeral=True)
+        return
+    await interaction.followup.send(f"✅ パーティション数を {old} から {partitions} に変更しました。", ephemeral=True)
+
 # 管理者向け: スラッシュコマンドを強制同期して一覧を返す（デバッグ用）
 @bot.tree.command(name="sync", description="(管理者) スラッシュコマンドを同期して登録一覧を表示")
 @app_commands.describe(only_guild="True にすると GUILD_ID または現在のギルドで同期します")
@@ -490,11 +680,14 @@ async def sync(interaction: discord.Interaction, only_guild: bool = False):
             else:
                 guild_obj = interaction.guild
 
-        synced = await bot.tree.sync(guild=guild_obj)
+        result = await sync_commands(force=True, guilds=[guild_obj])
+        synced = next(iter(result.values()), None)
+        if synced is None:
+            raise RuntimeError("同期に失敗しました（ログを確認してください）")
         # 登録済みコマンドを取得して名前を列挙
         fetched = await bot.tree.fetch_commands(guild=guild_obj)
         names = ", ".join([c.name for c in fetched]) if fetched else "(なし)"
-        await interaction.followup.send(f"同期しました: {len(synced)} 個\n登録済みコマンド: {names}", ephemeral=True)
+        await interaction.followup.send(f"同期しました: {synced} 個\n登録済みコマンド: {names}", ephemeral=True)
     except Exception as e:
         await interaction.followup.send(f"同期エラー: {e}", ephemeral=True)
 
@@ -503,4 +696,7 @@ async def sync(interaction: discord.Interaction, only_guild: bool = False):
 async def ping(interaction: discord.Interaction):
     await interaction.response.send_message("🏓 pong!")
 
-bot.run(TOKEN)
\ No newline at end of file
+if __name__ == "__main__":
+    if not TOKEN:
+        raise RuntimeError("環境変数 DISCORD_TOKEN が設定されていません。")
+    bot.run(TOKEN)
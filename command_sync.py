@@ -0,0 +1,89 @@
+"""スラッシュコマンドの同期を、コマンドツリーが変わったときだけ行う。
+
+tree.sync() は Discord 側の登録を丸ごと上書きする REST 呼び出しで、レート制限も厳しい。
+そこで同期先（グローバル / ギルド）ごとに送るはずのペイロードを JSON にしてハッシュを取り、
+前回同期したときのハッシュ（COMMAND_SYNC_STATE のファイル）と同じなら送らない。
+複数のギルドへの同期は並行して行う。
+
+Discord 側で登録を手で消した場合などはハッシュが一致したままになるので、
+/sync コマンド（force=True）で強制的に同期する。
+"""
+import asyncio
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import discord
+from discord import app_commands
+
+# 設定（環境変数で調整可能）
+#   COMMAND_SYNC_STATE: 同期済みのハッシュを保存するファイル
+STATE_FILE = Path(os.getenv("COMMAND_SYNC_STATE", "command_sync.json"))
+
+
+def _scope(app_id: Optional[int], guild: Optional[discord.abc.Snowflake]) -> str:
+    # 保存ファイルのキー（同じファイルを別のアプリと共有しても混ざらないようにアプリ ID を付ける）
+    return f"{app_id}/{guild.id if guild is not None else 'global'}"
+
+
+def payload(tree: app_commands.CommandTree, guild: Optional[discord.abc.Snowflake] = None) -> List[dict]:
+    """tree.sync(guild=guild) が送るのと同じペイロード（翻訳なしの場合）。"""
+    return [c.to_dict() for c in tree.get_commands(guild=guild)]
+
+
+def signature(tree: app_commands.CommandTree, guild: Optional[discord.abc.Snowflake] = None) -> str:
+    """ペイロードのハッシュ。コマンドの並び順には依存しない。"""
+    items = sorted(json.dumps(c, sort_keys=True, ensure_ascii=False) for c in payload(tree, guild))
+    return hashlib.sha256("\n".join(items).encode("utf-8")).hexdigest()
+
+
+def _load() -> Dict[str, str]:
+    try:
+        data = json.loads(STATE_FILE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _save(state: Dict[str, str]) -> None:
+    tmp = STATE_FILE.with_name(STATE_FILE.name + ".tmp")
+    tmp.write_text(json.dumps(state, ensure_ascii=False, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, STATE_FILE)
+
+
+async def sync(tree: app_commands.CommandTree, guilds: List[Optional[discord.abc.Snowflake]],
+               force: bool = False) -> Dict[str, Optional[int]]:
+    """guilds（None はグローバル）を必要なものだけ並行して同期する。
+
+    同期先ごとに、同期したコマンド数 / 変更がなく省略したら None を返す。
+    失敗した同期先は例外を表示して結果から外す（ハッシュも更新しない）。
+    """
+    app_id = tree.client.application_id
+    state = _load()
+    todo = []
+    out: Dict[str, Optional[int]] = {}
+    for guild in guilds:
+        key = _scope(app_id, guild)
+        sig = signature(tree, guild)
+        if not force and state.get(key) == sig:
+            out[key] = None
+        else:
+            todo.append((key, sig, guild))
+
+    results = await asyncio.gather(*(tree.sync(guild=g) for _, _, g in todo), return_exceptions=True)
+    changed = False
+    for (key, sig, guild), r in zip(todo, results):
+        if isinstance(r, BaseException):
+            print(f"スラッシュコマンド同期エラー ({key}): {r}")
+            continue
+        out[key] = len(r)
+        state[key] = sig
+        changed = True
+    if changed:
+        try:
+            _save(state)
+        except OSError as e:
+            print(f"同期済みハッシュの保存に失敗しました: {e}")
+    return out
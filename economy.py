@@ -0,0 +1,196 @@
+"""経済全体の集計（流通量・残高のある口座数・ゲームごとの賭け金 / 配当 / 胴元の収支）。
+
+/経済統計 のたびに balances.json を全件なめなくて済むように、bank.py が書き込みのたびに
+差分で更新する。保存先は残高ストアの横の ECONOMY_FILE で、稼働中は ECONOMY_CHECKPOINT 秒
+ごとに、bank.close() のときは「正常に閉じた」印と一緒に書く。
+
+ゲームの集計はラウンドログ（rng.py）に書き終えた行の分だけを、ログのどこまで数えたか
+（rounds_at、バイト位置）と一緒に保存する。起動時はその位置から後ろの行だけを足すので、
+クラッシュした後もログ全体は読み直さない。残高側（流通量・口座数）は、印がないまま起動した
+（クラッシュした）ときと、ファイルがないとき（初回）だけ残高の全件から数え直す。
+
+    python economy.py check [--fix] [rounds.jsonl]
+
+は、ボットを止めた状態で残高ストアとラウンドログから集計を数え直し、保存されている値と
+比べる（--fix で数え直した値を書き込む）。ゲームの数字はラウンドログの掛け金（ダブルダウン
+込みの stake）と配当を足したもの。
+"""
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# 設定（環境変数で調整可能）
+#   ECONOMY_FILE      : 集計の保存先
+#   ECONOMY_CHECKPOINT: 稼働中に集計を保存する間隔（秒）。クラッシュ後に読み直すラウンドログはこの間の分だけ
+ECONOMY_FILE = Path(os.getenv("ECONOMY_FILE", "economy.json"))
+CHECKPOINT_INTERVAL = float(os.getenv("ECONOMY_CHECKPOINT", "30"))
+
+_ROUNDS, _WAGERED, _PAID = range(3)
+
+
+class Economy:
+    """経済全体の集計。残高の増減と精算のたびに O(1) で更新する。"""
+
+    def __init__(self, circulation: int = 0, funded: int = 0,
+                 games: Optional[Dict[str, List[int]]] = None):
+        self.circulation = circulation  # 全員の確定残高の合計（予約中の掛け金も含む）
+        self.funded = funded            # 確定残高が正の口座数
+        self.games: Dict[str, List[int]] = games or {}  # ゲーム -> [回数, 賭け金, 配当]
+
+    def balance(self, old: int, new: int) -> None:
+        """1 人の確定残高が old から new に変わった。"""
+        self.circulation += new - old
+        self.funded += (new > 0) - (old > 0)
+
+    def settle(self, game: str, wagered: int, paid: int) -> None:
+        """1 人分の賭けが精算された（wagered は掛け金、paid は掛け金の返却分を含む配当）。"""
+        g = self.games.get(game)
+        if g is None:
+            g = self.games[game] = [0, 0, 0]
+        g[_ROUNDS] += 1
+        g[_WAGERED] += wagered
+        g[_PAID] += paid
+
+    def add_games(self, games: Dict[str, List[int]]) -> None:
+        """ゲーム -> [回数, 賭け金, 配当] の集計を足し込む（rng.mark() の戻り値など）。"""
+        for game, (rounds, wagered, paid) in games.items():
+            g = self.games.get(game)
+            if g is None:
+                g = self.games[game] = [0, 0, 0]
+            g[_ROUNDS] += rounds
+            g[_WAGERED] += wagered
+            g[_PAID] += paid
+
+    def summary(self) -> Dict[str, Any]:
+        """表示用。house は胴元（ボット側）の収支 = 賭け金 − 配当。"""
+        games = {name: {"rounds": g[_ROUNDS], "wagered": g[_WAGERED], "paid": g[_PAID],
+                        "house": g[_WAGERED] - g[_PAID]} for name, g in sorted(self.games.items())}
+        return {"circulation": self.circulation, "funded": self.funded, "games": games,
+                "house": sum(g["house"] for g in games.values())}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"circulation": self.circulation, "funded": self.funded,
+                "games": {name: list(g) for name, g in sorted(self.games.items())}}
+
+    @classmethod
+    def from_dict(cls, raw: Dict[str, Any]) -> "Economy":
+        return cls(int(raw["circulation"]), int(raw["funded"]),
+                   {name: [int(x) for x in g] for name, g in raw.get("games", {}).items()})
+
+
+def load(path: Path = ECONOMY_FILE) -> Tuple[Optional[Economy], bool, Optional[int]]:
+    """(保存されている集計, 正常に閉じられたか, ゲームの集計がラウンドログのどこまでを数えたか)。
+
+    ファイルがない・読めないときは (None, False, None)。rounds_at を持たない古いファイルは None。
+    """
+    try:
+        with Path(path).open("r", encoding="utf-8") as f:
+            raw = json.load(f)
+        rounds_at = raw.get("rounds_at")
+        return Economy.from_dict(raw), bool(raw.get("clean")), None if rounds_at is None else int(rounds_at)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        if Path(path).exists():
+            print(f"[economy] {path} を読めませんでした（数え直します）: {e}")
+        return None, False, None
+
+
+def save(econ: Economy, clean: bool, rounds_at: int, path: Path = ECONOMY_FILE) -> None:
+    # 一時ファイルに書いてから置き換える（書きかけのファイルを残さない）
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(dict(econ.to_dict(), clean=clean, rounds_at=rounds_at), f,
+                  ensure_ascii=False, separators=(",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _rounds(path: Path, start: int = 0, end: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    # ラウンドログの start〜end バイトを 1 行ずつ。書きかけの行（クラッシュ時）は読み飛ばす
+    if not Path(path).exists():
+        return
+    with Path(path).open("rb") as f:
+        f.seek(start)
+        pos = start
+        for line in f:
+            pos += len(line)
+            if end is not None and pos > end:
+                break
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def replay(econ: Economy, rounds_path: Path, start: int = 0, end: Optional[int] = None) -> None:
+    """ラウンドログの start〜end バイトにある精算をゲームの集計に足す。"""
+    for entry in _rounds(rounds_path, start, end):
+        econ.settle(entry["game"], int(entry.get("stake", entry["bet"])), int(entry["payout"]))
+
+
+def recompute(balances: Iterable[Tuple[int, int]], rounds_path: Path, base: Optional[Economy] = None,
+              start: int = 0, end: Optional[int] = None) -> Economy:
+    """残高の全件から残高側を、base のゲームの集計 + ラウンドログの start 以降からゲーム側を作り直す。
+
+    base を渡さなければログ全体を読む（初回と check 用、O(ユーザー数 + ラウンド数)）。
+    """
+    econ = Economy(games={name: list(g) for name, g in base.games.items()} if base is not None else None)
+    for _uid, bal in balances:
+        econ.balance(0, bal)
+    replay(econ, rounds_path, start, end)
+    return econ
+
+
+def _diff(saved: Dict[str, Any], actual: Dict[str, Any]) -> List[str]:
+    out = []
+    for key in ("circulation", "funded"):
+        if saved[key] != actual[key]:
+            out.append(f"{key}: 保存 {saved[key]} / 数え直し {actual[key]}")
+    for name in sorted(set(saved["games"]) | set(actual["games"])):
+        a, b = saved["games"].get(name, [0, 0, 0]), actual["games"].get(name, [0, 0, 0])
+        if a != b:
+            out.append(f"{name}: 保存 回数 {a[0]} 賭け {a[1]} 配当 {a[2]} / 数え直し 回数 {b[0]} 賭け {b[1]} 配当 {b[2]}")
+    return out
+
+
+def main(argv) -> int:
+    if len(argv) < 2 or argv[1] != "check":
+        print("使い方: python economy.py check [--fix] [rounds.jsonl]")
+        return 2
+    import bank
+    import rng
+
+    fix = "--fix" in argv[2:]
+    rest = [a for a in argv[2:] if a != "--fix"]
+    rounds_path = Path(rest[0]) if rest else rng.ROUNDS_FILE
+    saved, clean, rounds_at = load()
+    # get_backend() だけでは集計を読み込まない（保存されている値を書き換えない）
+    actual = recompute(bank.get_backend().items(), rounds_path)
+    if saved is not None and rounds_at is not None:
+        # 保存した後に書かれたラウンドは、起動時と同じく保存値に足してから比べる
+        replay(saved, rounds_path, rounds_at)
+    problems = [f"{ECONOMY_FILE} がありません"] if saved is None else _diff(saved.to_dict(), actual.to_dict())
+    if saved is not None and not clean:
+        print("⚠️ 正常に閉じられていません（ボットが動いているか、前回クラッシュしました）。"
+              "次の起動時に残高側を数え直します。")
+
+    s = actual.summary()
+    print(f"流通量 {s['circulation']} / 残高のある口座 {s['funded']} / 胴元の収支 {s['house']:+}")
+    for name, g in s["games"].items():
+        print(f"  {name}: {g['rounds']} 回  賭け {g['wagered']}  配当 {g['paid']}  胴元 {g['house']:+}")
+    for line in problems:
+        print(f"❌ {line}")
+    if fix:
+        save(actual, clean=True, rounds_at=rounds_path.stat().st_size if rounds_path.exists() else 0)
+        print(f"{ECONOMY_FILE} を数え直した値で書き直しました。")
+        return 0
+    if not problems:
+        print("✅ 保存されている集計は数え直した値と一致しています。")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,181 @@
+"""ゲームの表示用 Embed を組み立てる関数。
+
+bot.py / games.py のコマンドと、ベンチマーク（python -m benchmarks）の両方から使う。
+Discord への接続は不要（discord.Embed を作るだけ）。
+"""
+from typing import Sequence, Tuple
+
+import discord
+
+import rules
+
+DIE_FACES = ["⚀", "⚁", "⚂", "⚃", "⚄", "⚅"]
+
+ROLLING_COLOR = 0x3498db
+NEUTRAL_COLOR = 0x95a5a6
+OUTCOME_COLORS = {"win": 0x2ecc71, "lose": 0xe74c3c, "draw": NEUTRAL_COLOR}
+
+
+def _dice(roll: Sequence[int]) -> str:
+    return f"{DIE_FACES[roll[0]-1]} {DIE_FACES[roll[1]-1]} {DIE_FACES[roll[2]-1]}"
+
+
+def rolling(game: str, name: str, amount: int) -> discord.Embed:
+    # アニメーション開始前の「振っています…」
+    return discord.Embed(title=f"{game}: {name}", description=f"掛け金: {amount} nuggets\n振っています…", color=ROLLING_COLOR)
+
+
+# --- チンチロ ---
+
+
+def chinchiro_frame(name: str, amount: int, player: Sequence[int], dealer: Sequence[int], footer: str) -> discord.Embed:
+    return discord.Embed(
+        title=f"チンチロ: {name}",
+        description=(f"掛け金: {amount} nuggets\n\n"
+                     f"🎲 あなた: {_dice(player)}\n"
+                     f"🤖 ディーラー: {_dice(dealer)}\n\n"
+                     f"{footer}"),
+        color=ROLLING_COLOR
+    )
+
+
+def chinchiro_result(name: str, player: Sequence[int], dealer: Sequence[int], outcome: str, payout: int,
+                     balance: int, round_id: str) -> discord.Embed:
+    p_rank, p_label = rules.score_roll(player)
+    d_rank, d_label = rules.score_roll(dealer)
+    if outcome == "draw":
+        result_text = "引き分け：掛け金を返却しました。"
+    elif outcome == "lose" and p_rank == -1:
+        result_text = "あなたは 1-2-3 を出し自動負けです（掛け金没収）。"
+    elif outcome == "lose":
+        result_text = "残念、あなたの負けです（掛け金没収）。"
+    elif d_rank == -1:
+        result_text = f"おめでとう！ディーラーが1-2-3で自動負け。あなたの勝ち（+{payout}）"
+    else:
+        result_text = f"勝ち！ +{payout} を獲得しました。"
+
+    embed = discord.Embed(title=f"チンチロ - 結果: {name}", color=OUTCOME_COLORS[outcome])
+    embed.add_field(name="あなた", value=f"{_dice(player)}\n{p_label}", inline=True)
+    embed.add_field(name="ディーラー", value=f"{_dice(dealer)}\n{d_label}", inline=True)
+    embed.add_field(name="結果", value=result_text, inline=False)
+    embed.set_footer(text=f"現在の残高: {balance} nuggets  | ラウンド: {round_id}")
+    return embed
+
+
+# --- スロット ---
+
+
+def slot_frame(name: str, amount: int, reels: Sequence[str], footer: str) -> discord.Embed:
+    return discord.Embed(
+        title=f"スロット: {name}",
+        description=(f"掛け金: {amount} nuggets\n\n"
+                     f"{reels[0]} {reels[1]} {reels[2]}\n\n"
+                     f"{footer}"),
+        color=ROLLING_COLOR
+    )
+
+
+def slot_result(name: str, reels: Sequence[str], payout: int, balance: int, round_id: str) -> discord.Embed:
+    if payout > 0:
+        color, result_text = OUTCOME_COLORS["win"], f"おめでとう！ +{payout} を獲得しました。"
+    else:
+        color, result_text = NEUTRAL_COLOR, "残念、あなたの負けです（掛け金没収）。"
+    embed = discord.Embed(title=f"スロット - 結果: {name}", color=color)
+    embed.add_field(name="絵柄", value=f"{reels[0]} {reels[1]} {reels[2]}", inline=False)
+    embed.add_field(name="結果", value=result_text, inline=False)
+    embed.set_footer(text=f"現在の残高: {balance} nuggets  | ラウンド: {round_id}")
+    return embed
+
+
+# --- ブラックジャック ---
+
+
+def blackjack_table(name: str, player: rules.Hand, dealer: rules.Hand, bet: int, balance: int,
+                    reveal_dealer: bool = False) -> discord.Embed:
+    # reveal_dealer が False の間はディーラーの 2 枚目を伏せる
+    if reveal_dealer:
+        dealer_text = f"{dealer}\n合計: {dealer.total}"
+    else:
+        dealer_text = rules.CARD_RANKS[dealer.cards[0]] + " ❓"
+    embed = discord.Embed(title=f"ブラックジャック: {name}")
+    embed.add_field(name="あなた", value=f"{player}\n合計: {player.total}", inline=False)
+    embed.add_field(name="ディーラー", value=dealer_text, inline=False)
+    embed.set_footer(text=f"掛け金: {bet} nuggets  | 現在の残高: {balance} nuggets")
+    return embed
+
+
+def blackjack_result(name: str, player: rules.Hand, dealer: rules.Hand, bet: int, balance: int,
+                     outcome: str, payout: int, round_id: str, reveal_dealer: bool = True) -> discord.Embed:
+    embed = blackjack_table(name, player, dealer, bet, balance, reveal_dealer)
+    embed.color = OUTCOME_COLORS[outcome]
+    embed.set_footer(text=f"{embed.footer.text}  | ラウンド: {round_id}")
+    if outcome == "win":
+        embed.add_field(name="結果", value=f"あなたの勝ち！ +{payout} を獲得しました。", inline=False)
+    elif outcome == "lose":
+        embed.add_field(name="結果", value="あなたの負けです（掛け金没収）。", inline=False)
+    else:
+        embed.add_field(name="結果", value="引き分け：掛け金を返却しました。", inline=False)
+    return embed
+
+
+# --- 卓（複数人） ---
+
+OUTCOME_LABELS = {"win": "勝ち", "lose": "負け", "draw": "引き分け"}
+
+
+def table_lobby(game: str, seats: Sequence[Tuple[str, int]], closes_at: int, max_seats: int) -> discord.Embed:
+    # 参加受付中の卓。seats は (表示名, 掛け金)、closes_at は締め切りの UNIX 時刻
+    lines = [f"{n}. {name} — {amount} nuggets" for n, (name, amount) in enumerate(seats, 1)]
+    return discord.Embed(
+        title=f"{game}の卓: 参加受付中（{len(seats)}/{max_seats}）",
+        description="\n".join(lines) + f"\n\n締め切り: <t:{closes_at}:R>（「参加する」か同じコマンドで参加）",
+        color=ROLLING_COLOR,
+    )
+
+
+def chinchiro_table_frame(seats: Sequence[Tuple[str, int]], rolls: Sequence[Sequence[int]], dealer: Sequence[int],
+                          footer: str) -> discord.Embed:
+    lines = [f"🎲 {name}（{amount}）: {_dice(roll)}" for (name, amount), roll in zip(seats, rolls)]
+    return discord.Embed(
+        title="チンチロの卓",
+        description=f"🤖 ディーラー: {_dice(dealer)}\n\n" + "\n".join(lines) + f"\n\n{footer}",
+        color=ROLLING_COLOR,
+    )
+
+
+def chinchiro_table_result(rows: Sequence[Tuple[str, int, Sequence[int], str, int, int]], dealer: Sequence[int],
+                           round_id: str) -> discord.Embed:
+    # rows: (表示名, 掛け金, 出目, outcome, payout, 精算後の残高)
+    d_label = rules.score_roll(dealer)[1]
+    lines = []
+    for name, amount, roll, outcome, payout, balance in rows:
+        lines.append(f"{_dice(roll)} **{name}** {rules.score_roll(roll)[1]} → {OUTCOME_LABELS[outcome]}"
+                     f"（{payout - amount:+} / 残高 {balance}）")
+    embed = discord.Embed(title="チンチロの卓 - 結果", description="\n".join(lines), color=NEUTRAL_COLOR)
+    embed.add_field(name="ディーラー", value=f"{_dice(dealer)}\n{d_label}", inline=False)
+    embed.set_footer(text=f"ラウンド: {round_id}")
+    return embed
+
+
+def blackjack_table_multi(rows: Sequence[Tuple[str, int, rules.Hand, str]], dealer: rules.Hand,
+                          reveal_dealer: bool, footer: str) -> discord.Embed:
+    # rows: (表示名, 掛け金, 手札, 状態の表示)
+    if reveal_dealer:
+        dealer_text = f"{dealer}（{dealer.total}）"
+    else:
+        dealer_text = rules.CARD_RANKS[dealer.cards[0]] + " ❓"
+    lines = [f"**{name}**（{bet}）: {hand}（{hand.total}）{status}" for name, bet, hand, status in rows]
+    embed = discord.Embed(title="ブラックジャックの卓", description="\n".join(lines), color=ROLLING_COLOR)
+    embed.add_field(name="ディーラー", value=dealer_text, inline=False)
+    embed.set_footer(text=footer)
+    return embed
+
+
+def blackjack_table_result(rows: Sequence[Tuple[str, int, rules.Hand, str, int, int]],
+                           dealer: rules.Hand) -> discord.Embed:
+    # rows: (表示名, 掛け金（ダブル込み）, 手札, outcome, payout, 精算後の残高)
+    lines = [f"**{name}**（{stake}）: {hand}（{hand.total}） → {OUTCOME_LABELS[outcome]}"
+             f"（{payout - stake:+} / 残高 {balance}）" for name, stake, hand, outcome, payout, balance in rows]
+    embed = discord.Embed(title="ブラックジャックの卓 - 結果", description="\n".join(lines), color=NEUTRAL_COLOR)
+    embed.add_field(name="ディーラー", value=f"{dealer}\n合計: {dealer.total}", inline=False)
+    return embed
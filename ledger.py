@@ -0,0 +1,372 @@
+"""残高の増減履歴（台帳）。
+
+bank.py の書き込み（付与・送金・賭け・配当など）ごとに 1 行ずつ追記し、ユーザーごとの
+オフセット索引を持つので、/履歴 は全体を走査せずに最新の N 件を引ける。
+
+    ledger.d/seg-000001.jsonl  書き込み中のセグメント（索引はメモリ上）
+    ledger.d/seg-000000.jz     封じたセグメント（user_id 順に並べ替え、LEDGER_BLOCK ごとに zlib 圧縮）
+    ledger.d/seg-000000.idx    その索引（ブロック表 + (user_id, オフセット) の列）
+
+セグメントが LEDGER_SEGMENT_BYTES を超えたら新しいセグメントに切り替え、古い方は
+バックグラウンドで圧縮して封じる。封じたセグメントの索引は mmap して二分探索する。
+
+1 行の形式: {"t": UNIX 時刻, "u": user_id, "k": 種別, "d": 増減, "b": 増減後の残高,
+            "c": 相手の user_id（あれば）, "g": ゲーム名（あれば）}
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# 設定（環境変数で調整可能）
+#   LEDGER_DIR          : 保存先（空にすると台帳を使わない）
+#   LEDGER_SEGMENT_BYTES: 1 セグメントの大きさの目安
+#   LEDGER_BLOCK        : 圧縮ブロックの大きさ（1 件読むのにこの大きさを展開する）
+LEDGER_DIR = os.getenv("LEDGER_DIR", "ledger.d")
+SEGMENT_BYTES = int(os.getenv("LEDGER_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+BLOCK_BYTES = int(os.getenv("LEDGER_BLOCK", str(16 * 1024)))
+
+MAGIC = b"NUGL"
+VERSION = 1
+_HEADER = struct.Struct("<4sIQQ")  # magic, version, ブロック数, 件数
+_BLOCK_CACHE = 32  # 展開済みブロックを何個まで覚えておくか
+
+
+class _Active:
+    """書き込み中（または封じる途中）のセグメント。索引はメモリ上の dict。"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.offsets: Dict[int, array] = {}
+        self.size = 0
+        if path.exists():
+            self._load()
+        self.file = path.open("ab")
+        self.reader = path.open("rb")
+
+    def _load(self) -> None:
+        with self.path.open("rb") as f:
+            data = f.read()
+        # 途中で落ちて最後の行が欠けていれば切り捨てる
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            with self.path.open("r+b") as f:
+                f.truncate(end)
+        pos = 0
+        for line in data[:end].splitlines(keepends=True):
+            uid = json.loads(line)["u"]
+            self.offsets.setdefault(uid, array("Q")).append(pos)
+            pos += len(line)
+        self.size = end
+
+    def append(self, uid: int, line: bytes) -> None:
+        self.offsets.setdefault(uid, array("Q")).append(self.size)
+        self.file.write(line)
+        self.size += len(line)
+
+    def count(self, uid: int) -> int:
+        return len(self.offsets.get(uid, ()))
+
+    def read(self, uid: int, newest: int, limit: int) -> List[bytes]:
+        # newest 件目（0 が最新）から古い方へ limit 件
+        offs = self.offsets.get(uid)
+        if not offs:
+            return []
+        out = []
+        for i in range(len(offs) - 1 - newest, max(-1, len(offs) - 1 - newest - limit), -1):
+            self.reader.seek(offs[i])
+            out.append(self.reader.readline())
+        return out
+
+    def close(self) -> None:
+        self.file.close()
+        self.reader.close()
+
+
+class _Sealed:
+    """圧縮して封じたセグメント。"""
+
+    def __init__(self, jz: Path, idx: Path):
+        self.jz = jz
+        self._file = idx.open("rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, blocks, count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{idx} は対応していない台帳索引です")
+        body = memoryview(self._mm)[_HEADER.size:]
+        table = body[:blocks * 16].cast("Q")          # [生の開始位置, 圧縮後の開始位置] × ブロック数
+        recs = body[blocks * 16:blocks * 16 + count * 16].cast("Q")  # [user_id, オフセット] × 件数
+        self._raw_starts = [table[2 * i] for i in range(blocks)]
+        self._comp_starts = [table[2 * i + 1] for i in range(blocks)] + [jz.stat().st_size]
+        table.release()
+        self._recs = recs
+        self.count_all = count
+        self._cache: "OrderedDict[int, bytes]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def _range(self, uid: int) -> Tuple[int, int]:
+        recs, n = self._recs, self.count_all
+        lo, hi = 0, n
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            if recs[2 * mid] < uid:
+                lo = mid + 1
+            else:
+                hi = mid
+        start = lo
+        hi = n
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            if recs[2 * mid] <= uid:
+                lo = mid + 1
+            else:
+                hi = mid
+        return start, lo
+
+    def count(self, uid: int) -> int:
+        lo, hi = self._range(uid)
+        return hi - lo
+
+    def _block(self, b: int) -> bytes:
+        with self._cache_lock:
+            data = self._cache.get(b)
+            if data is not None:
+                self._cache.move_to_end(b)
+                return data
+        with self.jz.open("rb") as f:
+            f.seek(self._comp_starts[b])
+            data = zlib.decompress(f.read(self._comp_starts[b + 1] - self._comp_starts[b]))
+        with self._cache_lock:
+            self._cache[b] = data
+            if len(self._cache) > _BLOCK_CACHE:
+                self._cache.popitem(last=False)
+        return data
+
+    def _line(self, offset: int) -> bytes:
+        b = bisect_right(self._raw_starts, offset) - 1
+        data = self._block(b)
+        start = offset - self._raw_starts[b]
+        return data[start:data.index(b"\n", start) + 1]
+
+    def read(self, uid: int, newest: int, limit: int) -> List[bytes]:
+        lo, hi = self._range(uid)
+        out = []
+        for i in range(hi - 1 - newest, max(lo - 1, hi - 1 - newest - limit), -1):
+            out.append(self._line(self._recs[2 * i + 1]))
+        return out
+
+    def close(self) -> None:
+        self._recs.release()
+        self._mm.close()
+        self._file.close()
+
+
+def seal(src: Path, jz: Path, idx: Path, block_bytes: int = BLOCK_BYTES) -> int:
+    """平文のセグメントを圧縮ブロック列と索引に変換する。件数を返す。"""
+    # ユーザーごとにまとめて並べ替える（同じユーザーの中では時刻順のまま）。
+    # 1 人分の履歴が隣り合うので、最新 10 件は 1〜2 ブロックの展開で読める
+    with src.open("rb") as f:
+        lines = [(json.loads(line)["u"], i, line) for i, line in enumerate(f)]
+    lines.sort()
+    recs = array("Q")
+    table = array("Q")
+    tmp_jz = jz.with_name(jz.name + ".tmp")
+    tmp_idx = idx.with_name(idx.name + ".tmp")
+    with tmp_jz.open("wb") as out:
+        raw_pos = comp_pos = 0
+        buf: List[bytes] = []
+        buf_len = 0
+
+        def flush_block() -> None:
+            nonlocal comp_pos, raw_pos, buf, buf_len
+            table.extend((raw_pos, comp_pos))
+            comp = zlib.compress(b"".join(buf), 6)
+            out.write(comp)
+            comp_pos += len(comp)
+            raw_pos += buf_len
+            buf, buf_len = [], 0
+
+        for uid, _, line in lines:
+            recs.extend((uid, raw_pos + buf_len))
+            buf.append(line)
+            buf_len += len(line)
+            if buf_len >= block_bytes:
+                flush_block()
+        if buf:
+            flush_block()
+        out.flush()
+        os.fsync(out.fileno())
+    with tmp_idx.open("wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(table) // 2, len(recs) // 2))
+        f.write(table.tobytes())
+        f.write(recs.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_jz, jz)
+    os.replace(tmp_idx, idx)
+    return len(recs) // 2
+
+
+class Ledger:
+    """セグメントに分けた追記専用の台帳。"""
+
+    def __init__(self, root: Path, segment_bytes: int = SEGMENT_BYTES, block_bytes: int = BLOCK_BYTES):
+        self.root = Path(root)
+        self.segment_bytes = segment_bytes
+        self.block_bytes = block_bytes
+        self._lock = threading.Lock()
+        self._sealer: Optional[threading.Thread] = None
+        self.root.mkdir(parents=True, exist_ok=True)
+        for tmp in self.root.glob("seg-*.tmp"):
+            tmp.unlink()
+
+        # 古い順に並べる。封じ終わっていない平文セグメントは _Active のまま読む
+        self._segments: List[Any] = []
+        numbers = sorted({int(p.name[4:10]) for p in self.root.glob("seg-*.*")
+                          if p.suffix in (".jsonl", ".idx")})
+        for n in numbers:
+            plain, jz, idx = self._paths(n)
+            if idx.exists() and jz.exists():
+                # 封じた後、平文を消す前に止まっていた
+                plain.unlink(missing_ok=True)
+                self._segments.append(_Sealed(jz, idx))
+            elif plain.exists():
+                self._segments.append(_Active(plain))
+        self._next = (numbers[-1] + 1) if numbers else 0
+        if not self._segments or not isinstance(self._segments[-1], _Active):
+            self._open_segment()
+        # 最後以外の平文セグメント（前回封じる前に止まったもの）を封じる
+        for seg in self._segments[:-1]:
+            if isinstance(seg, _Active):
+                self._seal_async(seg)
+
+    def _paths(self, n: int) -> Tuple[Path, Path, Path]:
+        base = f"seg-{n:06d}"
+        return self.root / f"{base}.jsonl", self.root / f"{base}.jz", self.root / f"{base}.idx"
+
+    def _open_segment(self) -> None:
+        self._segments.append(_Active(self._paths(self._next)[0]))
+        self._next += 1
+
+    # --- 書き込み ---
+
+    def append(self, user_id: int, kind: str, delta: int, balance: int,
+               counterpart: Optional[int] = None, game: Optional[str] = None,
+               ts: Optional[float] = None) -> None:
+        entry: Dict[str, Any] = {"t": int(time.time() if ts is None else ts), "u": user_id,
+                                 "k": kind, "d": delta, "b": balance}
+        if counterpart is not None:
+            entry["c"] = counterpart
+        if game is not None:
+            entry["g"] = game
+        line = (json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        with self._lock:
+            active = self._segments[-1]
+            active.append(user_id, line)
+            if active.size >= self.segment_bytes:
+                active.file.flush()
+                self._open_segment()
+                self._seal_async(active)
+
+    def _seal_async(self, seg: "_Active") -> None:
+        prev = self._sealer
+
+        def run() -> None:
+            if prev is not None:
+                prev.join()
+            n = int(seg.path.name[4:10])
+            plain, jz, idx = self._paths(n)
+            try:
+                seg.file.flush()
+                seal(plain, jz, idx, self.block_bytes)
+                sealed = _Sealed(jz, idx)
+            except Exception as e:
+                print(f"[ledger] seal failed ({plain}): {e}")
+                return
+            with self._lock:
+                i = self._segments.index(seg)
+                self._segments[i] = sealed
+                seg.close()
+            plain.unlink()
+
+        self._sealer = threading.Thread(target=run, name="ledger-sealer", daemon=True)
+        self._sealer.start()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._segments[-1].file.flush()
+
+    def close(self) -> None:
+        if self._sealer is not None:
+            self._sealer.join()
+        with self._lock:
+            for seg in self._segments:
+                seg.close()
+            self._segments = []
+
+    # --- 問い合わせ ---
+
+    # 平文セグメントは書き込みと同じ _lock の中で読む（封じたセグメントはロックなしで読める）
+
+    def count(self, user_id: int) -> int:
+        with self._lock:
+            segments = list(self._segments)
+            n = sum(seg.count(user_id) for seg in segments if isinstance(seg, _Active))
+        return n + sum(seg.count(user_id) for seg in segments if isinstance(seg, _Sealed))
+
+    def _read(self, seg: Any, user_id: int, skip: int, limit: int) -> Tuple[int, List[bytes]]:
+        # (そのセグメント内の件数, 読んだ行) を返す
+        if isinstance(seg, _Active):
+            with self._lock:
+                if not seg.file.closed:
+                    n = seg.count(user_id)
+                    return n, (seg.read(user_id, skip, limit) if skip < n else [])
+                # 読む直前に封じ終わった
+                seg = next(s for s in self._segments if isinstance(s, _Sealed) and s.jz.stem == seg.path.stem)
+        n = seg.count(user_id)
+        return n, (seg.read(user_id, skip, limit) if skip < n else [])
+
+    def history(self, user_id: int, offset: int = 0, limit: int = 10) -> List[Dict[str, Any]]:
+        """user_id の履歴を新しい順に offset 件目から limit 件返す。"""
+        with self._lock:
+            self._segments[-1].file.flush()
+            segments = list(self._segments)
+        out: List[bytes] = []
+        skip = offset
+        for seg in reversed(segments):
+            if len(out) >= limit:
+                break
+            n, lines = self._read(seg, user_id, skip, limit - len(out))
+            out.extend(lines)
+            skip = max(0, skip - n)
+        return [json.loads(line) for line in out]
+
+
+_ledger: Optional[Ledger] = None
+_ledger_lock = threading.Lock()
+
+
+def get_ledger() -> Optional[Ledger]:
+    """共有の台帳（LEDGER_DIR が空なら None）。"""
+    global _ledger
+    if _ledger is None and LEDGER_DIR:
+        with _ledger_lock:
+            if _ledger is None:
+                _ledger = Ledger(Path(LEDGER_DIR))
+    return _ledger
+
+
+def close() -> None:
+    global _ledger
+    with _ledger_lock:
+        if _ledger is not None:
+            _ledger.close()
+            _ledger = None
@@ -0,0 +1,151 @@
+"""メンバー情報の扱い（大きなサーバー向けの省メモリモード）。
+
+intents.members を有効にしたままだと、discord.py はログイン時に全ギルドの全メンバーを
+チャンク要求で取得してキャッシュする（10 万人のサーバーでは READY まで長く待たされ、
+メモリも大きく使う）。コマンドが必要とするのは実行したユーザーと引数で渡された Member
+だけで、どちらもインタラクションに含まれて届くので、キャッシュはなくても困らない。
+
+MEMBER_CACHE=lazy（既定）では
+- 起動時のチャンク取得をやめ、メンバーキャッシュを持たない（client_options()）
+- ID からメンバーが必要なときは resolve() で API から取り、件数上限と有効期限つきの LRU に置く
+- ロール単位の処理は stream() でメンバー一覧を 1000 人ずつ流し読みする（Member は作らない）
+MEMBER_CACHE=full なら従来どおり全員をキャッシュする（resolve() はキャッシュを先に見る）。
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, Tuple
+
+import discord
+
+# 設定（環境変数で調整可能）
+#   MEMBER_CACHE     : lazy（起動時に取得しない / キャッシュしない）または full（全員キャッシュ）
+#   MEMBER_CACHE_SIZE: resolve() の LRU に置くメンバー数の上限
+#   MEMBER_CACHE_TTL : LRU の有効期限（秒）。ニックネームの変更などはこの時間で反映される
+MODE = os.getenv("MEMBER_CACHE", "lazy").lower()
+CACHE_SIZE = int(os.getenv("MEMBER_CACHE_SIZE", "5000"))
+CACHE_TTL = float(os.getenv("MEMBER_CACHE_TTL", "600"))
+PAGE_SIZE = 1000  # メンバー一覧の 1 回の取得数（API の上限）
+
+
+def client_options() -> Dict[str, Any]:
+    """commands.Bot(...) に渡す追加の引数。"""
+    if MODE == "full":
+        return {}
+    return {"chunk_guilds_at_startup": False, "member_cache_flags": discord.MemberCacheFlags.none()}
+
+
+class MemberCache:
+    """(ギルド ID, ユーザー ID) -> Member の LRU。いなかった（退出済みなど）ことも None として覚える。"""
+
+    def __init__(self, size: int = CACHE_SIZE, ttl: float = CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self._data: "OrderedDict[Tuple[int, int], Tuple[float, Optional[discord.Member]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, guild_id: int, user_id: int) -> Tuple[bool, Optional[discord.Member]]:
+        """(見つかったか, Member)。期限切れは見つからなかった扱い。"""
+        key = (guild_id, user_id)
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return False, None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return True, entry[1]
+
+    def put(self, guild_id: int, user_id: int, member: Optional[discord.Member]) -> None:
+        key = (guild_id, user_id)
+        self._data[key] = (time.monotonic() + self.ttl, member)
+        self._data.move_to_end(key)
+        while len(self._data) > self.size:
+            self._data.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+cache = MemberCache()
+_pending: Dict[Tuple[int, int], "asyncio.Future[Optional[discord.Member]]"] = {}
+
+
+async def resolve(guild: discord.Guild, user_id: int) -> Optional[discord.Member]:
+    """ギルドのメンバーを返す。いなければ None。同じメンバーへの同時の問い合わせは 1 回の取得にまとめる。"""
+    member = guild.get_member(user_id)
+    if member is not None:
+        return member
+    found, member = cache.get(guild.id, user_id)
+    if found:
+        return member
+    key = (guild.id, user_id)
+    fut = _pending.get(key)
+    if fut is not None:
+        return await asyncio.shield(fut)
+    fut = _pending[key] = asyncio.get_running_loop().create_future()
+    try:
+        try:
+            member = await guild.fetch_member(user_id)
+        except discord.NotFound:
+            member = None
+        cache.put(guild.id, user_id, member)
+        fut.set_result(member)
+        return member
+    except asyncio.CancelledError:
+        fut.cancel()
+        raise
+    except Exception as e:
+        if not fut.cancelled():
+            fut.set_exception(e)
+            fut.exception()  # 待っている人がいなくても警告を出さない
+        raise
+    finally:
+        del _pending[key]
+
+
+async def display_names(guild: Optional[discord.Guild], user_ids: Iterable[int],
+                        timeout: float = 1.0) -> Dict[int, str]:
+    """user_id -> 表示名。timeout 秒以内に取れなかった人と、もういない人は含まない。"""
+    ids = list(dict.fromkeys(user_ids))
+    if guild is None or not ids:
+        return {}
+    tasks = [asyncio.ensure_future(resolve(guild, uid)) for uid in ids]
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for t in pending:
+        t.cancel()
+    out = {}
+    for uid, t in zip(ids, tasks):
+        # 取得した側が取り消されると、待っていた側のタスクも取り消し扱いで終わる
+        if t in done and not t.cancelled() and t.exception() is None and t.result() is not None:
+            out[uid] = t.result().display_name
+    return out
+
+
+async def stream(client: discord.Client, guild_id: int, role_id: Optional[int] = None,
+                 bots: bool = False) -> AsyncIterator[int]:
+    """ギルドのメンバーの user_id を 1000 人ずつ API から読みながら返す。
+
+    role_id を渡すとそのロールを持つ人だけ（@everyone の ID ならギルド全員）。
+    Member オブジェクトは作らず、生の JSON のロール一覧だけを見る。
+    """
+    everyone = role_id is None or role_id == guild_id
+    role = str(role_id)
+    after = 0
+    while True:
+        page = await client.http.get_members(guild_id, PAGE_SIZE, after)
+        for m in page:
+            user = m["user"]
+            if user.get("bot") and not bots:
+                continue
+            if everyone or role in m.get("roles", ()):
+                yield int(user["id"])
+        if len(page) < PAGE_SIZE:
+            return
+        after = int(page[-1]["user"]["id"])
@@ -0,0 +1,351 @@
+"""Prometheus 形式のメトリクス（ローカルの HTTP ポートで公開）。
+
+    METRICS_PORT=9100 python bot.py
+    curl http://127.0.0.1:9100/metrics
+
+集めるもの:
+- コマンド / ボタンの応答時間: インタラクション受信（Discord 側の作成時刻）から最初の応答
+  （send_message / defer など）まで、最終結果まで
+- バンクの読み書きの回数と所要時間（async API 単位）、グループコミットの所要時間と件数
+- 表示中の View の数（クラス名ごと）
+- イベントループの遅れ
+- アニメーション編集スケジューラのカウンタ
+- 進行中のゲームセッションの数（ゲームごと）とおおよそのメモリ
+- メンバーの LRU（members.py）の件数とヒット / ミス
+
+METRICS_PORT が空なら何もしない（フックを一切入れないので、呼び出し側に残るのは
+result() の先頭の真偽値チェックだけ）。
+"""
+import asyncio
+import functools
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import discord
+
+import animator
+import bank
+import members
+import sessions
+
+# 設定（環境変数で調整可能）
+#   METRICS_PORT         : 公開するポート（空なら無効）
+#   METRICS_HOST         : 待ち受けるアドレス
+#   METRICS_LOOP_INTERVAL: イベントループの遅れを測る間隔（秒）
+PORT = int(os.getenv("METRICS_PORT") or 0)
+HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+LOOP_INTERVAL = float(os.getenv("METRICS_LOOP_INTERVAL", "0.5"))
+ENABLED = PORT > 0
+
+# 秒単位のバケット
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+IO_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _fmt_labels(names: Tuple[str, ...], values: Labels, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = list(self._values.items())
+        for labels, v in items:
+            yield f"{self.name}{_fmt_labels(self.labels, labels)} {v:g}"
+
+
+class Gauge:
+    """値は描画のたびに fn() から取る。fn は {ラベル値のタプル: 値} を返す。"""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...], fn: Callable[[], Dict[Labels, float]],
+                 kind: str = "gauge"):
+        self.name, self.help, self.labels, self.fn, self.kind = name, help, labels, fn, kind
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        try:
+            items = self.fn().items()
+        except Exception as e:
+            print(f"[metrics] gauge {self.name} failed: {e}")
+            return
+        for labels, v in items:
+            yield f"{self.name}{_fmt_labels(self.labels, labels)} {v:g}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        # ラベル値 -> [バケットごとの件数..., 合計, 件数]
+        self._series: Dict[Labels, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = 0
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [0.0] * (len(self.buckets) + 3)
+            s[i] += 1
+            s[-2] += value
+            s[-1] += 1
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = [(labels, list(s)) for labels, s in self._series.items()]
+        for labels, s in items:
+            acc = 0.0
+            for bound, n in zip(self.buckets + (float("inf"),), s):
+                acc += n
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                yield f"{self.name}_bucket{_fmt_labels(self.labels, labels, le)} {acc:g}"
+            yield f"{self.name}_sum{_fmt_labels(self.labels, labels)} {s[-2]:g}"
+            yield f"{self.name}_count{_fmt_labels(self.labels, labels)} {s[-1]:g}"
+
+
+# --- 指標 ---
+
+first_response = Histogram("nugget_interaction_first_response_seconds",
+                           "Time from interaction creation to the first response (send_message/defer/...).",
+                           ("name",))
+result_latency = Histogram("nugget_interaction_result_seconds",
+                           "Time from interaction creation to the final result.", ("name",))
+bank_ops = Histogram("nugget_bank_op_seconds", "Duration of bank API calls as seen by the event loop.",
+                     ("op", "mode"), IO_BUCKETS)
+bank_commit = Histogram("nugget_bank_commit_seconds", "Duration of one group commit on the executor.",
+                        (), IO_BUCKETS)
+bank_commit_ops = Counter("nugget_bank_commit_ops_total", "Writes applied by group commits.")
+loop_lag = Histogram("nugget_event_loop_lag_seconds", "How late the event loop woke up a sleeping task.",
+                     (), IO_BUCKETS)
+
+_registry: List[Any] = [first_response, result_latency, bank_ops, bank_commit, bank_commit_ops, loop_lag]
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- インタラクション ---
+
+
+def _label(interaction: discord.Interaction) -> str:
+    cmd = interaction.command
+    if cmd is not None:
+        return cmd.qualified_name
+    return interaction.type.name
+
+
+def _since_created(interaction: discord.Interaction) -> float:
+    return max(0.0, time.time() - interaction.created_at.timestamp())
+
+
+def result(name: str, interaction: discord.Interaction) -> None:
+    """最終結果を送った時点で呼ぶ（ボタンの処理など、コマンドの完了では測れないもの）。"""
+    if not ENABLED:
+        return
+    result_latency.observe(_since_created(interaction), name)
+
+
+_RESPONSE_METHODS = ("send_message", "defer", "edit_message", "send_modal")
+
+
+def _hook_responses() -> None:
+    # InteractionResponse の応答メソッドを包み、最初の応答が返った時点を記録する。
+    # 公開 API にフックの口がないので discord.py 2.3.x の作り（メソッド名と非公開の _parent）に
+    # 頼っている。更新で変わっていたら、その計測だけを諦めて setup_hook は止めない
+    for name in _RESPONSE_METHODS:
+        orig = getattr(discord.InteractionResponse, name, None)
+        if orig is None:
+            print(f"[metrics] InteractionResponse.{name} がないため初回応答の計測から外します。")
+            continue
+        if getattr(orig, "_metrics_hooked", False):
+            continue
+
+        def make(orig: Callable[..., Any]) -> Callable[..., Any]:
+            @functools.wraps(orig)
+            async def wrapper(self: discord.InteractionResponse, *args: Any, **kwargs: Any) -> Any:
+                first = not self.is_done()
+                value = await orig(self, *args, **kwargs)
+                interaction = getattr(self, "_parent", None)
+                if first and interaction is not None:
+                    first_response.observe(_since_created(interaction), _label(interaction))
+                return value
+
+            wrapper._metrics_hooked = True
+            return wrapper
+
+        setattr(discord.InteractionResponse, name, make(orig))
+
+
+async def _on_command_completion(interaction: discord.Interaction, command: Any) -> None:
+    result_latency.observe(_since_created(interaction), command.qualified_name)
+
+
+# --- バンク ---
+
+_BANK_READS = ("aget_balance", "ahistory", "ahistory_count", "atop_balances", "arank_of", "aranked_count",
+               "aeconomy_stats")
+_BANK_WRITES = ("aset_balance", "aadd_balance", "atry_debit", "adebit_then_credit", "atransfer",
+                "aapply_batch", "areserve", "aextend", "asettle", "asettle_batch", "arefund")
+
+
+def _hook_bank() -> None:
+    for mode, names in (("read", _BANK_READS), ("write", _BANK_WRITES)):
+        for name in names:
+            orig = getattr(bank, name)
+            if getattr(orig, "_metrics_hooked", False):
+                continue
+
+            def make(orig: Callable[..., Any], op: str, mode: str) -> Callable[..., Any]:
+                @functools.wraps(orig)
+                async def wrapper(*args: Any, **kwargs: Any) -> Any:
+                    t0 = time.perf_counter()
+                    try:
+                        return await orig(*args, **kwargs)
+                    finally:
+                        bank_ops.observe(time.perf_counter() - t0, op, mode)
+
+                wrapper._metrics_hooked = True
+                return wrapper
+
+            setattr(bank, name, make(orig, name[1:], mode))
+
+    commit = bank._commit_group
+    if not getattr(commit, "_metrics_hooked", False):
+        @functools.wraps(commit)
+        def timed_commit(batch: List[Any]) -> List[Any]:
+            t0 = time.perf_counter()
+            try:
+                return commit(batch)
+            finally:
+                bank_commit.observe(time.perf_counter() - t0)
+                bank_commit_ops.inc(amount=len(batch))
+
+        timed_commit._metrics_hooked = True
+        bank._commit_group = timed_commit
+
+
+# --- View / ループ / アニメーション ---
+
+
+def _active_views(bot: discord.Client) -> Dict[Labels, float]:
+    # discord.py の ViewStore から、メッセージに紐づいて待機中の View を数える。
+    # ViewStore は非公開（discord.py 2.3.x の _connection._view_store）なので、
+    # 更新で属性がなくなっていたら空の値を返す（/metrics や setup_hook を落とさない）
+    store = getattr(getattr(bot, "_connection", None), "_view_store", None)
+    if store is None:
+        return {}
+    views = {id(v): v for v in (getattr(store, "_synced_message_views", None) or {}).values()}
+    for items in (getattr(store, "_views", None) or {}).values():
+        for entry in items.values():
+            view = entry[0] if isinstance(entry, tuple) else getattr(entry, "view", None)
+            if view is not None:
+                views[id(view)] = view
+    counts: Dict[Labels, float] = {}
+    for view in views.values():
+        key = (type(view).__name__,)
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def _animator_stats() -> Dict[Labels, float]:
+    return {(k,): v for k, v in animator.scheduler.stats().items() if k != "buckets"}
+
+
+async def _watch_loop() -> None:
+    while True:
+        t0 = time.perf_counter()
+        await asyncio.sleep(LOOP_INTERVAL)
+        loop_lag.observe(max(0.0, time.perf_counter() - t0 - LOOP_INTERVAL))
+
+
+# --- HTTP ---
+
+
+async def _serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5)
+        parts = request.split(b" ", 2)
+        if len(parts) >= 2 and parts[0] == b"GET" and parts[1].split(b"?")[0] == b"/metrics":
+            status, body = "200 OK", render().encode("utf-8")
+        else:
+            status, body = "404 Not Found", b"not found\n"
+        writer.write((f"HTTP/1.1 {status}\r\n"
+                      "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                      f"Content-Length: {len(body)}\r\n"
+                      "Connection: close\r\n\r\n").encode("ascii") + body)
+        await writer.drain()
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+_server: Optional[asyncio.AbstractServer] = None
+_loop_task: Optional["asyncio.Task[None]"] = None
+
+
+async def start(bot: discord.Client) -> None:
+    """フックを入れて HTTP サーバーを起動する（METRICS_PORT が空なら何もしない）。"""
+    global _server, _loop_task
+    if not ENABLED or _server is not None:
+        return
+    _hook_responses()
+    _hook_bank()
+    bot.add_listener(_on_command_completion, "on_app_command_completion")
+    _registry.append(Gauge("nugget_active_views", "Views waiting for interactions, by class.",
+                           ("view",), lambda: _active_views(bot)))
+    _registry.append(Gauge("nugget_sessions", "Live game sessions, by game.",
+                           ("game",), lambda: {(g,): n for g, n in sessions.registry.counts().items()}))
+    _registry.append(Gauge("nugget_session_bytes", "Approximate memory held by live game sessions.",
+                           (), lambda: {(): sessions.registry.memory()}))
+    _registry.append(Gauge("nugget_member_cache", "On-demand member LRU: entries, hits and misses.",
+                           ("stat",), lambda: {(k,): v for k, v in members.cache.stats().items()}))
+    _registry.append(Gauge("nugget_animator_total", "Animation edit scheduler counters.",
+                           ("event",), _animator_stats, kind="counter"))
+    _loop_task = asyncio.get_running_loop().create_task(_watch_loop(), name="metrics-loop-lag")
+    _server = await asyncio.start_server(_serve, HOST, PORT)
+    print(f"[metrics] http://{HOST}:{PORT}/metrics で公開しています。")
+
+
+async def stop() -> None:
+    global _server, _loop_task
+    if _loop_task is not None:
+        _loop_task.cancel()
+        _loop_task = None
+    if _server is not None:
+        _server.close()
+        await _server.wait_closed()
+        _server = None
@@ -0,0 +1,133 @@
+"""残高ランキング用のソート済みインデックス。
+
+キー (-残高, user_id) を小さなソート済みバケットに分けて持ち、バケットごとの件数を
+Fenwick 木で管理する。更新・順位取得・n 番目の取得はいずれも O(log n) + バケット内の
+bisect/挿入（バケットサイズは定数）で済み、全件ソートは不要。
+"""
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_LOAD = 512
+
+
+class RankIndex:
+    """残高が正のユーザーを残高の多い順に並べたインデックス。"""
+
+    def __init__(self, balances: Iterable[Tuple[int, int]] = ()):
+        self._bal: Dict[int, int] = {}
+        keys = []
+        for uid, bal in balances:
+            if bal > 0:
+                self._bal[uid] = bal
+                keys.append((-bal, uid))
+        keys.sort()
+        self._buckets: List[List[Tuple[int, int]]] = [keys[i:i + _LOAD] for i in range(0, len(keys), _LOAD)]
+        self._rebuild()
+
+    def __len__(self) -> int:
+        return len(self._bal)
+
+    # --- 内部構造 ---
+
+    def _rebuild(self) -> None:
+        self._maxes = [b[-1] for b in self._buckets]
+        n = len(self._buckets)
+        tree = [0] * (n + 1)
+        for i, b in enumerate(self._buckets, 1):
+            tree[i] += len(b)
+            j = i + (i & -i)
+            if j <= n:
+                tree[j] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, i: int, v: int) -> None:
+        i += 1
+        tree = self._tree
+        while i < len(tree):
+            tree[i] += v
+            i += i & -i
+
+    def _prefix(self, i: int) -> int:
+        # バケット 0..i-1 の件数合計
+        s = 0
+        tree = self._tree
+        while i > 0:
+            s += tree[i]
+            i -= i & -i
+        return s
+
+    def _locate(self, pos: int) -> Tuple[int, int]:
+        # pos 番目（0 始まり）の要素が入っている (バケット番号, バケット内位置)
+        tree = self._tree
+        i = 0
+        step = 1 << (len(tree) - 1).bit_length()
+        while step:
+            j = i + step
+            if j < len(tree) and tree[j] <= pos:
+                i = j
+                pos -= tree[j]
+            step >>= 1
+        return i, pos
+
+    def _insert(self, key: Tuple[int, int]) -> None:
+        if not self._buckets:
+            self._buckets.append([key])
+            self._rebuild()
+            return
+        i = bisect_left(self._maxes, key)
+        if i == len(self._buckets):
+            i -= 1
+        bucket = self._buckets[i]
+        insort(bucket, key)
+        self._maxes[i] = bucket[-1]
+        if len(bucket) > 2 * _LOAD:
+            self._buckets[i:i + 1] = [bucket[:_LOAD], bucket[_LOAD:]]
+            self._rebuild()
+        else:
+            self._tree_add(i, 1)
+
+    def _remove(self, key: Tuple[int, int]) -> None:
+        i = bisect_left(self._maxes, key)
+        bucket = self._buckets[i]
+        del bucket[bisect_left(bucket, key)]
+        if bucket:
+            self._maxes[i] = bucket[-1]
+            self._tree_add(i, -1)
+        else:
+            del self._buckets[i]
+            self._rebuild()
+
+    # --- 公開操作 ---
+
+    def update(self, user_id: int, balance: int) -> None:
+        """ユーザーの残高変更を反映する。"""
+        old = self._bal.get(user_id)
+        if old == balance:
+            return
+        if old is not None:
+            self._remove((-old, user_id))
+            del self._bal[user_id]
+        if balance > 0:
+            self._bal[user_id] = balance
+            self._insert((-balance, user_id))
+
+    def rank_of(self, user_id: int) -> Optional[int]:
+        """1 始まりの順位。ランキング外（残高 0 以下）なら None。"""
+        bal = self._bal.get(user_id)
+        if bal is None:
+            return None
+        key = (-bal, user_id)
+        i = bisect_left(self._maxes, key)
+        return self._prefix(i) + bisect_left(self._buckets[i], key) + 1
+
+    def top(self, offset: int = 0, limit: int = 10) -> List[Tuple[int, int]]:
+        """offset 番目から limit 件の (user_id, 残高) を残高の多い順に返す。"""
+        out: List[Tuple[int, int]] = []
+        if offset >= len(self._bal) or limit <= 0:
+            return out
+        i, j = self._locate(max(offset, 0))
+        while i < len(self._buckets) and len(out) < limit:
+            for neg, uid in self._buckets[i][j:j + limit - len(out)]:
+                out.append((uid, -neg))
+            i, j = i + 1, 0
+        return out
@@ -0,0 +1,320 @@
+"""ゲーム用の乱数サービス。
+
+ラウンドごとに 64 ビットのシードを配り、そのシードから決まる乱数ストリーム（Stream）で
+出目を引く。シードは結果と一緒にラウンドログ（rounds.jsonl）に残すので、問い合わせが
+あったラウンドは後から同じ出目を再現できる。
+
+    python rng.py replay <ラウンドID> [rounds.jsonl]
+
+- シードは os.urandom からまとめて先読みする（RNG_SEED を指定すると決定的な系列になる）
+- Stream はシードを鍵にした BLAKE2b のカウンタモードで、256 バイトずつまとめて生成して
+  1 バイト単位で切り出す（大量に引くときは many() でまとめて引ける）
+- 演出用の使い捨てフレームは cosmetic を使い、ラウンドのストリームは消費しない
+- ラウンドログはイベントループ上では行をためておき、書き込みはスレッドプールで
+  まとめて行う（record() はループを止めない。close() / flush() で残りを書き出す）
+- 書き終えた行はゲームごとに数えておき、mark() で書いた位置と一緒に渡す（経済の集計の
+  チェックポイント用。economy.py）
+"""
+import asyncio
+import atexit
+import hashlib
+import json
+import os
+import sys
+import threading
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, MutableSequence, Optional, Sequence, Tuple
+
+import rules
+
+# 設定（環境変数で調整可能）
+#   RNG_SEED       : 指定するとシードを決定的な系列から配る（検証・シミュレーション用）
+#   RNG_ROUNDS_FILE: ラウンドログの保存先
+MASTER_SEED = os.getenv("RNG_SEED")
+ROUNDS_FILE = Path(os.getenv("RNG_ROUNDS_FILE", "rounds.jsonl"))
+
+_SEED_BATCH = 256   # 一度に先読みするシード数
+_BLOCKS = 4         # Stream が一度に生成する BLAKE2b ブロック数（64 バイト × 4）
+
+
+class Stream:
+    """シードから決まる乱数列。random.Random の randint / choice / shuffle と同じ使い方ができる。"""
+
+    __slots__ = ("seed", "_key", "_counter", "_buf", "_pos")
+
+    def __init__(self, seed: int):
+        self.seed = seed
+        self._key = seed.to_bytes(8, "little")
+        self._counter = 0
+        self._buf = b""
+        self._pos = 0
+
+    def _refill(self) -> None:
+        blocks = []
+        for _ in range(_BLOCKS):
+            blocks.append(hashlib.blake2b(self._counter.to_bytes(8, "little"), key=self._key).digest())
+            self._counter += 1
+        self._buf = b"".join(blocks)
+        self._pos = 0
+
+    def randbelow(self, n: int) -> int:
+        """0 以上 n 未満の一様な整数（棄却法なので偏りはない）。"""
+        width = 1 if n <= 256 else ((n - 1).bit_length() + 7) // 8
+        span = 1 << (8 * width)
+        limit = span - span % n
+        while True:
+            if self._pos + width > len(self._buf):
+                self._refill()
+            if width == 1:
+                v = self._buf[self._pos]
+            else:
+                v = int.from_bytes(self._buf[self._pos:self._pos + width], "little")
+            self._pos += width
+            if v < limit:
+                return v % n
+
+    def many(self, n: int, count: int) -> List[int]:
+        """0 以上 n 未満（n <= 256）を count 個まとめて引く。randbelow を count 回呼ぶのと同じ列になる。"""
+        if n > 256:
+            return [self.randbelow(n) for _ in range(count)]
+        limit = 256 - 256 % n
+        out: List[int] = []
+        while len(out) < count:
+            if self._pos >= len(self._buf):
+                self._refill()
+            chunk = self._buf[self._pos:]
+            taken = 0
+            for b in chunk:
+                taken += 1
+                if b < limit:
+                    out.append(b % n)
+                    if len(out) == count:
+                        break
+            self._pos += taken
+        return out
+
+    def randint(self, a: int, b: int) -> int:
+        return a + self.randbelow(b - a + 1)
+
+    def choice(self, seq: Sequence[Any]) -> Any:
+        return seq[self.randbelow(len(seq))]
+
+    def shuffle(self, x: MutableSequence[Any]) -> None:
+        # Fisher-Yates
+        for i in range(len(x) - 1, 0, -1):
+            j = self.randbelow(i + 1)
+            x[i], x[j] = x[j], x[i]
+
+
+class _SeedPool:
+    def __init__(self, master: Optional[str]):
+        self._master = None if master is None else Stream(int(master))
+        self._seeds = array("Q")
+
+    def next(self) -> int:
+        if not self._seeds:
+            if self._master is None:
+                raw = os.urandom(8 * _SEED_BATCH)
+            else:
+                raw = bytes(self._master.many(256, 8 * _SEED_BATCH))
+            self._seeds = array("Q", raw)
+            self._seeds.reverse()
+        return self._seeds.pop()
+
+
+_pool = _SeedPool(MASTER_SEED)
+
+# 演出用（記録しない）
+cosmetic = Stream(_pool.next())
+
+
+def new_seed() -> int:
+    return _pool.next()
+
+
+def stream(seed: Optional[int] = None) -> Stream:
+    """新しいラウンド用のストリーム（seed を渡すとそのラウンドを再現する）。"""
+    return Stream(new_seed() if seed is None else seed)
+
+
+def round_id(seed: int) -> str:
+    return f"{seed:016x}"
+
+
+def parse_round_id(text: str) -> int:
+    return int(text, 16)
+
+
+# --- ラウンドログ ---
+
+_log = None
+_pending: List[Tuple[bytes, str, int, int]] = []  # まだ書いていない行（行, ゲーム, 掛け金, 配当）
+_written: Dict[str, List[int]] = {}  # 前回の mark() 以降に書いた行: ゲーム -> [回数, 賭け金, 配当]
+_scheduled = False             # スレッドプールに書き出しを頼んである
+_pending_lock = threading.Lock()  # _pending と _scheduled（ループ側は一瞬しか持たない）
+_file_lock = threading.Lock()     # ファイルへの書き込み（行の順番を保つため、取り出しもこの中で行う）
+
+
+def record(stream_or_id, game: str, user_id: int, bet: int, payout: int, **detail: Any) -> str:
+    """ラウンドの結果をログに 1 行追記する。ラウンド ID を返す。
+
+    イベントループ上ではためておいて書き込みをスレッドプールに任せ、ループの外ではすぐ書く。
+    """
+    global _scheduled
+    rid = round_id(stream_or_id.seed) if isinstance(stream_or_id, Stream) else stream_or_id
+    entry = {"round": rid, "game": game, "user": user_id, "bet": bet, "payout": payout}
+    entry.update(detail)
+    line = (json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    with _pending_lock:
+        _pending.append((line, game, int(detail.get("stake", bet)), payout))
+        if loop is None or _scheduled:
+            schedule = False
+        else:
+            schedule = _scheduled = True
+    if loop is None:
+        flush()
+    elif schedule:
+        loop.run_in_executor(None, flush)
+    return rid
+
+
+def flush() -> None:
+    """ためている行をすべてファイルに書き出す（スレッドプールからも呼ばれる）。"""
+    global _log, _pending, _scheduled
+    with _file_lock:
+        with _pending_lock:
+            lines, _pending = _pending, []
+            _scheduled = False
+        if not lines:
+            return
+        try:
+            if _log is None:
+                _log = ROUNDS_FILE.open("ab")
+            _log.write(b"".join(line for line, _game, _stake, _payout in lines))
+            _log.flush()
+        except OSError as e:
+            print(f"[rng] round log write failed: {e}")
+            return
+        for _line, game, stake, payout in lines:
+            g = _written.get(game)
+            if g is None:
+                g = _written[game] = [0, 0, 0]
+            g[0] += 1
+            g[1] += stake
+            g[2] += payout
+
+
+def mark() -> Tuple[int, Dict[str, List[int]]]:
+    """ためている行を書き出し、(ログの末尾のバイト位置, 前回の mark() 以降に書いた行の集計) を返す。
+
+    集計はゲーム -> [回数, 賭け金, 配当]。位置と集計は同じロックの中で取るので、ちょうど
+    その位置までの行と一致する。
+    """
+    global _written
+    flush()
+    with _file_lock:
+        if _log is not None:
+            end = _log.tell()
+        else:
+            end = ROUNDS_FILE.stat().st_size if ROUNDS_FILE.exists() else 0
+        written, _written = _written, {}
+    return end, written
+
+
+def close() -> None:
+    global _log
+    flush()
+    with _file_lock:
+        if _log is not None:
+            _log.close()
+            _log = None
+
+
+atexit.register(close)
+
+
+def _entries(path: Path) -> Iterator[Dict[str, Any]]:
+    flush()  # ためている行も読めるように
+    with Path(path).open("r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def find(rid: str, path: Path = ROUNDS_FILE) -> Optional[Dict[str, Any]]:
+    for entry in _entries(path):
+        if entry["round"] == rid:
+            return entry
+    return None
+
+
+def find_all(rid: str, path: Path = ROUNDS_FILE) -> List[Dict[str, Any]]:
+    """rid の行をすべて返す（チンチロの卓は全員が同じラウンド ID を持つ）。"""
+    return [entry for entry in _entries(path) if entry["round"] == rid]
+
+
+# --- 再現 ---
+
+
+def _shoe_cards(decks: int, trace: List[List[str]]) -> List[int]:
+    # trace: [[シューのシード, 位置], ...]
+    shoes: Dict[str, rules.Shoe] = {}
+    cards = []
+    for seed, pos in trace:
+        shoe = shoes.get(seed)
+        if shoe is None:
+            shoe = shoes[seed] = rules.Shoe(decks, new_rng=lambda s=seed: Stream(parse_round_id(s)))
+        cards.append(shoe.at(pos))
+    return cards
+
+
+def replay(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """ログの 1 行からそのラウンドを再計算する。payout がログと一致するかを ok に入れる。"""
+    game, bet = entry["game"], entry["bet"]
+    if game == "chinchiro" and "seat" in entry:
+        # 卓: ディーラーの出目を全員で共有し、席順に振る
+        players, dealer = rules.roll_chinchiro_table(Stream(parse_round_id(entry["round"])), entry["seat"] + 1)
+        player = players[-1]
+        outcome, payout = rules.chinchiro_payout(bet, rules.score_roll(player)[0], rules.score_roll(dealer)[0])
+        shown = {"player": player, "dealer": dealer}
+    elif game == "chinchiro":
+        player, dealer = rules.roll_chinchiro(Stream(parse_round_id(entry["round"])))
+        outcome, payout = rules.chinchiro_payout(bet, rules.score_roll(player)[0], rules.score_roll(dealer)[0])
+        shown = {"player": player, "dealer": dealer}
+    elif game == "slots":
+        reels = rules.spin_slot(Stream(parse_round_id(entry["round"])))
+        payout = rules.slot_payout(bet, reels)
+        shown = {"reels": reels}
+    elif game == "blackjack":
+        player = rules.Hand(_shoe_cards(entry["decks"], entry["player"]))
+        dealer = rules.Hand(_shoe_cards(entry["decks"], entry["dealer"]))
+        outcome, payout = rules.blackjack_payout(entry["stake"], player.total, dealer.total)
+        shown = {"player": str(player), "dealer": str(dealer)}
+    else:
+        raise ValueError(f"未対応のゲームです: {game}")
+    return dict(shown, payout=payout, ok=payout == entry["payout"])
+
+
+def main(argv) -> int:
+    if len(argv) < 3 or argv[1] != "replay":
+        print("使い方: python rng.py replay <ラウンドID> [rounds.jsonl]")
+        return 2
+    path = Path(argv[3]) if len(argv) > 3 else ROUNDS_FILE
+    entries = find_all(argv[2], path)
+    if not entries:
+        print(f"ラウンド {argv[2]} は {path} に見つかりません。")
+        return 1
+    ok = True
+    for entry in entries:
+        result = replay(entry)
+        ok = ok and result["ok"]
+        print(json.dumps({"log": entry, "replay": result}, ensure_ascii=False, indent=2))
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
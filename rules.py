@@ -0,0 +1,218 @@
+"""ゲームの判定・配当ルール（discord に依存しない純粋な関数）。
+
+bot.py / games.py と simulate.py の両方がここを呼ぶので、シミュレーションの数字は
+実際のゲームと同じルールで出る。
+"""
+import os
+import random
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple
+
+# --- チンチロ ---
+
+
+def score_roll(roll: Sequence[int]) -> Tuple[int, str]:
+    """ロール(3個のダイス)から順位を返す。
+    返り値: (rank:int, label:str)
+    rank の大きい方が勝ち。特別値:
+      -1: 1-2-3(自動負け)
+       0: メンツ無し（ペアもトリプルもなし）→負け扱い
+      >=1 and <=6: ペアありでシングルの目が点数（1-6）
+      >=100: ゾロ目（トリプル） -> 100 + face
+    """
+    s = sorted(roll)
+    # 1-2-3 自動負け
+    if s == [1, 2, 3]:
+        return -1, "1-2-3（自動負け）"
+    # トリプル
+    if s[0] == s[1] == s[2]:
+        return 100 + s[0], f"ゾロ目 {s[0]}-{s[1]}-{s[2]}"
+    # ペア判定
+    if s[0] == s[1] or s[1] == s[2]:
+        # シングルの目を返す
+        if s[0] == s[1]:
+            single = s[2]
+        else:
+            single = s[0]
+        return single, f"ペア {roll[0]}-{roll[1]}-{roll[2]}（点：{single}）"
+    # メンツ無し
+    return 0, f"メンツ無し {roll[0]}-{roll[1]}-{roll[2]}"
+
+
+def roll_chinchiro(rng: random.Random = random) -> Tuple[List[int], List[int]]:
+    """(プレイヤーの出目, ディーラーの出目)。"""
+    player = [rng.randint(1, 6) for _ in range(3)]
+    dealer = [rng.randint(1, 6) for _ in range(3)]
+    return player, dealer
+
+
+def roll_chinchiro_table(rng: random.Random, seats: int) -> Tuple[List[List[int]], List[int]]:
+    """卓用: (席順の各プレイヤーの出目, 共有のディーラーの出目)。
+
+    ディーラーを先に振るので、先頭から k 席分の出目は seats によらず同じ（再現に使う）。
+    """
+    dealer = [rng.randint(1, 6) for _ in range(3)]
+    players = [[rng.randint(1, 6) for _ in range(3)] for _ in range(seats)]
+    return players, dealer
+
+
+def chinchiro_payout(amount: int, p_rank: int, d_rank: int) -> Tuple[str, int]:
+    """(outcome, payout) を返す。outcome は "win"/"lose"/"draw"、payout は掛け金込みの払い戻し。"""
+    if p_rank == d_rank:
+        return "draw", amount
+    if p_rank == -1:
+        return "lose", 0
+    if d_rank == -1 or p_rank > d_rank:
+        # ゾロ目は 3 倍付け
+        mult = 3 if p_rank >= 100 else 1
+        return "win", amount * (1 + mult)
+    return "lose", 0
+
+
+# --- スロット ---
+
+SLOT_SYMBOLS = ["🍒", "⭐", "💎", "🍋", "🍊", "🔔"]
+
+
+def spin_slot(rng: random.Random = random) -> List[str]:
+    return [rng.choice(SLOT_SYMBOLS) for _ in range(3)]
+
+
+def slot_payout(amount: int, reels: Sequence[str]) -> int:
+    """掛け金込みの払い戻し。3つ一致で 10 倍、2つ一致で 2 倍、それ以外は 0。"""
+    if reels[0] == reels[1] == reels[2]:
+        return amount * 10
+    if reels[0] == reels[1] or reels[1] == reels[2] or reels[0] == reels[2]:
+        return amount * 2
+    return 0
+
+
+# --- ブラックジャック ---
+#
+# カードは CARD_RANKS の添字（0=A, 1="2", ..., 9="10", 10=J, 11=Q, 12=K）の小さな整数で持つ。
+
+CARD_RANKS = ["A"] + [str(i) for i in range(2, 11)] + ["J", "Q", "K"]
+ACE = 0
+_LOW = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10]  # A を 1 と数えた点数
+
+# シューの設定（環境変数で調整可能）
+#   BJ_DECKS      : シューに入れるデッキ数
+#   BJ_PENETRATION: この割合まで配ったら（カットカード）次のゲームの前にシャッフル
+DECKS = int(os.getenv("BJ_DECKS", "6"))
+PENETRATION = float(os.getenv("BJ_PENETRATION", "0.75"))
+
+
+def card_value(card: int) -> int:
+    if card == ACE:
+        return 11
+    return _LOW[card]
+
+
+class Hand:
+    """手札。A を 1 と数えた合計と A の枚数を 1 枚ごとに更新するので、点数は O(1) で出る。"""
+
+    __slots__ = ("cards", "low", "aces")
+
+    def __init__(self, cards: Iterable[int] = ()):
+        self.cards: List[int] = []
+        self.low = 0
+        self.aces = 0
+        for c in cards:
+            self.add(c)
+
+    def add(self, card: int) -> None:
+        self.cards.append(card)
+        self.low += _LOW[card]
+        if card == ACE:
+            self.aces += 1
+
+    @property
+    def soft(self) -> bool:
+        # A を 1 枚 11 と数えてもバーストしない
+        return self.aces > 0 and self.low + 10 <= 21
+
+    @property
+    def total(self) -> int:
+        return self.low + 10 if self.soft else self.low
+
+    def value(self) -> Tuple[int, bool]:
+        # returns (best_value, is_soft)
+        return self.total, self.soft
+
+    def __len__(self) -> int:
+        return len(self.cards)
+
+    def __str__(self) -> str:
+        return " ".join(CARD_RANKS[c] for c in self.cards)
+
+
+def hand_value(cards: Iterable[int]) -> Tuple[int, bool]:
+    return Hand(cards).value()
+
+
+class Shoe:
+    """複数デッキのシュー。カットカードを過ぎたら、次のゲームを始める前にシャッフルする。
+
+    new_rng を渡すとシャッフルのたびに新しい乱数（rng.Stream など）を受け取り、その seed を
+    self.seed に残す。draw() した位置は self.last に (seed, 位置) で入る。
+    """
+
+    __slots__ = ("decks", "penetration", "seed", "last", "_rng", "_new_rng", "_cards", "_pos", "_cut")
+
+    def __init__(self, decks: int = DECKS, penetration: float = PENETRATION,
+                 rng: Optional[random.Random] = None, new_rng: Optional[Callable[[], Any]] = None):
+        self.decks = decks
+        self.penetration = penetration
+        self._rng = rng or random.Random()
+        self._new_rng = new_rng
+        self.seed = None
+        self.last = None
+        self._cards = bytearray(range(len(CARD_RANKS))) * (4 * decks)
+        self.shuffle()
+
+    def shuffle(self) -> None:
+        if self._new_rng is not None:
+            self._rng = self._new_rng()
+            self.seed = getattr(self._rng, "seed", None)
+            # 並びはシードだけで決まるように、毎回同じ初期順からシャッフルする
+            self._cards = bytearray(range(len(CARD_RANKS))) * (4 * self.decks)
+        self._rng.shuffle(self._cards)
+        self._pos = 0
+        self._cut = int(len(self._cards) * self.penetration)
+
+    @property
+    def remaining(self) -> int:
+        return len(self._cards) - self._pos
+
+    def begin(self) -> None:
+        """ゲーム開始時に呼ぶ。カットカードが出ていればシャッフルする。"""
+        if self._pos >= self._cut:
+            self.shuffle()
+
+    def draw(self) -> int:
+        if self._pos >= len(self._cards):
+            # ゲームの途中で使い切ったときだけ（通常はカットカードで先にシャッフルされる）
+            self.shuffle()
+        card = self._cards[self._pos]
+        self.last = (self.seed, self._pos)
+        self._pos += 1
+        return card
+
+    def at(self, pos: int) -> int:
+        """現在の並びで pos 番目のカード（再現用）。"""
+        return self._cards[pos]
+
+
+def dealer_should_hit(hand: Hand) -> bool:
+    # ディーラーはソフト17でヒット
+    return hand.total < 17 or (hand.total == 17 and hand.soft)
+
+
+def blackjack_payout(stake: int, p_val: int, d_val: int) -> Tuple[str, int]:
+    """(outcome, payout) を返す。stake はダブル分を含めた掛け金。"""
+    if p_val > 21:
+        return "lose", 0
+    if d_val > 21 or p_val > d_val:
+        return "win", stake * 2
+    if p_val < d_val:
+        return "lose", 0
+    return "draw", stake
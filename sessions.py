@@ -0,0 +1,190 @@
+"""進行中のゲームのセッション（1 回分の状態）と、その登録簿。
+
+ゲームの View クラスは bot.py / games.py のモジュール直下に 1 つずつ置き、1 回ごとの状態
+（誰が・いくら賭けたか、手札、予約票など）は __slots__ のセッションオブジェクトに持たせる。
+コマンドごとに View クラスやクロージャを作らないので、同時に大量に遊ばれてもメモリと GC の
+負担が小さい。
+
+Registry は生きているセッションを ID で持ち、View が閉じたときに外す。
+- ユーザーごと・全体の同時セッション数に上限があり、超えると open() は None を返す
+  （連打で View と予約が際限なく増えないようにする）
+- 操作のない時間が TTL（SESSION_TTL 秒、操作のたびに延長）を過ぎたものは捨て、
+  未精算の掛け金があれば返却する
+"""
+import asyncio
+import itertools
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+import bank
+import rng
+from rules import Hand, Shoe
+
+# 設定（環境変数で調整可能）
+#   SESSION_TTL         : 操作がないまま放置されたセッションを捨てるまでの秒数（View のタイムアウト 180 秒より長く）
+#   SESSION_MAX_PER_USER: 1 人が同時に開けるゲームの数（0 なら無制限）
+#   SESSION_MAX_TOTAL   : 全体で同時に開けるゲームの数（0 なら無制限）
+SESSION_TTL = float(os.getenv("SESSION_TTL", "300"))
+MAX_PER_USER = int(os.getenv("SESSION_MAX_PER_USER", "3"))
+MAX_TOTAL = int(os.getenv("SESSION_MAX_TOTAL", "10000"))
+SWEEP_INTERVAL = 30.0  # 期限切れの掃除をする間隔（open のついでに行う）
+
+# 精算しようとしたら TTL で掛け金が返却済みだったときにユーザーへ見せる文言
+EXPIRED_NOTICE = "⏳ 操作がないまま時間が過ぎたため、この回は無効になりました（掛け金は返却済みです）。"
+
+
+class Session:
+    """チンチロ / スロットの 1 回分（確認から結果表示まで）。"""
+
+    __slots__ = ("id", "game", "user_id", "amount", "name", "ticket", "expires", "closed", "started", "expired")
+
+    def __init__(self, game: str, user_id: int, amount: int, name: str = ""):
+        self.id = 0
+        self.game = game
+        self.user_id = user_id
+        self.amount = amount
+        self.name = name  # 表示名（Embed 用）
+        self.ticket: Optional[bank.Ticket] = None  # 賭け金の予約票（精算前に捨てられたら返却する）
+        self.expires = 0.0
+        self.closed = False
+        self.started = False  # 確認ボタンが押された（連打で 2 回遊ばれないように、最初の await の前に立てる）
+        self.expired = False  # TTL で捨てられた（掛け金は返却済みなので結果は見せない）
+
+    def sizeof(self) -> int:
+        # 自身とスロットの値（1 段目まで）のバイト数の目安
+        total = sys.getsizeof(self)
+        for cls in type(self).__mro__:
+            for attr in getattr(cls, "__slots__", ()):
+                value = getattr(self, attr, None)
+                if value is not None and not isinstance(value, (int, float, bool, Shoe)):
+                    total += sys.getsizeof(value)
+        return total
+
+
+class BlackjackSession(Session):
+    """ブラックジャックの 1 回分。amount が最初の掛け金。"""
+
+    __slots__ = ("shoe", "player", "dealer", "trace", "round_id", "can_double", "doubling")
+
+    def __init__(self, user_id: int, amount: int, name: str, shoe: Shoe):
+        super().__init__("blackjack", user_id, amount, name)
+        self.shoe = shoe  # チャンネルで共有しているシュー（サイズには数えない）
+        self.player = Hand()
+        self.dealer = Hand()
+        # 配ったカードはシューのシードと位置で記録する（rng.py replay で再現できる）
+        self.trace: Dict[str, List[List]] = {"player": [], "dealer": []}
+        self.round_id = rng.round_id(rng.new_seed())
+        self.can_double = True  # 最初のアクションのみダブル可
+        self.doubling = False   # ダブルダウンの追加の掛け金を予約中（その間の Hit / Stand は受け付けない）
+
+    def deal(self, who: str) -> None:
+        hand = self.player if who == "player" else self.dealer
+        hand.add(self.shoe.draw())
+        seed, pos = self.shoe.last
+        self.trace[who].append([rng.round_id(seed), pos])
+
+
+class Registry:
+    """生きているセッションの登録簿。"""
+
+    def __init__(self, ttl: float = SESSION_TTL, max_per_user: int = MAX_PER_USER, max_total: int = MAX_TOTAL):
+        self.ttl = ttl
+        self.max_per_user = max_per_user
+        self.max_total = max_total
+        self._live: Dict[int, Session] = {}
+        self._per_user: Dict[int, int] = {}
+        self._ids = itertools.count(1)
+        self._last_sweep = time.monotonic()
+        self.opened = 0
+        self.evicted = 0
+        self.rejected = 0
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def _full(self, user_id: int) -> bool:
+        return ((self.max_total > 0 and len(self._live) >= self.max_total)
+                or (self.max_per_user > 0 and self._per_user.get(user_id, 0) >= self.max_per_user))
+
+    def open(self, session: Session) -> Optional[Session]:
+        """登録して返す。上限に達していれば None（期限切れを掃除してから判定する）。"""
+        now = time.monotonic()
+        if now - self._last_sweep > SWEEP_INTERVAL or self._full(session.user_id):
+            self.sweep(now)
+            if self._full(session.user_id):
+                self.rejected += 1
+                return None
+        session.id = next(self._ids)
+        session.expires = now + self.ttl
+        self._live[session.id] = session
+        self._per_user[session.user_id] = self._per_user.get(session.user_id, 0) + 1
+        self.opened += 1
+        return session
+
+    def touch(self, session: Session) -> None:
+        # 操作があったら期限を延ばす
+        if not session.closed:
+            session.expires = time.monotonic() + self.ttl
+
+    def close(self, session: Session) -> None:
+        session.closed = True
+        if self._live.pop(session.id, None) is not None:
+            left = self._per_user.get(session.user_id, 0) - 1
+            if left > 0:
+                self._per_user[session.user_id] = left
+            else:
+                self._per_user.pop(session.user_id, None)
+
+    def active(self, user_id: int) -> int:
+        return self._per_user.get(user_id, 0)
+
+    def get(self, session_id: int) -> Optional[Session]:
+        return self._live.get(session_id)
+
+    def sweep(self, now: Optional[float] = None) -> List[Session]:
+        """期限切れのセッションを外して返す。未精算の掛け金は返却する。"""
+        now = time.monotonic() if now is None else now
+        self._last_sweep = now
+        expired = [s for s in self._live.values() if s.expires <= now]
+        for s in expired:
+            s.expired = True
+            self.close(s)
+            if s.ticket is not None and not s.ticket.closed:
+                _refund(s.ticket)
+        self.evicted += len(expired)
+        return expired
+
+    def counts(self) -> Dict[str, int]:
+        out: Dict[str, int] = {}
+        for s in self._live.values():
+            out[s.game] = out.get(s.game, 0) + 1
+        return out
+
+    def memory(self) -> int:
+        """登録簿とセッションのおおよそのバイト数。"""
+        return sys.getsizeof(self._live) + sum(s.sizeof() for s in self._live.values())
+
+    def refusal(self, user_id: int) -> str:
+        """open() が None を返したときにユーザーへ見せる文言。"""
+        if self.max_per_user > 0 and self._per_user.get(user_id, 0) >= self.max_per_user:
+            return f"❌ 同時に遊べるゲームは {self.max_per_user} つまでです。進行中のゲームを終えてからもう一度どうぞ。"
+        return "⏳ ただいま混み合っています。少し待ってからもう一度お試しください。"
+
+    def stats(self) -> Dict[str, int]:
+        return {"live": len(self._live), "users": len(self._per_user), "opened": self.opened,
+                "rejected": self.rejected, "evicted": self.evicted, "bytes": self.memory()}
+
+
+def _refund(ticket: bank.Ticket) -> None:
+    # イベントループ上なら書き込みは async API（単一ライター）に任せる
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        bank.refund(ticket)
+    else:
+        loop.create_task(bank.arefund(ticket))
+
+
+registry = Registry()
@@ -0,0 +1,239 @@
+"""各ゲームの RTP（還元率）シミュレータ。
+
+    python simulate.py [--game all|chinchiro|slots|blackjack] [--rounds 10000000]
+                       [--workers N] [--seed S] [--stand-on 17] [--decks 6]
+
+チンチロ・スロットは全出目（216 × 216 / 216 通り）を rules.py で数え上げた厳密値を出す。
+さらに 3 ゲームとも NumPy のベクトル化モンテカルロを --rounds 回（プロセスプールで分割）
+回して、RTP・ハウスエッジ・1 ベットあたりの分散・95% 信頼区間を出す。
+
+モンテカルロでもルールは rules.py の関数から作った表を引くだけなので、数字は実際の
+ゲームのもの。ブラックジャックは 1 ゲームごとに --decks 組の新しいシューから非復元で配り
+（カットカードまでの持ち越しは扱わない）、プレイヤーは「合計が --stand-on 未満ならヒット」で
+打つ（ダブルなし）。
+
+モンテカルロには numpy が必要（bot の実行には不要なので requirements.txt には入れていない）。
+"""
+import argparse
+import importlib.util
+import itertools
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import rules
+
+GAMES = ("chinchiro", "slots", "blackjack")
+_CHUNK = {"chinchiro": 10_000_000, "slots": 10_000_000, "blackjack": 500_000}
+_Z95 = 1.959963984540054
+
+_DICE = list(itertools.product(range(1, 7), repeat=3))
+_REELS = list(itertools.product(rules.SLOT_SYMBOLS, repeat=3))
+
+
+class Result(NamedTuple):
+    game: str
+    method: str
+    rounds: int
+    rtp: float
+    variance: float  # 1 ベットあたりの払い戻しの分散
+    ci: Optional[Tuple[float, float]]  # RTP の 95% 信頼区間（厳密値では None）
+
+    @property
+    def house_edge(self) -> float:
+        return 1.0 - self.rtp
+
+
+# --- 厳密な数え上げ ---
+
+
+def _exact(game: str, payouts: Dict[int, int], total: int) -> Result:
+    # payouts: 払い戻し倍率 -> 出現回数
+    mean = Fraction(sum(m * c for m, c in payouts.items()), total)
+    second = Fraction(sum(m * m * c for m, c in payouts.items()), total)
+    return Result(game, "exact", total, float(mean), float(second - mean * mean), None)
+
+
+def exact_chinchiro() -> Result:
+    ranks = [rules.score_roll(r)[0] for r in _DICE]
+    payouts: Dict[int, int] = {}
+    for p in ranks:
+        for d in ranks:
+            m = rules.chinchiro_payout(1, p, d)[1]
+            payouts[m] = payouts.get(m, 0) + 1
+    return _exact("chinchiro", payouts, len(ranks) ** 2)
+
+
+def exact_slots() -> Result:
+    payouts: Dict[int, int] = {}
+    for reels in _REELS:
+        m = rules.slot_payout(1, reels)
+        payouts[m] = payouts.get(m, 0) + 1
+    return _exact("slots", payouts, len(_REELS))
+
+
+# --- モンテカルロ（ワーカープロセス内で実行） ---
+
+
+def _bj_tables(np):
+    """rules.py からブラックジャックの表を作る。
+
+    手札の状態は (A を 1 と数えた合計, A を含むか) を low * 2 + ace に詰めた整数。
+    """
+    def hand_for(low: int, ace: bool) -> rules.Hand:
+        # その状態になる代表的な手札（A は 1 枚あれば十分: 2 枚目以降は必ず 1 と数える）
+        cards = [rules.ACE] if ace else []
+        rest = low - 1 if ace else low
+        while rest > 0:
+            c = min(10, rest)
+            if rest - c == 1:
+                c -= 1
+            cards.append(c - 1)  # 点数 c のカードの添字
+            rest -= c
+        return rules.Hand(cards)
+
+    size = 32 * 2
+    value = np.zeros(size, dtype=np.int8)
+    hit = np.zeros(size, dtype=bool)
+    for low in range(32):
+        for ace in (False, True):
+            if (ace and low < 1) or (not ace and low == 1):
+                continue  # あり得ない状態
+            hand = hand_for(low, ace)
+            value[low * 2 + ace] = min(31, hand.total)
+            hit[low * 2 + ace] = rules.dealer_should_hit(hand)
+    payout = np.zeros((32, 32), dtype=np.int8)
+    for p in range(32):
+        for d in range(32):
+            payout[p, d] = rules.blackjack_payout(1, p, d)[1]
+    # 1 デッキに含まれる点数 1..10 の枚数
+    composition = np.zeros(10, dtype=np.int16)
+    for card in range(len(rules.CARD_RANKS)):
+        composition[rules.Hand([card]).low - 1] += 4
+    return value, hit, payout, composition
+
+
+def _mc_blackjack(np, rng, n: int, stand_on: int, decks: int):
+    value, hit, payout, composition = _bj_tables(np)
+    # 各行が新しいシュー。残り枚数を点数ごとに持ち、非復元で 1 枚ずつ引く
+    counts = np.tile(composition * decks, (n, 1))
+    remaining = np.full(n, int(composition.sum()) * decks)
+    rows = np.arange(n)
+
+    def draw(active):
+        u = (rng.random(n) * remaining).astype(np.int16)
+        v = (counts.cumsum(axis=1) <= u[:, None]).sum(axis=1)
+        counts[rows, v] -= active
+        remaining[:] -= active
+        return ((v + 1) * active).astype(np.int8)
+
+    everyone = np.ones(n, dtype=np.int16)
+
+    def deal():
+        a, b = draw(everyone), draw(everyone)
+        return [a + b, (a == 1) | (b == 1)]
+
+    p, d = deal(), deal()
+    while True:
+        active = (value[p[0] * 2 + p[1]] < stand_on).astype(np.int16)
+        if not active.any():
+            break
+        card = draw(active)
+        p[0] += card
+        p[1] |= card == 1
+    p_val = value[p[0] * 2 + p[1]]
+    # プレイヤーがバーストした時点でゲームは終わる（ディーラーは引かない）
+    alive = p_val <= 21
+    while True:
+        active = (hit[d[0] * 2 + d[1]] & alive).astype(np.int16)
+        if not active.any():
+            break
+        card = draw(active)
+        d[0] += card
+        d[1] |= card == 1
+    d_val = value[d[0] * 2 + d[1]]
+    return payout[p_val, d_val]
+
+
+def _mc_chunk(args) -> Tuple[int, int, int]:
+    game, n, seed, stand_on, decks = args
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    if game == "chinchiro":
+        ranks = [rules.score_roll(r)[0] for r in _DICE]
+        table = np.array([[rules.chinchiro_payout(1, p, d)[1] for d in ranks] for p in ranks], dtype=np.int8)
+        idx = rng.integers(0, len(_DICE), size=(2, n), dtype=np.int16)
+        x = table[idx[0], idx[1]]
+    elif game == "slots":
+        table = np.array([rules.slot_payout(1, r) for r in _REELS], dtype=np.int8)
+        x = table[rng.integers(0, len(_REELS), size=n, dtype=np.int16)]
+    else:
+        x = _mc_blackjack(np, rng, n, stand_on, decks)
+    x = x.astype(np.int64)
+    return n, int(x.sum()), int((x * x).sum())
+
+
+def monte_carlo(game: str, rounds: int, workers: int = 1, seed: Optional[int] = None,
+                stand_on: int = 17, decks: int = rules.DECKS) -> Result:
+    """game を rounds 回ぶんシミュレートする（チャンクに分けて workers プロセスで並列）。"""
+    import numpy as np
+
+    chunk = _CHUNK[game]
+    sizes = [chunk] * (rounds // chunk) + ([rounds % chunk] if rounds % chunk else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(game, size, s, stand_on, decks) for size, s in zip(sizes, seeds)]
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_mc_chunk, tasks))
+    else:
+        parts = [_mc_chunk(t) for t in tasks]
+    n = sum(p[0] for p in parts)
+    mean = sum(p[1] for p in parts) / n
+    var = max(0.0, sum(p[2] for p in parts) / n - mean * mean)
+    half = _Z95 * math.sqrt(var / n)
+    return Result(game, "monte-carlo", n, mean, var, (mean - half, mean + half))
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--game", choices=("all",) + GAMES, default="all")
+    p.add_argument("--rounds", type=int, default=10_000_000, help="モンテカルロの回数（0 で省略）")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    p.add_argument("--seed", type=int, default=None)
+    p.add_argument("--stand-on", type=int, default=17, help="ブラックジャックでスタンドする合計")
+    p.add_argument("--decks", type=int, default=rules.DECKS, help="ブラックジャックのシューのデッキ数")
+    args = p.parse_args(argv)
+    if not 2 <= args.stand_on <= 21:
+        p.error("--stand-on は 2〜21 で指定してください")
+    games = GAMES if args.game == "all" else (args.game,)
+
+    results: List[Result] = []
+    if "chinchiro" in games:
+        results.append(exact_chinchiro())
+    if "slots" in games:
+        results.append(exact_slots())
+    if args.rounds > 0:
+        if importlib.util.find_spec("numpy") is None:
+            print("モンテカルロには numpy が必要です（pip install numpy）。")
+            return 2
+        for game in games:
+            t0 = time.perf_counter()
+            r = monte_carlo(game, args.rounds, args.workers, args.seed, args.stand_on, args.decks)
+            print(f"[simulate] {game}: {r.rounds:,} 回 {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+            results.append(r)
+
+    print(f"{'game':>10} {'method':>12} {'rounds':>14} {'RTP':>9} {'edge':>9} {'variance':>9}  95% CI")
+    for r in results:
+        ci = f"[{r.ci[0]:.5f}, {r.ci[1]:.5f}]" if r.ci else "-"
+        print(f"{r.game:>10} {r.method:>12} {r.rounds:>14,} {r.rtp:>9.5f} {r.house_edge:>+9.5f} "
+              f"{r.variance:>9.4f}  {ci}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
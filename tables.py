@@ -0,0 +1,463 @@
+"""複数人で遊ぶ卓（/チンチロ卓・/ブラックジャック卓）。
+
+1 人ずつのゲームはプレイヤーごとにメッセージ・演出の編集・バンクの書き込みが増えるので、
+混んでいるチャンネルでは卓にまとめる。
+- 最初のコマンドで卓を開き、TABLE_JOIN_WINDOW 秒の間「参加する」ボタンか同じコマンドで参加を受け付ける
+  （開いた人は「開始」で締め切りを早められる）。参加した時点で掛け金を予約する
+- チンチロはディーラーが 1 回だけ振り、全員がその出目と勝負する。ブラックジャックはディーラーの手札を
+  全員で共有し、各自が自分の手札で Hit / Stand / Double する（TABLE_TURN_TIMEOUT 秒で残りは Stand）
+- 表示は卓のメッセージ 1 つだけで、演出はその 1 つを編集する（animator.py の枠を使う）
+- 精算は bank.asettle_batch() で卓全員分をまとめて 1 回の書き込みにする
+
+各席は sessions.py のセッションとして登録簿に載せるので、同時セッション数の上限と、
+放置されたときの掛け金の返却（TTL）は 1 人用のゲームと同じように効く。
+判定・配当は rules.py の関数をそのまま使い、ラウンドログも 1 人用と同じ形で残す
+（チンチロは全員が卓のラウンド ID と席番号を持ち、rng.py replay で再現できる）。
+"""
+import asyncio
+import itertools
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+import animator
+import bank
+import embeds
+import rng
+import rules
+import sessions
+
+# 設定（環境変数で調整可能）
+#   TABLE_JOIN_WINDOW : 参加を受け付ける秒数
+#   TABLE_MAX_SEATS   : 1 卓の最大人数
+#   TABLE_TURN_TIMEOUT: ブラックジャックで全員の操作を待つ秒数（過ぎたら残りは Stand）
+JOIN_WINDOW = float(os.getenv("TABLE_JOIN_WINDOW", "20"))
+MAX_SEATS = int(os.getenv("TABLE_MAX_SEATS", "10"))
+TURN_TIMEOUT = float(os.getenv("TABLE_TURN_TIMEOUT", "45"))
+
+GAME_LABELS = {"chinchiro": "チンチロ", "blackjack": "ブラックジャック"}
+_REFRESH_DELAY = 1.0  # 参加が続いたときに卓の表示をまとめて更新するまでの秒数
+
+_table_ids = itertools.count(1)
+
+
+class Table:
+    """1 卓分の状態。席は参加順のセッション（掛け金の予約票つき）。"""
+
+    def __init__(self, game: str, channel_id: int, host_id: int, amount: int,
+                 shoe: Optional[rules.Shoe] = None):
+        self.id = next(_table_ids)
+        self.game = game
+        self.channel_id = channel_id
+        self.host_id = host_id
+        self.amount = amount  # 「参加する」ボタンで参加したときの掛け金
+        self.seats: List[sessions.Session] = []
+        self.closes_at = time.time() + JOIN_WINDOW
+        self.started = False   # 締め切った（以後は参加できない）
+        self.go = asyncio.Event()  # 締め切りを早める / 全員の操作が終わった
+        self.message: Optional[discord.Message] = None
+        self.task: Optional[asyncio.Task] = None
+        self.refresh: Optional[asyncio.Task] = None
+        self.answering = 0  # 卓のメッセージを書き換えている最中のボタンの応答
+        # ブラックジャック: 共有のシューとディーラーの手札（各席の dealer / trace["dealer"] も同じものを指す）
+        self.shoe = shoe
+        self.dealer = rules.Hand()
+        self.dealer_trace: List[List] = []
+        self.done: set = set()  # 操作を終えた user_id
+        self.pending = 0        # 処理中のダブルダウン（終わるまでディーラーは引かない）
+
+    def seat_of(self, user_id: int) -> Optional[sessions.Session]:
+        for s in self.seats:
+            if s.user_id == user_id:
+                return s
+        return None
+
+    def lobby(self) -> discord.Embed:
+        return embeds.table_lobby(GAME_LABELS[self.game], [(s.name, s.amount) for s in self.seats],
+                                  int(self.closes_at), MAX_SEATS)
+
+    def deal_dealer(self) -> None:
+        self.dealer.add(self.shoe.draw())
+        seed, pos = self.shoe.last
+        self.dealer_trace.append([rng.round_id(seed), pos])
+
+    async def answer(self, i: discord.Interaction, embed: discord.Embed, view: discord.ui.View) -> bool:
+        """押した人の応答で卓のメッセージごと更新する（呼び出し 1 回）。
+
+        ほかの応答と重なったら True を返す（古い表示の応答が後から届くことがあるので、呼び出し元は
+        _refresh_later() で表示し直す）。
+        """
+        self.answering += 1
+        overlapped = self.answering > 1
+        try:
+            await i.response.edit_message(embed=embed, view=view)
+        finally:
+            self.answering -= 1
+        return overlapped or self.answering > 0
+
+    async def quiet(self) -> None:
+        # 応答中のボタンが書き終えるまで待つ（この後の表示は scheduler から出すので、古い応答に上書きされない）
+        while self.answering:
+            await asyncio.sleep(0.01)
+
+    def close_seats(self) -> None:
+        for s in self.seats:
+            sessions.registry.close(s)
+
+
+# (ゲーム, チャンネル ID) -> 参加受付中の卓
+_lobbies: Dict[Tuple[str, int], Table] = {}
+
+
+async def join(table: Table, user: discord.abc.User, amount: int) -> Optional[str]:
+    """席に着いて掛け金を予約する。断るときはその理由（ユーザーに見せる文言）を返す。"""
+    if table.started:
+        return "⏳ この卓は締め切られました。"
+    if table.seat_of(user.id) is not None:
+        return "❌ すでにこの卓に参加しています。"
+    if len(table.seats) >= MAX_SEATS:
+        return f"❌ この卓は満席です（{MAX_SEATS} 人）。"
+    if table.game == "blackjack":
+        seat = sessions.BlackjackSession(user.id, amount, user.display_name, table.shoe)
+        seat.dealer = table.dealer
+        seat.trace["dealer"] = table.dealer_trace
+    else:
+        seat = sessions.Session(table.game, user.id, amount, user.display_name)
+    if sessions.registry.open(seat) is None:
+        return sessions.registry.refusal(user.id)
+    seat.ticket = await bank.areserve(user.id, amount, table.game)
+    if seat.ticket is None:
+        sessions.registry.close(seat)
+        return "❌ 残高が不足しています。"
+    # 予約を待っている間に締め切られた / 同じ人が 2 回押した
+    if table.started or table.seat_of(user.id) is not None or len(table.seats) >= MAX_SEATS:
+        sessions.registry.close(seat)
+        await bank.arefund(seat.ticket)
+        return "⏳ この卓は締め切られました。" if table.started else "❌ この卓には参加できません。"
+    table.seats.append(seat)
+    return None
+
+
+def _refresh_later(table: Table, render: Callable[[], Optional[discord.Embed]]) -> None:
+    # 参加や操作が続いても、卓の表示の更新は _REFRESH_DELAY 秒に 1 回にまとめる。
+    # render() はその時点の表示（もう出さなくてよければ None）
+    if table.refresh is not None or table.message is None:
+        return
+
+    async def run() -> None:
+        await asyncio.sleep(_REFRESH_DELAY)
+        table.refresh = None
+        embed = render()
+        if embed is not None:
+            await animator.scheduler.deliver(table.message, embed=embed)
+
+    table.refresh = asyncio.create_task(run())
+
+
+async def _close_lobby(table: Table) -> None:
+    # 締め切りまで（または「開始」まで）待ってから参加を締め切る
+    try:
+        await asyncio.wait_for(table.go.wait(), max(0.0, table.closes_at - time.time()))
+    except asyncio.TimeoutError:
+        pass
+    table.started = True
+    table.go.clear()
+    if _lobbies.get((table.game, table.channel_id)) is table:
+        del _lobbies[(table.game, table.channel_id)]
+    _cancel_refresh(table)
+    await table.quiet()
+
+
+def _cancel_refresh(table: Table) -> None:
+    if table.refresh is not None:
+        table.refresh.cancel()
+        table.refresh = None
+
+
+def _lobby_embed(table: Table) -> Optional[discord.Embed]:
+    return None if table.started else table.lobby()
+
+
+async def _refund_all(table: Table) -> None:
+    table.close_seats()
+    for s in table.seats:
+        if s.ticket is not None:
+            await bank.arefund(s.ticket)
+
+
+# --- 参加受付 ---
+
+
+class TableLobbyView(discord.ui.View):
+    """参加受付中の卓のボタン。"""
+
+    def __init__(self, table: Table):
+        super().__init__(timeout=JOIN_WINDOW + 30)
+        self.table = table
+
+    @discord.ui.button(label="参加する", style=discord.ButtonStyle.success)
+    async def join_button(self, i: discord.Interaction, button: discord.ui.Button):
+        t = self.table
+        error = await join(t, i.user, t.amount)
+        if error is not None:
+            await i.response.send_message(error, ephemeral=True)
+            return
+        if await t.answer(i, t.lobby(), self):
+            _refresh_later(t, lambda: _lobby_embed(t))
+
+    @discord.ui.button(label="開始", style=discord.ButtonStyle.primary)
+    async def start_button(self, i: discord.Interaction, button: discord.ui.Button):
+        t = self.table
+        if i.user.id != t.host_id:
+            await i.response.send_message("❌ 卓を開いた人だけが開始できます。", ephemeral=True)
+            return
+        t.go.set()
+        await i.response.defer()
+
+
+async def open_or_join(interaction: discord.Interaction, game: str, amount: int,
+                       shoe: Optional[rules.Shoe] = None) -> None:
+    """コマンドの本体: チャンネルに受付中の卓があれば参加し、なければ開く。"""
+    if amount <= 0:
+        await interaction.response.send_message("❌ 0 より大きい金額を指定してください。", ephemeral=True)
+        return
+    key = (game, interaction.channel_id)
+    table = _lobbies.get(key)
+    if table is not None:
+        error = await join(table, interaction.user, amount)
+        if error is not None:
+            await interaction.response.send_message(error, ephemeral=True)
+            return
+        await interaction.response.send_message(f"✅ {GAME_LABELS[game]}の卓に **{amount} nuggets** で参加しました。",
+                                                ephemeral=True)
+        _refresh_later(table, lambda: _lobby_embed(table))
+        return
+
+    table = Table(game, interaction.channel_id, interaction.user.id, amount, shoe)
+    error = await join(table, interaction.user, amount)
+    if error is not None:
+        await interaction.response.send_message(error, ephemeral=True)
+        return
+    if key in _lobbies:
+        # 予約を待っている間に別の人が卓を開いた
+        await _refund_all(table)
+        await interaction.response.send_message("⏳ 同時に卓が開かれました。もう一度コマンドを実行して参加してください。",
+                                                ephemeral=True)
+        return
+    _lobbies[key] = table
+    view = TableLobbyView(table)
+    try:
+        await interaction.response.send_message(embed=table.lobby(), view=view)
+        table.message = await interaction.original_response()
+    except Exception:
+        _lobbies.pop(key, None)
+        await _refund_all(table)
+        raise
+    runner = play_chinchiro if game == "chinchiro" else play_blackjack
+    table.task = asyncio.create_task(runner(table, view), name=f"table-{table.id}")
+
+
+# --- チンチロ ---
+
+
+async def play_chinchiro(table: Table, lobby: discord.ui.View) -> None:
+    await _close_lobby(table)
+    lobby.stop()
+    try:
+        round_rng = rng.stream()
+        rolls, dealer = rules.roll_chinchiro_table(round_rng, len(table.seats))
+        seats = [(s.name, s.amount) for s in table.seats]
+
+        def frame(r, d, footer):
+            return {"embed": embeds.chinchiro_table_frame(seats, r, d, footer), "view": None}
+
+        frames = [frame(*rules.roll_chinchiro_table(rng.cosmetic, len(seats)), "振っています…") for _ in range(3)]
+        await animator.scheduler.animate(table.message, frames, 0.6)
+
+        d_rank = rules.score_roll(dealer)[0]
+        results = [rules.chinchiro_payout(s.amount, rules.score_roll(r)[0], d_rank) for s, r in zip(table.seats, rolls)]
+        # 卓全員分を 1 回の書き込みで精算
+        balances = await bank.asettle_batch([(s.ticket, payout) for s, (_, payout) in zip(table.seats, results)])
+        table.close_seats()
+        rid = rng.round_id(round_rng.seed)
+        rows = []
+        for n, (s, roll, (outcome, payout), balance) in enumerate(zip(table.seats, rolls, results, balances)):
+            if balance is not None:  # 期限切れで返却済みの席は精算していない
+                rng.record(rid, "chinchiro", s.user_id, s.amount, payout, table=table.id, seat=n)
+            rows.append((s.name, s.amount, roll, outcome, payout, s.ticket.balance if balance is None else balance))
+        await animator.scheduler.deliver(table.message, embed=embeds.chinchiro_table_result(rows, dealer, rid),
+                                         view=None)
+    except Exception:
+        import traceback
+        traceback.print_exc()
+        # 精算前に失敗した場合は掛け金を戻す（精算済みの席は何もしない）
+        await _refund_all(table)
+
+
+# --- ブラックジャック ---
+
+
+class BlackjackTableView(discord.ui.View):
+    """ブラックジャックの卓で各自が自分の手札を操作するボタン。"""
+
+    def __init__(self, table: Table):
+        super().__init__(timeout=TURN_TIMEOUT + 30)
+        self.table = table
+
+    async def _seat(self, i: discord.Interaction) -> Optional[sessions.BlackjackSession]:
+        t = self.table
+        s = t.seat_of(i.user.id)
+        if s is None:
+            await i.response.send_message("❌ この卓には参加していません。", ephemeral=True)
+            return None
+        if s.closed or i.user.id in t.done:
+            await i.response.send_message("❌ あなたの手番は終わっています。", ephemeral=True)
+            return None
+        sessions.registry.touch(s)
+        return s
+
+    async def _after(self, i: discord.Interaction, s: sessions.BlackjackSession, done: bool) -> None:
+        t = self.table
+        if done or s.player.total >= 21:
+            t.done.add(s.user_id)
+        if await t.answer(i, blackjack_embed(t, reveal_dealer=False), self):
+            _refresh_later(t, lambda: blackjack_embed(t, reveal_dealer=False) if not t.go.is_set() else None)
+        if len(t.done) == len(t.seats):
+            t.go.set()
+
+    @discord.ui.button(label="Hit", style=discord.ButtonStyle.primary)
+    async def hit(self, i: discord.Interaction, button: discord.ui.Button):
+        s = await self._seat(i)
+        if s is None:
+            return
+        s.deal("player")
+        s.can_double = False
+        await self._after(i, s, False)
+
+    @discord.ui.button(label="Stand", style=discord.ButtonStyle.secondary)
+    async def stand(self, i: discord.Interaction, button: discord.ui.Button):
+        s = await self._seat(i)
+        if s is None:
+            return
+        s.can_double = False
+        await self._after(i, s, True)
+
+    @discord.ui.button(label="Double", style=discord.ButtonStyle.success)
+    async def double(self, i: discord.Interaction, button: discord.ui.Button):
+        s = await self._seat(i)
+        if s is None:
+            return
+        if not s.can_double:
+            await i.response.send_message("❌ ダブルダウンは最初のアクションでのみ可能です。", ephemeral=True)
+            return
+        s.can_double = False
+        self.table.pending += 1
+        try:
+            if not await bank.aextend(s.ticket, s.amount):
+                s.can_double = True
+                await i.response.send_message("❌ ダブルダウンに必要な残高がありません。", ephemeral=True)
+                return
+            # カードを 1 枚引いて自動的に Stand
+            s.deal("player")
+        finally:
+            self.table.pending -= 1
+        await self._after(i, s, True)
+
+
+def blackjack_embed(table: Table, reveal_dealer: bool) -> discord.Embed:
+    rows = []
+    for s in table.seats:
+        if s.player.total > 21:
+            status = " 💥"
+        elif s.user_id in table.done:
+            status = " ✋"
+        else:
+            status = ""
+        rows.append((s.name, s.ticket.amount, s.player, status))
+    return embeds.blackjack_table_multi(rows, table.dealer, reveal_dealer,
+                                        f"Hit / Stand / Double は各自の手札に。{int(TURN_TIMEOUT)} 秒で残りは Stand")
+
+
+async def play_blackjack(table: Table, lobby: discord.ui.View) -> None:
+    await _close_lobby(table)
+    lobby.stop()
+    view = None
+    try:
+        # 初期配り（各自 2 枚、ディーラー 2 枚）
+        table.shoe.begin()
+        for _ in range(2):
+            for s in table.seats:
+                s.deal("player")
+            table.deal_dealer()
+        for s in table.seats:
+            if s.player.total >= 21:
+                table.done.add(s.user_id)
+
+        if len(table.done) < len(table.seats):
+            view = BlackjackTableView(table)
+            await animator.scheduler.deliver(table.message, embed=blackjack_embed(table, reveal_dealer=False),
+                                             view=view)
+            try:
+                await asyncio.wait_for(table.go.wait(), TURN_TIMEOUT)
+            except asyncio.TimeoutError:
+                pass
+            view.stop()
+        # 締め切ったあとのボタンは _seat() で断る（go が立っていれば表示のまとめ直しもしない）。
+        # 処理中のダブルダウンは掛け金が確定するまで、応答中のボタンは書き終えるまで待つ
+        table.go.set()
+        table.done.update(s.user_id for s in table.seats)
+        _cancel_refresh(table)
+        while table.pending:
+            await asyncio.sleep(0.01)
+        await table.quiet()
+
+        # ディーラーはソフト17でヒット（全員バーストでも引いて見せる）
+        while rules.dealer_should_hit(table.dealer):
+            table.deal_dealer()
+        results = [rules.blackjack_payout(s.ticket.amount, s.player.total, table.dealer.total) for s in table.seats]
+        balances = await bank.asettle_batch([(s.ticket, payout) for s, (_, payout) in zip(table.seats, results)])
+        table.close_seats()
+        rows = []
+        for s, (outcome, payout), balance in zip(table.seats, results, balances):
+            if balance is not None:  # 期限切れで返却済みの席は精算していない
+                rng.record(s.round_id, "blackjack", s.user_id, s.amount, payout,
+                           stake=s.ticket.amount, decks=s.shoe.decks, table=table.id, **s.trace)
+            rows.append((s.name, s.ticket.amount, s.player, outcome, payout,
+                         s.ticket.balance if balance is None else balance))
+        await animator.scheduler.deliver(table.message, embed=embeds.blackjack_table_result(rows, table.dealer),
+                                         view=None)
+    except Exception:
+        import traceback
+        traceback.print_exc()
+        if view is not None:
+            view.stop()
+        await _refund_all(table)
+
+
+# --- Cog ---
+
+
+class Tables(commands.Cog):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    @app_commands.command(name="チンチロ卓", description="みんなで同じディーラーとチンチロ（卓を開く / 参加する）")
+    @app_commands.describe(amount="掛け金（nuggets）")
+    async def チンチロ卓(self, interaction: discord.Interaction, amount: int):
+        await open_or_join(interaction, "chinchiro", amount)
+
+    @app_commands.command(name="ブラックジャック卓", description="みんなで同じディーラーとブラックジャック（卓を開く / 参加する）")
+    @app_commands.describe(amount="掛け金（nuggets）")
+    async def ブラックジャック卓(self, interaction: discord.Interaction, amount: int):
+        # シューは 1 人用のブラックジャックと共有する（games.py の Games cog があれば）
+        games_cog = self.bot.get_cog("Games")
+        shoe = games_cog.shoe_for(interaction.channel_id) if games_cog is not None else rules.Shoe(new_rng=rng.stream)
+        await open_or_join(interaction, "blackjack", amount, shoe)
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(Tables(bot))